@@ -1,23 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 import pandas as pd
-import io
 import zipfile
 import tempfile
 import os
 from pathlib import Path
 import json
+import uuid
 
 from app.core.db import get_db
 from app.core.security import get_current_user
 from app.models.user import User
 from app.services.template_service import TemplateService
-from app.services.act_service import ActService
+from app.services.act_service import ActService, ActTemplateSpec
+from app.services.permission_service import AccessMap, get_current_access, require_folder_access
+from app.core.memory import MemoryTracker
+from app.core.config import settings
+from app.core.uploads import spooled_upload
+from app.core.file_delivery import deliver_file, strong_etag
+from app.services.artifact_service import register_artifact, artifact_path
+from app.services.audit_service import audit
 
 router = APIRouter(prefix="/acts", tags=["acts"])
 
+_MEDIA_TYPES = {
+    "zip": "application/zip",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+async def _workbook_source(file: UploadFile):
+    """Проверяет расширение и размер книги Excel и возвращает ее временный файл"""
+    if not file.filename.endswith(('.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="Поддерживаются только файлы Excel (.xlsx, .xls)")
+    return await spooled_upload(file, settings.WORKBOOK_UPLOAD_MAX_BYTES)
+
+async def _read_workbook(source, **kwargs) -> pd.DataFrame:
+    """Разбирает книгу из временного файла загрузки в threadpool, не блокируя event loop"""
+    return await run_in_threadpool(pd.read_excel, source, engine='openpyxl', **kwargs)
+
+def _template_specs(template_id, mapping, act_filename_template, templates) -> List[ActTemplateSpec]:
+    """Шаблоны пакета: JSON-список templates или один template_id с mapping"""
+    if not templates:
+        if template_id is None or not mapping:
+            raise HTTPException(status_code=400, detail="Укажите шаблон и маппинг")
+        try:
+            mapping_dict = json.loads(mapping)
+            print(f"Маппинг успешно распарсен: {mapping_dict}")
+        except json.JSONDecodeError as e:
+            print(f"Ошибка парсинга маппинга: {e}")
+            print(f"Сырые данные маппинга: {mapping}")
+            raise HTTPException(status_code=400, detail="Неверный формат маппинга")
+        return [ActTemplateSpec(template_id, mapping_dict, act_filename_template)]
+
+    try:
+        items = json.loads(templates)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Неверный формат списка шаблонов")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Список шаблонов пуст")
+    if len(items) > settings.ACTS_MAX_TEMPLATES:
+        raise HTTPException(status_code=400, detail=f"Не более {settings.ACTS_MAX_TEMPLATES} шаблонов в одном пакете")
+    specs = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("mapping"), dict):
+            raise HTTPException(status_code=400, detail="Для каждого шаблона нужны template_id и mapping")
+        try:
+            item_template_id = int(item.get("template_id"))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Для каждого шаблона нужны template_id и mapping")
+        specs.append(ActTemplateSpec(item_template_id, item["mapping"], item.get("filename_template")))
+    return specs
+
 @router.post("/analyze-excel")
 async def analyze_excel_file(
     file: UploadFile = File(...),
@@ -25,16 +81,10 @@ async def analyze_excel_file(
     db: Session = Depends(get_db)
 ):
     """Анализирует Excel файл и возвращает список столбцов"""
+    source = await _workbook_source(file)
     try:
-        # Проверяем расширение файла
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="Поддерживаются только файлы Excel (.xlsx, .xls)")
-        
-        # Читаем содержимое файла
-        content = await file.read()
-        
         # Анализируем Excel файл с помощью pandas
-        df = pd.read_excel(io.BytesIO(content), engine='openpyxl')
+        df = await _read_workbook(source)
         
         # Получаем список столбцов
         columns = df.columns.tolist()
@@ -104,16 +154,10 @@ async def get_column_values(
     db: Session = Depends(get_db)
 ):
     """Получает уникальные значения для всех столбцов Excel файла"""
+    source = await _workbook_source(file)
     try:
-        # Проверяем расширение файла
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="Поддерживаются только файлы Excel (.xlsx, .xls)")
-        
-        # Читаем содержимое файла
-        content = await file.read()
-        
         # Анализируем Excel файл с помощью pandas
-        df = pd.read_excel(io.BytesIO(content), engine='openpyxl')
+        df = await _read_workbook(source)
         
         # Функция для безопасной сериализации значений
         def safe_serialize(value):
@@ -162,15 +206,24 @@ async def get_template_placeholders(
 
 @router.post("/generate")
 async def generate_acts(
-    template_id: int = Form(...),
+    request: Request,
+    template_id: int = Form(None),
     excel_file: UploadFile = File(...),
-    mapping: str = Form(...),
+    mapping: str = Form(None),
     output_format: str = Form(...),
     output_filename: str = Form(None),  # Кастомное название файла
     act_filename_template: str = Form(None),  # Шаблон названия файлов актов
+    # JSON-список [{"template_id", "mapping", "filename_template"}] вместо template_id и mapping
+    templates: str = Form(None),
+    group_by: str = Form(None),  # Папки архива: "row" или "template"
+    output_mode: str = Form("archive"),  # "merged" - один документ со всеми актами
+    bookmarks: bool = Form(False),  # Закладка на акт каждой строки в объединенном документе
     number_to_text_fields: str = Form(None),  # JSON строка с полями для преобразования в текст
     currency: str = Form("рублей"),  # Валюта для расшифровки чисел
+    key_column: str = Form(None),  # Столбец с ключом строки для сравнения с прошлым прогоном
+    changed_only: bool = Form(False),  # Рендерить только новые и измененные строки
     current_user: User = Depends(get_current_user),
+    access: AccessMap = Depends(get_current_access),
     db: Session = Depends(get_db),
     # Добавляем параметры для фильтров
     filter_column_0: str = Form(None),
@@ -185,30 +238,36 @@ async def generate_acts(
     filter_value_4: str = Form(None),
 ):
     """Генерирует акты на основе шаблона и данных из Excel"""
-    print(f"Начало генерации актов: template_id={template_id}, output_format={output_format}")
+    specs = _template_specs(template_id, mapping, act_filename_template, templates)
+    template_id = specs[0].template_id
+    print(f"Начало генерации актов: templates={[spec.template_id for spec in specs]}, output_format={output_format}")
+    if group_by not in (None, "row", "template"):
+        raise HTTPException(status_code=400, detail="Группировка документов: row или template")
+    if output_mode not in ("archive", "merged"):
+        raise HTTPException(status_code=400, detail="Режим вывода: archive или merged")
+    template_service = TemplateService(db)
+    for spec in specs:
+        template = template_service.get_template_by_id(spec.template_id)
+        if not template:
+            raise HTTPException(status_code=404, detail="Шаблон не найден")
+        require_folder_access(access, template.folder_id, "view")
+    source = await spooled_upload(excel_file, settings.WORKBOOK_UPLOAD_MAX_BYTES)
+
+    memory_tracker = MemoryTracker()
+    batch_id = uuid.uuid4().hex
     try:
         # Проверяем формат выходных файлов
         if output_format not in ['docx', 'pdf']:
             raise HTTPException(status_code=400, detail="Поддерживаются только форматы DOCX и PDF")
         
-        # Парсим маппинг
-        try:
-            mapping_dict = json.loads(mapping)
-            print(f"Маппинг успешно распарсен: {mapping_dict}")
-        except json.JSONDecodeError as e:
-            print(f"Ошибка парсинга маппинга: {e}")
-            print(f"Сырые данные маппинга: {mapping}")
-            raise HTTPException(status_code=400, detail="Неверный формат маппинга")
-        
         # Читаем Excel файл с помощью pandas
-        content = await excel_file.read()
-        df = pd.read_excel(
-            io.BytesIO(content), 
-            engine='openpyxl',
-            parse_dates=True,  # Автоматически определяем даты
-            keep_default_na=True,  # Сохраняем NaN значения
-            na_values=['', 'nan', 'NaN', 'NULL', 'null']  # Дополнительные значения для NaN
-        )
+        with memory_tracker.stage("read_excel"):
+            df = await _read_workbook(
+                source,
+                parse_dates=True,  # Автоматически определяем даты
+                keep_default_na=True,  # Сохраняем NaN значения
+                na_values=['', 'nan', 'NaN', 'NULL', 'null']  # Дополнительные значения для NaN
+            )
         print(f"Excel файл прочитан: {len(df)} строк, {len(df.columns)} столбцов")
         print(f"Типы данных столбцов: {df.dtypes.to_dict()}")
         
@@ -234,33 +293,34 @@ async def generate_acts(
             raise HTTPException(status_code=400, detail="Не указаны фильтры для генерации")
         
         # Применяем множественные фильтры
-        filtered_df = df.copy()
-        print(f"Начальная фильтрация: {len(filtered_df)} строк")
-        
-        # Группируем фильтры по столбцам
-        column_filters = {}
-        for filter_item in filters:
-            column = filter_item['column']
-            value = filter_item['value']
-            if column not in column_filters:
-                column_filters[column] = []
-            column_filters[column].append(value)
-        
-        print(f"Сгруппированные фильтры: {column_filters}")
-        
-        # Применяем фильтры по столбцам
-        for column, values in column_filters.items():
-            if column not in filtered_df.columns:
-                available_columns = list(filtered_df.columns)
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Столбец '{column}' не найден в файле. Доступные столбцы: {available_columns}"
-                )
+        with memory_tracker.stage("filter"):
+            filtered_df = df.copy()
+            print(f"Начальная фильтрация: {len(filtered_df)} строк")
+        
+            # Группируем фильтры по столбцам
+            column_filters = {}
+            for filter_item in filters:
+                column = filter_item['column']
+                value = filter_item['value']
+                if column not in column_filters:
+                    column_filters[column] = []
+                column_filters[column].append(value)
+        
+            print(f"Сгруппированные фильтры: {column_filters}")
+        
+            # Применяем фильтры по столбцам
+            for column, values in column_filters.items():
+                if column not in filtered_df.columns:
+                    available_columns = list(filtered_df.columns)
+                    raise HTTPException(
+                        status_code=400, 
+                        detail=f"Столбец '{column}' не найден в файле. Доступные столбцы: {available_columns}"
+                    )
             
-            # Фильтруем данные - используем OR для множественных значений одного столбца
-            mask = filtered_df[column].astype(str).isin(values)
-            filtered_df = filtered_df[mask]
-            print(f"После фильтра по столбцу '{column}' с значениями {values}: {len(filtered_df)} строк")
+                # Фильтруем данные - используем OR для множественных значений одного столбца
+                mask = filtered_df[column].astype(str).isin(values)
+                filtered_df = filtered_df[mask]
+                print(f"После фильтра по столбцу '{column}' с значениями {values}: {len(filtered_df)} строк")
         
         if len(filtered_df) == 0:
             # Показываем уникальные значения в первом столбце для помощи пользователю
@@ -272,6 +332,20 @@ async def generate_acts(
                        f"Доступные значения в столбце '{first_filter['column']}': {list(unique_values)}"
             )
         
+        # Инкрементальная генерация сопоставляет строки по уникальному ключу
+        if changed_only and not key_column:
+            raise HTTPException(status_code=400, detail="Для генерации только измененных строк укажите ключевой столбец")
+        if key_column:
+            if key_column not in filtered_df.columns:
+                raise HTTPException(status_code=400, detail=f"Ключевой столбец '{key_column}' не найден в файле")
+            duplicates = filtered_df[key_column].astype(str)
+            duplicates = duplicates[duplicates.duplicated()].unique()[:10]
+            if len(duplicates):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Значения ключевого столбца '{key_column}' не уникальны: {list(duplicates)}"
+                )
+        
         # Парсим поля для преобразования чисел в текст
         number_to_text_fields_list = []
         if number_to_text_fields:
@@ -285,31 +359,81 @@ async def generate_acts(
         zip_path = act_service.generate_acts(
             template_id=template_id,
             data=filtered_df,
-            mapping=mapping_dict,
+            mapping=specs[0].mapping,
             output_format=output_format,
             user_id=current_user.id,
-            filename_template=act_filename_template,
+            filename_template=specs[0].filename_template,
             number_to_text_fields=number_to_text_fields_list,
-            currency=currency
+            currency=currency,
+            memory_tracker=memory_tracker,
+            batch_id=batch_id,
+            key_column=key_column,
+            changed_only=changed_only,
+            templates=specs,
+            group_by=group_by,
+            output_mode=output_mode,
+            bookmarks=bookmarks
         )
+        memory_report = memory_tracker.finish()
+        print(f"Потребление памяти при генерации актов: {memory_report}")
+
+        # Одна запись журнала на весь пакет
+        manifest = act_service.last_manifest or {}
+        audit(current_user.id, "generate_acts", "template", template_id, {
+            "batch_id": batch_id,
+            "status": "ok",
+            "output_format": output_format,
+            "output_mode": output_mode,
+            "template_ids": manifest.get("template_ids"),
+            "source_rows": len(df),
+            "total_rows": manifest.get("total_rows"),
+            "succeeded": manifest.get("succeeded"),
+            "failed": manifest.get("failed"),
+            "duration_ms": manifest.get("duration_ms"),
+            "peak_rss_mb": memory_report["peak_rss_mb"],
+            "changes": manifest.get("changes"),
+        })
+        
+        # Архив или объединенный документ
+        extension = output_format if output_mode == "merged" else "zip"
         
         # Формируем название файла
         if output_filename:
             # Очищаем название от недопустимых символов
             import re
             clean_filename = re.sub(r'[<>:"/\\|?*]', '_', output_filename.strip())
-            filename = f"{clean_filename}.zip"
+            filename = f"{clean_filename}.{extension}"
         else:
-            filename = f"generated_acts_{len(filtered_df)}_records.zip"
-        
-        # Возвращаем архив
-        return FileResponse(
-            path=zip_path,
-            filename=filename,
-            media_type="application/zip"
+            filename = f"generated_acts_{len(filtered_df)}_records.{extension}"
+        
+        # Результат сохраняется в хранилище результатов: повторно скачивается по
+        # GET /artifacts/{batch_id} без повторной генерации
+        artifact = register_artifact(db, zip_path, filename, _MEDIA_TYPES[extension], current_user.id, "acts",
+                                     artifact_id=batch_id)
+        
+        # Возвращаем результат
+        return deliver_file(
+            request,
+            artifact_path(artifact.id),
+            artifact.filename,
+            artifact.media_type,
+            etag=strong_etag(artifact.content_hash),
+            headers={
+                "X-Batch-Id": batch_id,
+                "X-Artifact-Id": artifact.id,
+                "X-Memory-Peak-RSS-MB": str(memory_report["peak_rss_mb"]),
+                "X-Memory-Delta-RSS-MB": str(memory_report["rss_delta_mb"])
+            }
         )
         
     except Exception as e:
+        memory_tracker.finish()
+        audit(current_user.id, "generate_acts", "template", template_id, {
+            "batch_id": batch_id,
+            "status": "error",
+            "output_format": output_format,
+            "error": str(e.detail) if isinstance(e, HTTPException) else str(e),
+        })
         raise HTTPException(status_code=400, detail=f"Ошибка генерации актов: {str(e)}")
 
 @router.get("/generation-status/{task_id}")
@@ -318,17 +442,17 @@ async def get_generation_status(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Получает статус генерации актов"""
-    try:
-        act_service = ActService(db)
-        status = act_service.get_generation_status(task_id)
-        
-        return {
-            "task_id": task_id,
-            "status": status
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Ошибка получения статуса: {str(e)}")
+    """Получает статус генерации актов (манифест пакета по X-Batch-Id)"""
+    act_service = ActService(db)
+    status = act_service.get_generation_status(task_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Пакет генерации не найден")
+    if status.get("user_id") != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Нет доступа к этому пакету")
+    return {
+        "task_id": task_id,
+        "status": status
+    }
 
 @router.post("/analyze-data-quality")
 async def analyze_data_quality(
@@ -337,14 +461,9 @@ async def analyze_data_quality(
     db: Session = Depends(get_db)
 ):
     """Анализирует качество данных в Excel файле"""
+    source = await _workbook_source(file)
     try:
-        # Проверяем расширение файла
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="Поддерживаются только файлы Excel (.xlsx, .xls)")
-        
-        # Читаем содержимое файла
-        content = await file.read()
-        df = pd.read_excel(io.BytesIO(content), engine='openpyxl')
+        df = await _read_workbook(source)
         
         # Функция для безопасной сериализации значений
         def safe_serialize(value):
@@ -386,6 +505,7 @@ async def validate_mapping(
     db: Session = Depends(get_db)
 ):
     """Проверяет корректность маппинга с данными"""
+    source = await spooled_upload(file, settings.WORKBOOK_UPLOAD_MAX_BYTES)
     try:
         # Парсим маппинг
         try:
@@ -394,8 +514,7 @@ async def validate_mapping(
             raise HTTPException(status_code=400, detail="Неверный формат маппинга")
         
         # Читаем Excel файл
-        content = await file.read()
-        df = pd.read_excel(io.BytesIO(content), engine='openpyxl')
+        df = await _read_workbook(source)
         
         # Проверяем маппинг
         act_service = ActService(db)
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from app.core.db import get_db
+from app.core.file_delivery import deliver_file, strong_etag
+from app.api.auth import get_current_user
+from app.models.user import User
+from app.services.artifact_service import get_artifact, list_artifacts, artifact_path
+
+router = APIRouter(prefix="/artifacts", tags=["artifacts"])
+
+def format_datetime(dt):
+    """Форматирует дату в читаемый формат для фронтенда"""
+    if dt is None:
+        return None
+    return dt.strftime("%d.%m.%Y %H:%M")
+
+@router.get("/")
+def get_artifacts(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Действующие результаты генерации текущего пользователя"""
+    return {
+        "data": [
+            {
+                "id": artifact.id,
+                "kind": artifact.kind,
+                "filename": artifact.filename,
+                "size": artifact.size,
+                "created_at": format_datetime(artifact.created_at),
+                "expires_at": format_datetime(artifact.expires_at)
+            }
+            for artifact in list_artifacts(db, current_user.id)
+        ]
+    }
+
+@router.get("/{artifact_id}")
+def download_artifact(
+    artifact_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Повторно скачивает результат генерации по id (X-Artifact-Id / X-Batch-Id)"""
+    artifact = get_artifact(db, artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Результат не найден или срок его хранения истек")
+    if artifact.user_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Нет доступа к этому результату")
+    return deliver_file(
+        request,
+        artifact_path(artifact.id),
+        artifact.filename,
+        artifact.media_type,
+        etag=strong_etag(artifact.content_hash)
+    )
@@ -3,7 +3,8 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.core.db import get_db
 from app.core.security import (
-    verify_password, 
+    verify_and_update_password_async,
+    get_password_hash_async,
     create_access_token, 
     get_current_user,
     generate_csrf_token,
@@ -14,11 +15,18 @@ from app.core.config import settings
 from app.models.user import User
 from app.schemas.user import UserCreate, UserOut
 from app.services.user_service import create_user, get_user_by_username, activate_user
+from app.core.metrics import registry
 from datetime import timedelta
 from pydantic import BaseModel
+import time
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+login_duration = registry.histogram(
+    "login_duration_seconds",
+    "Длительность обработки /auth/login",
+)
+
 class LoginRequest(BaseModel):
     username: str
     password: str
@@ -47,19 +55,36 @@ async def login(
     db: Session = Depends(get_db)
 ):
     """Авторизация пользователя"""
-    user = get_user_by_username(db, login_data.username)
-    
-    if not user or not verify_password(login_data.password, user.password_hash):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Неверное имя пользователя или пароль"
-        )
-    
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Пользователь не активирован"
-        )
+    started = time.perf_counter()
+    result = "error"
+    try:
+        user = get_user_by_username(db, login_data.username)
+        
+        password_ok, new_hash = (False, None)
+        if user:
+            password_ok, new_hash = await verify_and_update_password_async(login_data.password, user.password_hash)
+        
+        if not password_ok:
+            result = "invalid"
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Неверное имя пользователя или пароль"
+            )
+        
+        if not user.is_active:
+            result = "inactive"
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Пользователь не активирован"
+            )
+        
+        # Прозрачно обновляем хэш, созданный с устаревшими параметрами
+        if new_hash:
+            user.password_hash = new_hash
+            db.commit()
+        result = "success"
+    finally:
+        login_duration.observe(time.perf_counter() - started, result=result)
     
     # Создаем токен
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -126,7 +151,8 @@ async def register(
         password=register_data.password
     )
     
-    user = create_user(db, user_create)
+    password_hash = await get_password_hash_async(register_data.password)
+    user = create_user(db, user_create, password_hash=password_hash)
     
     return {
         "message": "Пользователь успешно зарегистрирован",
@@ -1,17 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.schemas.folder import FolderCreate, FolderOut
-from app.services.folder_service import create_folder, get_folder_by_id, delete_folder, get_subfolders, list_folders, list_folders_for_user
-from app.core.db import get_db
-from app.core.security import get_current_user, check_csrf
+from app.schemas.folder import FolderCreate, FolderOut, FolderUpdate
+from app.services.folder_service import (
+    create_folder, get_folder_by_id, delete_folder, get_subfolders, list_folders, list_folders_for_user,
+    get_folder_by_id_async, list_folders_for_user_async, get_folder_tree_async,
+    build_folder_path, is_in_subtree, move_folder
+)
+from app.core.db import get_db, get_async_db
+from app.core.security import get_current_user, check_csrf, CurrentUser
+from app.core.pagination import PageParams, page_params, split_page, set_page_headers
+from app.core.table_versions import get_versions_async, make_etag, is_not_modified, not_modified
+from app.services.permission_service import AccessMap, get_current_access, require_folder_access
 
 router = APIRouter(prefix="/folders", tags=["folders"])
 
 @router.get("/", response_model=None)
-def list_folders_route(db: Session = Depends(get_db), user=Depends(get_current_user)):
+async def list_folders_route(
+    request: Request,
+    db=Depends(get_async_db),
+    user: CurrentUser = Depends(get_current_user),
+    access: AccessMap = Depends(get_current_access),
+    page: PageParams = Depends(page_params)
+):
+    versions = await get_versions_async(db, ("folders", "permissions"))
+    etag = make_etag(versions, user.id, access.digest(), page.limit, page.raw_cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
     # Возвращаем только папки, на которые у пользователя есть права
-    folders = list_folders_for_user(db, user.id)
+    folders = await list_folders_for_user_async(db, access, page)
+    folders, next_cursor = split_page(folders, page, lambda folder: [folder.id])
     result = [
         {
             "id": folder.id,
@@ -22,7 +42,9 @@ def list_folders_route(db: Session = Depends(get_db), user=Depends(get_current_u
         }
         for folder in folders
     ]
-    return JSONResponse(content=result)
+    response = JSONResponse(content=result)
+    set_page_headers(response, next_cursor, etag)
+    return response
 
 @router.post("/", response_model=None)
 def create_folder_route(folder: FolderCreate, db: Session = Depends(get_db), user=Depends(get_current_user), request: Request = None):
@@ -33,7 +55,7 @@ def create_folder_route(folder: FolderCreate, db: Session = Depends(get_db), use
         if not parent:
             raise HTTPException(status_code=404, detail="Родительская папка не найдена")
         parent_path = parent.path
-    path = f"{parent_path}/{folder.name}".replace("//", "/")
+    path = build_folder_path(parent_path, folder.name)
     created_folder = create_folder(db, folder, created_by=user.id, path=path)
     result = {
         "id": created_folder.id,
@@ -44,11 +66,64 @@ def create_folder_route(folder: FolderCreate, db: Session = Depends(get_db), use
     }
     return JSONResponse(content=result)
 
+@router.get("/tree", response_model=None)
+async def get_folder_tree_route(db=Depends(get_async_db), access: AccessMap = Depends(get_current_access)):
+    """Вложенное дерево папок с количеством шаблонов в папке и во всем поддереве"""
+    tree = await get_folder_tree_async(db, access)
+    return JSONResponse(content=tree)
+
 @router.get("/{folder_id}", response_model=None)
-def get_folder_route(folder_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+async def get_folder_route(folder_id: int, db=Depends(get_async_db), access: AccessMap = Depends(get_current_access)):
+    folder = await get_folder_by_id_async(db, folder_id)
+    if not folder:
+        raise HTTPException(status_code=404, detail="Папка не найдена")
+    require_folder_access(access, folder.id, "view")
+    result = {
+        "id": folder.id,
+        "name": folder.name,
+        "parent_id": folder.parent_id,
+        "path": folder.path,
+        "created_by": folder.created_by
+    }
+    return JSONResponse(content=result)
+
+@router.patch("/{folder_id}", response_model=None)
+def update_folder_route(folder_id: int, data: FolderUpdate, db: Session = Depends(get_db),
+                        user=Depends(get_current_user), access: AccessMap = Depends(get_current_access)):
+    """Переименование и/или перенос папки вместе со всеми вложенными.
+
+    Нужен уровень manage на папку и, при переносе, на новую родительскую
+    папку (перенос в корень - только администратор).
+    """
     folder = get_folder_by_id(db, folder_id)
     if not folder:
         raise HTTPException(status_code=404, detail="Папка не найдена")
+    require_folder_access(access, folder.id, "manage")
+    if "parent_id" in data.__fields_set__:
+        # Для корня (None) права есть только у администратора
+        require_folder_access(access, data.parent_id, "manage")
+
+    name = data.name if data.name is not None else folder.name
+    if not name.strip() or "/" in name:
+        raise HTTPException(status_code=400, detail="Недопустимое имя папки")
+
+    # parent_id учитываем только если он передан явно (null - перенос в корень)
+    parent_id = data.parent_id if "parent_id" in data.__fields_set__ else folder.parent_id
+    parent_path = ""
+    if parent_id:
+        parent = get_folder_by_id(db, parent_id)
+        if not parent:
+            raise HTTPException(status_code=404, detail="Родительская папка не найдена")
+        if is_in_subtree(db, folder, parent.id):
+            raise HTTPException(status_code=400, detail="Нельзя перенести папку в саму себя или во вложенную папку")
+        parent_path = parent.path
+
+    try:
+        folder = move_folder(db, folder, name, parent_id, parent_path)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Папка с таким путем уже существует")
+
     result = {
         "id": folder.id,
         "name": folder.name,
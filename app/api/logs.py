@@ -1,12 +1,56 @@
-from fastapi import APIRouter, Depends
+import json
+import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from app.services.log_service import get_logs
+from app.services.log_service import get_logs, get_action_counts
 from app.core.db import get_db
 from app.core.security import require_admin
 from app.schemas.log import LogOut
+from app.core.pagination import PageParams, page_params, split_page, set_page_headers
+from app.core.table_versions import get_versions, make_etag, is_not_modified, not_modified
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
+def _parse_details_filter(details: Optional[str]):
+    """details передается JSON-объектом: {"template_id": 5}"""
+    if not details:
+        return None
+    try:
+        value = json.loads(details)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="details должен быть JSON-объектом")
+    if not isinstance(value, dict) or any(isinstance(v, (dict, list)) for v in value.values()):
+        raise HTTPException(status_code=400, detail="details должен быть JSON-объектом со скалярными значениями")
+    return value
+
 @router.get("/", response_model=list[LogOut])
-def list_logs(user_id: int = None, action: str = None, db: Session = Depends(get_db), admin=Depends(require_admin)):
-    return get_logs(db, user_id=user_id, action=action) 
\ No newline at end of file
+def list_logs(
+    request: Request,
+    response: Response,
+    user_id: int = None,
+    action: str = None,
+    target_type: str = None,
+    target_id: int = None,
+    date_from: datetime.datetime = None,
+    date_to: datetime.datetime = None,
+    details: str = None,
+    db: Session = Depends(get_db),
+    admin=Depends(require_admin),
+    page: PageParams = Depends(page_params)
+):
+    details_filter = _parse_details_filter(details)
+    etag = make_etag(get_versions(db, ("action_logs",)), user_id, action, target_type, target_id,
+                     date_from, date_to, details, page.limit, page.raw_cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    logs = get_logs(db, user_id=user_id, action=action, page=page, target_type=target_type, target_id=target_id,
+                    date_from=date_from, date_to=date_to, details=details_filter)
+    logs, next_cursor = split_page(logs, page, lambda log: [log.timestamp, log.id])
+    set_page_headers(response, next_cursor, etag)
+    return logs
+
+@router.get("/stats")
+def action_stats(date_from: datetime.date = None, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    """Количество действий по типам для дашборда (по месячным счетчикам, без чтения журнала)"""
+    return {"counts": get_action_counts(db, date_from=date_from), "date_from": date_from}
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from app.core.security import require_admin
+from app.core.profiling import list_profiles, get_profile_file, delete_profile
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+@router.get("/")
+def list_profiles_route(admin=Depends(require_admin)):
+    """Список сохраненных профилей запросов (только для администраторов)"""
+    return {"data": list_profiles()}
+
+@router.get("/{profile_id}/download")
+def download_profile(profile_id: str, admin=Depends(require_admin)):
+    """Скачивает профиль в формате pstats (открывается snakeviz, speedscope и т.п.)"""
+    file_path = get_profile_file(profile_id)
+    if not file_path:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return FileResponse(
+        path=file_path,
+        filename=f"{profile_id}.prof",
+        media_type="application/octet-stream"
+    )
+
+@router.delete("/{profile_id}")
+def delete_profile_route(profile_id: str, admin=Depends(require_admin)):
+    """Удаляет сохраненный профиль"""
+    if not delete_profile(profile_id):
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return {"message": "Профиль удален"}
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
+from app.core.config import settings as app_settings
 from app.core.db import get_db
 from app.services.settings_service import SettingsService
 from app.api.auth import get_current_user
@@ -62,6 +63,22 @@ async def get_settings(
         ]
     }
 
+@router.get("/batch")
+async def get_settings_batch(
+    keys: List[str] = Query(..., description="Ключи: ?keys=a&keys=b или ?keys=a,b"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Получает значения нескольких настроек одним запросом"""
+    requested = list(dict.fromkeys(key.strip() for item in keys for key in item.split(",") if key.strip()))
+    if len(requested) > app_settings.SETTINGS_BATCH_MAX_KEYS:
+        raise HTTPException(status_code=400, detail=f"Не больше {app_settings.SETTINGS_BATCH_MAX_KEYS} ключей за запрос")
+    values = SettingsService(db).get_settings(requested)
+    return {
+        "data": {key: value for key, value in values.items() if value is not None},
+        "missing": [key for key, value in values.items() if value is None]
+    }
+
 @router.get("/{key}")
 async def get_setting(
     key: str,
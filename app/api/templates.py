@@ -1,21 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List
 import os
 import shutil
 import zipfile
-from app.core.db import get_db
+from app.core.db import get_db, get_async_db
 from app.models.template import Template
 from app.models.folder import Folder
-from app.services.template_service import TemplateService
-from app.services.placeholder_service import PlaceholderService
+from app.services.template_service import (
+    TemplateService,
+    get_all_templates_async,
+    get_templates_by_folder_async,
+    get_template_by_id_async
+)
+from app.services.placeholder_service import PlaceholderService, get_descriptions_dict_async
+from app.services.blob_service import write_upload_blob
+from app.services.artifact_service import register_artifact, artifact_path
+from app.services.permission_service import AccessMap, get_current_access, require_folder_access
+from app.core.pagination import PageParams, page_params, split_page, set_page_headers
+from app.core.table_versions import get_versions_async, make_etag, is_not_modified, not_modified
+from app.core.security import CurrentUser
+from app.core.config import settings
+from app.core.file_delivery import deliver_file, strong_etag, file_sha256
+from app.services.audit_service import audit
 from app.api.auth import get_current_user
 from app.models.user import User
 import datetime
 
 router = APIRouter(prefix="/templates", tags=["templates"])
 
+# Список шаблонов зависит и от прав пользователя на папки
+TEMPLATE_LIST_TABLES = ("templates", "folders", "permissions")
+
 def format_datetime(dt):
     """Форматирует дату в читаемый формат для фронтенда"""
     if dt is None:
@@ -41,9 +58,18 @@ async def upload_template(
     if not folder:
         raise HTTPException(status_code=404, detail="Папка не найдена")
     
+    # Поток загрузки пишется на диск по частям с подсчетом хеша и размера
+    content_hash, size, temp_path = await write_upload_blob(file, settings.TEMPLATE_UPLOAD_MAX_BYTES)
+    
     try:
         template_service = TemplateService(db)
-        template = template_service.upload_template(file, folder_id, current_user.id)
+        template = template_service.upload_template(
+            file.filename, content_hash, size, temp_path, folder_id, current_user.id
+        )
+        audit(current_user.id, "upload", "template", template.id, {
+            "filename": template.filename,
+            "folder_id": template.folder_id,
+        })
         
         return {
             "message": "Шаблон успешно загружен",
@@ -51,6 +77,8 @@ async def upload_template(
                 "id": template.id,
                 "filename": template.filename,
                 "folder_id": template.folder_id,
+                "content_hash": template.content_hash,
+                "size": template.size,
                 "uploaded_at": format_datetime(template.uploaded_at)
             }
         }
@@ -58,10 +86,21 @@ async def upload_template(
         raise HTTPException(status_code=500, detail=f"Ошибка загрузки шаблона: {str(e)}")
 
 @router.get("/", response_model=None)
-async def get_templates(db: Session = Depends(get_db)):
-    """Получает все шаблоны"""
-    template_service = TemplateService(db)
-    templates = template_service.get_all_templates()
+async def get_templates(
+    request: Request,
+    db=Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    access: AccessMap = Depends(get_current_access),
+    page: PageParams = Depends(page_params)
+):
+    """Получает шаблоны из доступных пользователю папок (постранично)"""
+    versions = await get_versions_async(db, TEMPLATE_LIST_TABLES)
+    etag = make_etag(versions, current_user.id, access.digest(), page.limit, page.raw_cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    templates = await get_all_templates_async(db, access.where(Template.folder_id), page)
+    templates, next_cursor = split_page(templates, page, lambda template: [template.id])
     
     result = {
         "data": [
@@ -75,13 +114,28 @@ async def get_templates(db: Session = Depends(get_db)):
             for template in templates
         ]
     }
-    return JSONResponse(content=result)
+    response = JSONResponse(content=result)
+    set_page_headers(response, next_cursor, etag)
+    return response
 
 @router.get("/folder/{folder_id}", response_model=None)
-async def get_templates_by_folder(folder_id: int, db: Session = Depends(get_db)):
-    """Получает шаблоны в папке"""
-    template_service = TemplateService(db)
-    templates = template_service.get_templates_by_folder(folder_id)
+async def get_templates_by_folder(
+    folder_id: int,
+    request: Request,
+    db=Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    access: AccessMap = Depends(get_current_access),
+    page: PageParams = Depends(page_params)
+):
+    """Получает шаблоны в папке (постранично)"""
+    require_folder_access(access, folder_id, "view")
+    versions = await get_versions_async(db, ("templates",))
+    etag = make_etag(versions, folder_id, page.limit, page.raw_cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    templates = await get_templates_by_folder_async(db, folder_id, page)
+    templates, next_cursor = split_page(templates, page, lambda template: [template.id])
     
     result = {
         "data": [
@@ -95,7 +149,9 @@ async def get_templates_by_folder(folder_id: int, db: Session = Depends(get_db))
             for template in templates
         ]
     }
-    return JSONResponse(content=result)
+    response = JSONResponse(content=result)
+    set_page_headers(response, next_cursor, etag)
+    return response
 
 @router.delete("/{template_id}")
 async def delete_template(
@@ -113,16 +169,20 @@ async def delete_template(
     if template.uploaded_by != current_user.id:
         raise HTTPException(status_code=403, detail="Нет прав для удаления этого шаблона")
     
+    filename, folder_id = template.filename, template.folder_id
     success = template_service.delete_template(template_id)
     if not success:
         raise HTTPException(status_code=500, detail="Ошибка удаления шаблона")
+    audit(current_user.id, "delete", "template", template_id, {"filename": filename, "folder_id": folder_id})
     
     return {"message": "Шаблон успешно удален"}
 
 @router.get("/{template_id}/download")
 async def download_template(
     template_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
+    access: AccessMap = Depends(get_current_access),
     db: Session = Depends(get_db)
 ):
     """Скачивает шаблон"""
@@ -131,17 +191,25 @@ async def download_template(
     
     if not template:
         raise HTTPException(status_code=404, detail="Шаблон не найден")
+    require_folder_access(access, template.folder_id, "view")
     
     file_path = template_service._get_template_file_path(template)
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Файл шаблона не найден")
     
-    return FileResponse(
-        path=file_path,
-        filename=template.filename,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    # Сильный ETag из хеша содержимого: повторное скачивание - 304, докачка - Range
+    etag = strong_etag(template.content_hash or file_sha256(file_path))
+    response = deliver_file(
+        request,
+        file_path,
+        template.filename,
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        etag=etag
     )
+    if response.status_code == 200:
+        audit(current_user.id, "download", "template", template.id, {"filename": template.filename})
+    return response
 
 @router.get("/{template_id}/fields")
 async def get_template_fields(template_id: int, db: Session = Depends(get_db)):
@@ -172,10 +240,12 @@ async def get_template_fields(template_id: int, db: Session = Depends(get_db)):
 @router.post("/{template_id}/generate")
 async def generate_document(
     template_id: int,
+    request: Request,
     values: str = Form(...),  # JSON строка с значениями
     output_format: str = Form("docx"),
     filename_template: str = Form(None),  # Шаблон названия файла
     current_user: User = Depends(get_current_user),
+    access: AccessMap = Depends(get_current_access),
     db: Session = Depends(get_db)
 ):
     """Генерирует документ из шаблона"""
@@ -186,6 +256,7 @@ async def generate_document(
     
     if not template:
         raise HTTPException(status_code=404, detail="Шаблон не найден")
+    require_folder_access(access, template.folder_id, "view")
     
     try:
         # Парсим JSON с значениями
@@ -197,6 +268,7 @@ async def generate_document(
             values=values_dict,
             output_format=output_format
         )
+        work_dir = os.path.dirname(output_path)
         
         # Формируем название файла
         if filename_template:
@@ -223,10 +295,25 @@ async def generate_document(
         else:
             filename = os.path.basename(output_path)
         
-        return FileResponse(
-            path=output_path,
-            filename=filename,
-            media_type="application/octet-stream"
+        # Документ сохраняется в хранилище результатов (GET /artifacts/{id})
+        try:
+            artifact = register_artifact(db, output_path, filename, "application/octet-stream",
+                                         current_user.id, "document")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        audit(current_user.id, "generate", "template", template_id, {
+            "output_format": output_format,
+            "filename": filename,
+            "artifact_id": artifact.id,
+        })
+        
+        return deliver_file(
+            request,
+            artifact_path(artifact.id),
+            artifact.filename,
+            artifact.media_type,
+            etag=strong_etag(artifact.content_hash),
+            headers={"X-Artifact-Id": artifact.id}
         )
         
     except json.JSONDecodeError:
@@ -237,16 +324,15 @@ async def generate_document(
 @router.get("/{template_id}/placeholder-descriptions")
 async def get_placeholder_descriptions(
     template_id: int,
-    db: Session = Depends(get_db)
+    db=Depends(get_async_db)
 ):
     """Получает описания плейсхолдеров для шаблона"""
     # Проверяем существование шаблона
-    template = db.query(Template).filter(Template.id == template_id).first()
+    template = await get_template_by_id_async(db, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Шаблон не найден")
     
-    placeholder_service = PlaceholderService(db)
-    descriptions = placeholder_service.get_descriptions_dict(template_id)
+    descriptions = await get_descriptions_dict_async(db, template_id)
     
     return {"data": descriptions}
 
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app.core.db import get_db
 from app.models.user import User
 from app.schemas.user import UserOut
 from app.core.security import require_admin
 from app.services.user_service import make_admin
+from app.core.pagination import PageParams, page_params, keyset, split_page, set_page_headers
+from app.core.table_versions import get_versions, make_etag, is_not_modified, not_modified
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -14,8 +16,13 @@ class MakeAdminRequest(BaseModel):
     is_admin: bool
 
 @router.get("/", response_model=list[UserOut])
-def list_users(db: Session = Depends(get_db), admin: User = Depends(require_admin)):
-    return db.query(User).all()
+def list_users(request: Request, response: Response, db: Session = Depends(get_db), admin: User = Depends(require_admin), page: PageParams = Depends(page_params)):
+    etag = make_etag(get_versions(db, ("users",)), page.limit, page.raw_cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    users, next_cursor = split_page(keyset(db.query(User), page, [User.id]).all(), page, lambda user: [user.id])
+    set_page_headers(response, next_cursor, etag)
+    return users
 
 @router.get("/{user_id}", response_model=UserOut)
 def get_user(user_id: int, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
@@ -5,7 +5,99 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "supersecretkey")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24
+    # Хэширование паролей: стоимость bcrypt и размер отдельного пула
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+    # Кэш пользователей в get_current_user (в пределах одного воркера)
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+    # Кэш эффективных прав пользователей на папки (в пределах одного воркера)
+    PERMISSION_CACHE_TTL_SECONDS: float = float(os.getenv("PERMISSION_CACHE_TTL_SECONDS", "60"))
+    PERMISSION_CACHE_MAX_SIZE: int = int(os.getenv("PERMISSION_CACHE_MAX_SIZE", "1024"))
+    # Keyset-пагинация списков
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+    # Журнал действий: срок хранения в месяцах (0 - хранить всё) и запас месячных секций
+    ACTION_LOG_RETENTION_MONTHS: int = int(os.getenv("ACTION_LOG_RETENTION_MONTHS", "12"))
+    ACTION_LOG_PARTITIONS_AHEAD: int = int(os.getenv("ACTION_LOG_PARTITIONS_AHEAD", "2"))
+    # Буферизованная запись журнала: размер пачки, интервал и предел буфера воркера
+    AUDIT_FLUSH_SIZE: int = int(os.getenv("AUDIT_FLUSH_SIZE", "100"))
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "2"))
+    AUDIT_MAX_BUFFER: int = int(os.getenv("AUDIT_MAX_BUFFER", "10000"))
+    # Сколько раз подряд пачка журнала повторяется целиком, прежде чем писать ее по одному событию
+    AUDIT_FLUSH_RETRIES: int = int(os.getenv("AUDIT_FLUSH_RETRIES", "3"))
+    # Как часто снимок настроек сверяет версию таблицы settings (согласованность воркеров)
+    SETTINGS_VERSION_CHECK_SECONDS: float = float(os.getenv("SETTINGS_VERSION_CHECK_SECONDS", "1"))
+    SETTINGS_BATCH_MAX_KEYS: int = int(os.getenv("SETTINGS_BATCH_MAX_KEYS", "100"))
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./service.db")
+    # Пул соединений (на каждый воркер uvicorn)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Асинхронный engine (asyncpg) для read-эндпоинтов шаблонов и папок
+    DB_ASYNC_ENABLED: bool = os.getenv("DB_ASYNC_ENABLED", "false").lower() in ("1", "true", "yes")
+    ASYNC_DATABASE_URL: str = os.getenv(
+        "ASYNC_DATABASE_URL",
+        DATABASE_URL.replace("postgresql+psycopg2://", "postgresql://", 1).replace("postgresql://", "postgresql+asyncpg://", 1)
+    )
     TEMPLATES_DIR: str = os.getenv("TEMPLATES_DIR", "templates")
+    # Хранилище содержимого шаблонов по SHA-256: <dir>/ab/cd/<hash>
+    TEMPLATE_BLOBS_DIR: str = os.getenv("TEMPLATE_BLOBS_DIR", os.path.join(TEMPLATES_DIR, "blobs"))
+    # Лимиты загрузок (байт): шаблоны .docx и книги Excel для генерации актов
+    TEMPLATE_UPLOAD_MAX_BYTES: int = int(os.getenv("TEMPLATE_UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+    WORKBOOK_UPLOAD_MAX_BYTES: int = int(os.getenv("WORKBOOK_UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    # Хранилище результатов генерации (внутри TEMPLATES_DIR - для X-Accel-Redirect)
+    ARTIFACTS_DIR: str = os.getenv("ARTIFACTS_DIR", os.path.join(TEMPLATES_DIR, "artifacts"))
+    ARTIFACT_TTL_HOURS: float = float(os.getenv("ARTIFACT_TTL_HOURS", "24"))
+    ARTIFACTS_MAX_BYTES: int = int(os.getenv("ARTIFACTS_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+    ARTIFACT_REAPER_INTERVAL_SECONDS: float = float(os.getenv("ARTIFACT_REAPER_INTERVAL_SECONDS", "600"))
+    # Рабочие каталоги пакетов старше этого срока считаются брошенными (падение воркера)
+    ARTIFACT_WORK_MAX_AGE_HOURS: float = float(os.getenv("ARTIFACT_WORK_MAX_AGE_HOURS", "6"))
+    # Кэш отрендеренных документов: ключ - хеш шаблона, значений и формата
+    RENDER_CACHE_ENABLED: bool = os.getenv("RENDER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    RENDER_CACHE_DIR: str = os.getenv("RENDER_CACHE_DIR", os.path.join(TEMPLATES_DIR, "render_cache"))
+    RENDER_CACHE_MAX_BYTES: int = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    # Документы последнего прогона по отпечаткам строк (инкрементальная генерация);
+    # отпечатки, не обновлявшиеся дольше срока хранения, удаляются вместе с документами
+    ACT_OUTPUTS_DIR: str = os.getenv("ACT_OUTPUTS_DIR", os.path.join(TEMPLATES_DIR, "act_outputs"))
+    ACT_OUTPUTS_RETENTION_DAYS: float = float(os.getenv("ACT_OUTPUTS_RETENTION_DAYS", "90"))
+    # Число шаблонов в одном пакете /acts/generate (акт, счет, письмо по одной строке)
+    ACTS_MAX_TEMPLATES: int = int(os.getenv("ACTS_MAX_TEMPLATES", "10"))
+    # Скомпилированные шаблоны Jinja: в памяти воркера (число разных исходников) и байткод на диске
+    JINJA_TEMPLATE_CACHE_SIZE: int = int(os.getenv("JINJA_TEMPLATE_CACHE_SIZE", "64"))
+    JINJA_BYTECODE_CACHE_DIR: str = os.getenv("JINJA_BYTECODE_CACHE_DIR", os.path.join(TEMPLATES_DIR, "jinja_cache"))
+    # Отдача файлов через nginx (X-Accel-Redirect): файлы внутри FILE_ACCEL_ROOT
+    # отдает внутренний location FILE_ACCEL_PREFIX (см. nginx/nginx.conf)
+    FILE_ACCEL_ENABLED: bool = os.getenv("FILE_ACCEL_ENABLED", "false").lower() in ("1", "true", "yes")
+    FILE_ACCEL_ROOT: str = os.getenv("FILE_ACCEL_ROOT", TEMPLATES_DIR)
+    FILE_ACCEL_PREFIX: str = os.getenv("FILE_ACCEL_PREFIX", "/_protected/templates/")
+    # Манифесты пакетов генерации актов (по строкам: статус, файл, время, ошибка)
+    MANIFESTS_DIR: str = os.getenv("MANIFESTS_DIR", os.path.join(TEMPLATES_DIR, "manifests"))
+    LIBREOFFICE_PATH: str = os.getenv("LIBREOFFICE_PATH", "/usr/bin/libreoffice")
+    DEBUG: bool = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+    # Профилирование отдельных запросов администраторами
+    PROFILES_DIR: str = os.getenv("PROFILES_DIR", "profiles")
+    PROFILE_HEADER: str = "X-Profile"
+    PROFILE_QUERY_PARAM: str = "profile"
+    # Учет памяти при генерации актов
+    MEMORY_TRACEMALLOC: bool = os.getenv("MEMORY_TRACEMALLOC", "false").lower() in ("1", "true", "yes")
+    MEMORY_TOP_ALLOCATORS: int = int(os.getenv("MEMORY_TOP_ALLOCATORS", "10"))
+    # Учет SQL-запросов: заголовки X-DB-* в режиме отладки и порог повторов для N+1
+    SQL_DEBUG_HEADERS: bool = DEBUG
+    SQL_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+    # Проверка готовности (/ready)
+    READINESS_CACHE_SECONDS: float = float(os.getenv("READINESS_CACHE_SECONDS", "5"))
+    READINESS_CONVERTER_CACHE_SECONDS: float = float(os.getenv("READINESS_CONVERTER_CACHE_SECONDS", "60"))
+    READINESS_CHECK_CONVERTER: bool = os.getenv("READINESS_CHECK_CONVERTER", "true").lower() in ("1", "true", "yes")
+    READINESS_DB_MAX_LATENCY_MS: float = float(os.getenv("READINESS_DB_MAX_LATENCY_MS", "500"))
+    READINESS_MIN_FREE_MB: float = float(os.getenv("READINESS_MIN_FREE_MB", "500"))
+    READINESS_MAX_THREADPOOL_UTILIZATION: float = float(os.getenv("READINESS_MAX_THREADPOOL_UTILIZATION", "0.9"))
+    # Проверка в threadpool дольше этого срока считается неуспешной (конвертер - свой срок)
+    READINESS_TIMEOUT_SECONDS: float = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+    READINESS_CONVERTER_TIMEOUT_SECONDS: float = float(os.getenv("READINESS_CONVERTER_TIMEOUT_SECONDS", "30"))
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
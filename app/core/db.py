@@ -1,14 +1,66 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core import query_counter
 
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {})
+def _engine_options() -> dict:
+    """Параметры пула соединений (для SQLite пул не настраивается)"""
+    if settings.DATABASE_URL.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options())
+query_counter.install(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Асинхронный engine (asyncpg) для read-эндпоинтов, включается DB_ASYNC_ENABLED
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC_ENABLED:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, **_engine_options())
+    query_counter.install(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+class ThreadpoolSession:
+    """Асинхронный интерфейс к обычной Session для режима без asyncpg.
+
+    Запросы выполняются в threadpool, поэтому read-эндпоинты пишутся
+    одинаково: ``result = await db.execute(select(...))``.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.session.scalar, statement, *args, **kwargs)
+
+async def get_async_db():
+    """Сессия для read-эндпоинтов: AsyncSession (asyncpg) или ThreadpoolSession"""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield session
+    else:
+        db = SessionLocal()
+        try:
+            yield ThreadpoolSession(db)
+        finally:
+            db.close()
@@ -0,0 +1,115 @@
+import os
+import re
+import hashlib
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+import aiofiles
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from app.core.config import settings
+
+# Отдача файлов клиенту. Файлы внутри FILE_ACCEL_ROOT при включенном
+# FILE_ACCEL_ENABLED отдает nginx (X-Accel-Redirect во внутренний location
+# FILE_ACCEL_PREFIX): воркер uvicorn освобождается сразу, Range и повторные
+# запросы обслуживает nginx. Без nginx файл отдается из Python с теми же
+# ETag и поддержкой одного диапазона Range.
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def strong_etag(content_hash: str) -> str:
+    return f'"{content_hash}"'
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 файла (для файлов, хеш которых не хранится в БД)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(settings.UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = {value.strip() for value in header.split(",")}
+    # If-None-Match сравнивается слабо: W/ у кандидата не учитывается
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _content_disposition(filename: str) -> str:
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+def _accel_uri(path: str) -> Optional[str]:
+    if not settings.FILE_ACCEL_ENABLED:
+        return None
+    root = os.path.realpath(settings.FILE_ACCEL_ROOT)
+    real_path = os.path.realpath(path)
+    if os.path.commonpath([root, real_path]) != root:
+        return None
+    relative = os.path.relpath(real_path, root).replace(os.sep, "/")
+    return settings.FILE_ACCEL_PREFIX.rstrip("/") + "/" + quote(relative)
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Один диапазон bytes=start-end; None - заголовок не поддерживается (отдаем файл целиком)"""
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # Суффикс: последние N байт
+        length = int(end)
+        return max(size - length, 0), size - 1
+    end = min(int(end), size - 1) if end else size - 1
+    return int(start), end
+
+
+async def _iter_file(path: str, start: int, length: int):
+    async with aiofiles.open(path, "rb") as source:
+        await source.seek(start)
+        while length > 0:
+            chunk = await source.read(min(settings.UPLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def deliver_file(request: Request, path: str, filename: str, media_type: str,
+                 etag: Optional[str] = None, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Ответ с файлом: 304 по If-None-Match, X-Accel-Redirect или отдача из Python с Range"""
+    response_headers = dict(headers or {})
+    response_headers["Accept-Ranges"] = "bytes"
+    if etag:
+        response_headers["ETag"] = etag
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+    accel_uri = _accel_uri(path)
+    if accel_uri:
+        response_headers["X-Accel-Redirect"] = accel_uri
+        response_headers["Content-Disposition"] = _content_disposition(filename)
+        return Response(status_code=200, media_type=media_type, headers=response_headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # Range применяется, только если файл не изменился с момента первой части
+    if range_header and (not if_range or (etag and if_range.strip() == etag)):
+        size = os.path.getsize(path)
+        byte_range = _parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            if start >= size or start > end:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+            response_headers.update({
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+                "Content-Disposition": _content_disposition(filename),
+            })
+            return StreamingResponse(_iter_file(path, start, end - start + 1), status_code=206,
+                                     media_type=media_type, headers=response_headers)
+
+    return FileResponse(path=path, filename=filename, media_type=media_type, headers=response_headers)
@@ -0,0 +1,141 @@
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+from app.core.config import settings
+from app.core.metrics import registry
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MB = 1024 * 1024
+
+MEMORY_BUCKETS = tuple(mb * _MB for mb in (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2000))
+
+batch_stage_rss_delta = registry.histogram(
+    "act_batch_stage_rss_delta_bytes",
+    "Прирост RSS процесса на этапе генерации пакета актов",
+    buckets=MEMORY_BUCKETS,
+)
+batch_stage_traced_peak = registry.histogram(
+    "act_batch_stage_traced_peak_bytes",
+    "Пик памяти Python (tracemalloc) на этапе генерации пакета актов",
+    buckets=MEMORY_BUCKETS,
+)
+batch_peak_rss = registry.gauge(
+    "act_batch_last_peak_rss_bytes",
+    "Максимальный RSS, зафиксированный в последнем пакете генерации",
+)
+process_max_rss = registry.gauge(
+    "process_max_rss_bytes",
+    "Максимальный RSS процесса за все время работы",
+)
+
+
+def get_rss_bytes() -> int:
+    """Текущий RSS процесса (Linux /proc, иначе пиковый RSS из getrusage)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return get_max_rss_bytes()
+
+
+def get_max_rss_bytes() -> int:
+    """Пиковый RSS процесса за все время работы"""
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На Linux значение в килобайтах, на macOS - в байтах
+    return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+
+
+class MemoryTracker:
+    """Учет потребления памяти по этапам генерации пакета актов.
+
+    Для каждого этапа фиксируется RSS до и после, а при включенном
+    tracemalloc - пик памяти Python и топ мест выделения.
+    """
+
+    def __init__(self, use_tracemalloc: Optional[bool] = None, top_allocators: int = None):
+        if use_tracemalloc is None:
+            use_tracemalloc = settings.MEMORY_TRACEMALLOC
+        self.use_tracemalloc = use_tracemalloc
+        self.top_allocators = top_allocators or settings.MEMORY_TOP_ALLOCATORS
+        self.stages: List[Dict[str, Any]] = []
+        self.start_rss = get_rss_bytes()
+        self.peak_rss = self.start_rss
+        self._stage_peak_rss = self.start_rss
+        self._started_tracemalloc = False
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    @contextmanager
+    def stage(self, name: str):
+        rss_before = get_rss_bytes()
+        self._stage_peak_rss = rss_before
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            rss_after = get_rss_bytes()
+            self._stage_peak_rss = max(self._stage_peak_rss, rss_after)
+            info = {
+                "stage": name,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "rss_before_mb": round(rss_before / _MB, 2),
+                "rss_after_mb": round(rss_after / _MB, 2),
+                "rss_delta_mb": round((rss_after - rss_before) / _MB, 2),
+                "rss_peak_mb": round(self._stage_peak_rss / _MB, 2),
+            }
+            self.peak_rss = max(self.peak_rss, self._stage_peak_rss)
+            batch_stage_rss_delta.observe(max(rss_after - rss_before, 0), stage=name)
+            if self.use_tracemalloc and tracemalloc.is_tracing():
+                _, traced_peak = tracemalloc.get_traced_memory()
+                info["traced_peak_mb"] = round(traced_peak / _MB, 2)
+                info["top_allocators"] = self._top_allocators()
+                batch_stage_traced_peak.observe(traced_peak, stage=name)
+            self.stages.append(info)
+
+    def sample(self):
+        """Обновляет пиковый RSS внутри длительного этапа (например, на каждой строке)"""
+        self._stage_peak_rss = max(self._stage_peak_rss, get_rss_bytes())
+
+    def _top_allocators(self) -> List[Dict[str, Any]]:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        return [
+            {"location": str(stat.traceback), "size_mb": round(stat.size / _MB, 2), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:self.top_allocators]
+        ]
+
+    def finish(self) -> Dict[str, Any]:
+        """Завершает учет, публикует метрики и возвращает отчет"""
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        end_rss = get_rss_bytes()
+        self.peak_rss = max(self.peak_rss, end_rss)
+        batch_peak_rss.set(self.peak_rss)
+        process_max_rss.set(get_max_rss_bytes())
+        return self.report(end_rss)
+
+    def report(self, end_rss: int = None) -> Dict[str, Any]:
+        if end_rss is None:
+            end_rss = get_rss_bytes()
+        return {
+            "start_rss_mb": round(self.start_rss / _MB, 2),
+            "end_rss_mb": round(end_rss / _MB, 2),
+            "peak_rss_mb": round(self.peak_rss / _MB, 2),
+            "rss_delta_mb": round((end_rss - self.start_rss) / _MB, 2),
+            "stages": self.stages,
+        }
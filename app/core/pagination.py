@@ -0,0 +1,92 @@
+import json
+import base64
+import binascii
+import datetime
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import tuple_
+from app.core.config import settings
+
+# Keyset-пагинация: вместо OFFSET клиент передает курсор - значения ключа
+# сортировки последней строки предыдущей страницы. Запрос следующей страницы
+# использует индекс и не зависит от ее номера. Тело ответа не меняется,
+# курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass(frozen=True)
+class PageParams:
+    limit: int
+    cursor: Optional[List[Any]]
+    raw_cursor: Optional[str]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime.datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    return values
+
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+) -> PageParams:
+    """Зависимость FastAPI: параметры страницы"""
+    size = min(limit or settings.PAGE_SIZE_DEFAULT, settings.PAGE_SIZE_MAX)
+    return PageParams(limit=size, cursor=decode_cursor(cursor) if cursor else None, raw_cursor=cursor)
+
+
+def _coerce(column, value):
+    """Возвращает значению курсора тип колонки (даты в курсоре хранятся строкой)"""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime.datetime and isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+    if python_type is int and not isinstance(value, int):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    return value
+
+
+def keyset(statement, page: PageParams, columns: Sequence, descending: bool = False):
+    """Добавляет к select/query условие курсора, сортировку и LIMIT (на одну строку больше)"""
+    if page.cursor is not None:
+        if len(page.cursor) != len(columns):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+        values = [_coerce(column, value) for column, value in zip(columns, page.cursor)]
+        key = tuple_(*columns) if len(columns) > 1 else columns[0]
+        value = tuple_(*values) if len(columns) > 1 else values[0]
+        statement = statement.filter(key < value if descending else key > value)
+    order = [column.desc() if descending else column.asc() for column in columns]
+    return statement.order_by(*order).limit(page.limit + 1)
+
+
+def split_page(rows: List[Any], page: PageParams, key) -> Tuple[List[Any], Optional[str]]:
+    """Отрезает лишнюю строку и возвращает курсор следующей страницы (или None)"""
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[:page.limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+
+def set_page_headers(response: Response, next_cursor: Optional[str], etag: Optional[str] = None):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if etag:
+        response.headers["ETag"] = etag
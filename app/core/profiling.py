@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import uuid
+import cProfile
+import datetime
+from typing import List, Dict, Any, Optional
+from urllib.parse import parse_qs
+from fastapi import Request, HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.core.db import SessionLocal
+
+PROFILE_ID_HEADER = "X-Profile-Id"
+_FLAG_VALUES = ("1", "true", "yes", "on")
+_HEADER_NAME = settings.PROFILE_HEADER.lower().encode("latin-1")
+_QUERY_MARKER = f"{settings.PROFILE_QUERY_PARAM}=".encode("latin-1")
+# cProfile - один на поток: второй активный профилировщик в event loop
+# падает (3.12) или перехватывает первый (3.11), поэтому профиль в воркере один
+_profile_active = False
+
+
+def _profiling_requested(scope) -> bool:
+    """Проверяет, запрошено ли профилирование заголовком или query-параметром"""
+    query_string = scope.get("query_string", b"")
+    if _QUERY_MARKER in query_string:
+        values = parse_qs(query_string.decode("latin-1")).get(settings.PROFILE_QUERY_PARAM, [])
+        if any(value.lower() in _FLAG_VALUES for value in values):
+            return True
+    for name, value in scope.get("headers", []):
+        if name == _HEADER_NAME:
+            return value.decode("latin-1").lower() in _FLAG_VALUES
+    return False
+
+
+def _is_admin_request(scope) -> bool:
+    """Проверяет, что запрос выполняет активный администратор (синхронно, вызывать в threadpool)"""
+    db = SessionLocal()
+    try:
+        user = get_current_user(Request(scope), db)
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+    return bool(user.is_admin)
+
+
+def _get_profile_path(profile_id: str) -> str:
+    return os.path.join(settings.PROFILES_DIR, f"{profile_id}.prof")
+
+
+def _get_meta_path(profile_id: str) -> str:
+    return os.path.join(settings.PROFILES_DIR, f"{profile_id}.json")
+
+
+def _save_profile(profile_id: str, profiler: cProfile.Profile, meta: Dict[str, Any]) -> None:
+    os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+    profiler.dump_stats(_get_profile_path(profile_id))
+    with open(_get_meta_path(profile_id), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware для профилирования отдельных запросов администраторов.
+
+    Профилирование включается заголовком ``X-Profile: 1`` или параметром
+    ``?profile=1``. Результат сохраняется в формате pstats в PROFILES_DIR,
+    а его идентификатор возвращается в заголовке ``X-Profile-Id``.
+    cProfile охватывает только поток event loop, поэтому sync-эндпоинты,
+    выполняемые в threadpool, попадут в профиль лишь частично, а корутины
+    других запросов, выполнявшиеся в это время, - попадут. Пока идет
+    профилирование, запросы с флагом выполняются без профиля.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Обычные запросы проходят без какой-либо дополнительной работы
+        if scope["type"] != "http" or not _profiling_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # JWT и запрос пользователя - вне event loop: флаг может прислать кто угодно
+        if not await run_in_threadpool(_is_admin_request, scope):
+            await self.app(scope, receive, send)
+            return
+
+        global _profile_active
+        if _profile_active:
+            print(f"Профилирование уже выполняется, {scope.get('method')} {scope.get('path')} - без профиля")
+            await self.app(scope, receive, send)
+            return
+        # Проверка и установка флага без await между ними - атомарны в event loop
+        _profile_active = True
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            _profile_active = False
+
+    async def _profile(self, scope, receive, send):
+
+        profile_id = f"{datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        status_code = None
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER.lower().encode("latin-1"), profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.disable()
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            try:
+                _save_profile(profile_id, profiler, {
+                    "id": profile_id,
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "query_string": scope.get("query_string", b"").decode("latin-1"),
+                    "status_code": status_code,
+                    "duration_ms": duration_ms,
+                    "created_at": datetime.datetime.utcnow().isoformat(),
+                })
+                print(f"Профиль запроса {scope.get('method')} {scope.get('path')} сохранен: {profile_id}")
+            except Exception as e:
+                print(f"Не удалось сохранить профиль запроса: {e}")
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Возвращает метаданные сохраненных профилей, новые сначала"""
+    if not os.path.isdir(settings.PROFILES_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(settings.PROFILES_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(settings.PROFILES_DIR, name), encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda p: p.get("id", ""), reverse=True)
+
+
+def get_profile_file(profile_id: str) -> Optional[str]:
+    """Возвращает путь к файлу профиля или None, если он не найден"""
+    # Не допускаем выхода за пределы PROFILES_DIR
+    if os.path.basename(profile_id) != profile_id:
+        return None
+    path = _get_profile_path(profile_id)
+    return path if os.path.exists(path) else None
+
+
+def delete_profile(profile_id: str) -> bool:
+    """Удаляет профиль и его метаданные"""
+    path = get_profile_file(profile_id)
+    if not path:
+        return False
+    os.remove(path)
+    meta_path = _get_meta_path(profile_id)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    return True
@@ -0,0 +1,160 @@
+import re
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.core.metrics import registry
+
+# Учет SQL-запросов в рамках одного HTTP-запроса (или блока кода в тестах).
+# Статистика хранится в contextvar: FastAPI копирует контекст в threadpool,
+# поэтому запросы из sync-эндпоинтов и зависимостей тоже учитываются.
+
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request",
+    "Количество SQL-запросов на один HTTP-запрос",
+    buckets=QUERY_BUCKETS,
+)
+db_time_per_request = registry.histogram(
+    "db_time_per_request_seconds",
+    "Суммарное время SQL-запросов на один HTTP-запрос",
+)
+db_n_plus_one_total = registry.counter(
+    "db_n_plus_one_total",
+    "Количество HTTP-запросов, в которых один и тот же SQL повторялся подозрительно часто",
+)
+
+_NUMBER_RE = re.compile(r"\b\d+\b")
+
+
+class QueryStats:
+    """Статистика SQL-запросов: количество, суммарное время и повторы"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        # Литералы заменяем, чтобы одинаковые запросы с разными id считались повтором
+        normalized = _NUMBER_RE.sub("?", " ".join(statement.split()))
+        self.statements[normalized] = self.statements.get(normalized, 0) + 1
+
+    def repeated_statements(self, threshold: int = None) -> Dict[str, int]:
+        """Запросы, повторенные не менее threshold раз (признак N+1)"""
+        if threshold is None:
+            threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+
+_current_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+# Глобальные сборщики из count_queries(): видят запросы всех потоков,
+# включая поток приложения внутри TestClient
+_global_collectors: List[QueryStats] = []
+_collectors_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None or _global_collectors:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None and not _global_collectors:
+        return
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+    if stats is not None:
+        stats.record(statement, duration)
+    for collector in list(_global_collectors):
+        collector.record(statement, duration)
+
+
+def install(engine: Engine):
+    """Подключает обработчики событий SQLAlchemy к engine"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def count_queries():
+    """Считает все SQL-запросы процесса, выполненные внутри блока.
+
+    Предназначено для тестов и скриптов: параллельные запросы других
+    потоков тоже попадут в статистику. Пример::
+
+        with count_queries() as stats:
+            client.get("/templates/")
+        assert stats.count <= 2
+    """
+    stats = QueryStats()
+    with _collectors_lock:
+        _global_collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _global_collectors.remove(stats)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """Проверяет, что блок укладывается в бюджет SQL-запросов"""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise AssertionError(
+            f"Превышен бюджет SQL-запросов: {stats.count} > {max_queries}. "
+            f"Повторы: {stats.repeated_statements(2)}"
+        )
+
+
+class QueryCountMiddleware:
+    """ASGI middleware: учет SQL-запросов и времени БД на каждый HTTP-запрос.
+
+    Результат публикуется в метрики, а при SQL_DEBUG_HEADERS - в заголовки
+    ``X-DB-Query-Count`` и ``X-DB-Time-Ms``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start" and settings.SQL_DEBUG_HEADERS:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode("latin-1")))
+                headers.append((b"x-db-time-ms", f"{stats.total_time * 1000:.2f}".encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            endpoint = getattr(scope.get("endpoint"), "__name__", "unknown")
+            db_queries_per_request.observe(stats.count, endpoint=endpoint)
+            db_time_per_request.observe(stats.total_time, endpoint=endpoint)
+            repeated = stats.repeated_statements()
+            if repeated:
+                db_n_plus_one_total.inc(endpoint=endpoint)
+                print(f"Возможная проблема N+1 в {scope.get('method')} {scope.get('path')}: {repeated}")
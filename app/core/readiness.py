@@ -0,0 +1,144 @@
+import os
+import time
+import shutil
+import asyncio
+import subprocess
+from typing import Dict, Any
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import registry
+
+# Глубокая проверка готовности воркера: БД, место на диске, конвертер PDF
+# и загрузка пула потоков. Результаты кэшируются на READINESS_CACHE_SECONDS,
+# чтобы частые опросы nginx/скриптов деплоя не создавали нагрузку.
+
+readiness_probe_latency = registry.gauge(
+    "readiness_probe_latency_seconds",
+    "Длительность последней проверки зависимости",
+)
+readiness_probe_ok = registry.gauge(
+    "readiness_probe_ok",
+    "Результат последней проверки зависимости (1 - ок, 0 - ошибка)",
+)
+
+_cache: Dict[str, Any] = {"checked_at": 0.0, "result": None}
+_converter_cache: Dict[str, Any] = {"checked_at": 0.0, "result": None}
+_lock = asyncio.Lock()
+
+
+def _probe_database() -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    return {
+        "ok": latency_ms <= settings.READINESS_DB_MAX_LATENCY_MS,
+        "latency_ms": latency_ms,
+        "max_latency_ms": settings.READINESS_DB_MAX_LATENCY_MS,
+    }
+
+
+def _probe_disk() -> Dict[str, Any]:
+    path = settings.TEMPLATES_DIR
+    try:
+        os.makedirs(path, exist_ok=True)
+        usage = shutil.disk_usage(path)
+    except OSError as e:
+        return {"ok": False, "error": str(e)}
+    free_mb = round(usage.free / 1024 / 1024, 2)
+    return {
+        "ok": free_mb >= settings.READINESS_MIN_FREE_MB,
+        "path": path,
+        "free_mb": free_mb,
+        "free_percent": round(usage.free / usage.total * 100, 2) if usage.total else 0,
+        "min_free_mb": settings.READINESS_MIN_FREE_MB,
+    }
+
+
+def _probe_converter() -> Dict[str, Any]:
+    # Запуск LibreOffice дорогой, поэтому результат живет дольше основного кэша
+    now = time.monotonic()
+    cached = _converter_cache["result"]
+    if cached is not None and now - _converter_cache["checked_at"] < settings.READINESS_CONVERTER_CACHE_SECONDS:
+        return cached
+
+    path = settings.LIBREOFFICE_PATH
+    if not (os.path.isfile(path) and os.access(path, os.X_OK)):
+        result = {"ok": False, "path": path, "error": "LibreOffice не найден"}
+    else:
+        try:
+            completed = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=30)
+            result = {"ok": completed.returncode == 0, "path": path, "version": completed.stdout.strip()}
+            if completed.returncode != 0:
+                result["error"] = completed.stderr.strip()
+        except (OSError, subprocess.TimeoutExpired) as e:
+            result = {"ok": False, "path": path, "error": str(e)}
+
+    _converter_cache.update(checked_at=now, result=result)
+    return result
+
+
+async def _probe_executor() -> Dict[str, Any]:
+    import anyio.to_thread
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    in_use = limiter.borrowed_tokens
+    total = limiter.total_tokens
+    # Задержка event loop показывает, не заблокирован ли он синхронной работой
+    started = time.perf_counter()
+    await asyncio.sleep(0)
+    loop_lag_ms = round((time.perf_counter() - started) * 1000, 2)
+    utilization = in_use / total if total else 0
+    return {
+        "ok": utilization < settings.READINESS_MAX_THREADPOOL_UTILIZATION,
+        "threadpool_in_use": in_use,
+        "threadpool_size": total,
+        "utilization": round(utilization, 2),
+        "event_loop_lag_ms": loop_lag_ms,
+    }
+
+
+async def _timed(name: str, coro, timeout: float = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(coro, timeout) if timeout else await coro
+    except asyncio.TimeoutError:
+        # Поток проверки продолжит работу, но ответ /ready не ждет его
+        result = {"ok": False, "error": f"Проверка не уложилась в {timeout:g} с"}
+    readiness_probe_latency.set(time.perf_counter() - started, probe=name)
+    readiness_probe_ok.set(1 if result.get("ok") else 0, probe=name)
+    return result
+
+
+async def check_readiness() -> Dict[str, Any]:
+    """Выполняет (или берет из кэша) проверки зависимостей воркера"""
+    async with _lock:
+        now = time.monotonic()
+        if _cache["result"] is not None and now - _cache["checked_at"] < settings.READINESS_CACHE_SECONDS:
+            return _cache["result"]
+
+        # Пул потоков проверяется первым: при насыщении проверки в threadpool
+        # ждали бы свободного потока, и /ready не ответил бы вовремя
+        checks = {"executor": await _timed("executor", _probe_executor())}
+        threaded = ["database", "disk"] + (["converter"] if settings.READINESS_CHECK_CONVERTER else [])
+        if not checks["executor"]["ok"]:
+            for name in threaded:
+                checks[name] = {"ok": False, "error": "Не проверялась: пул потоков занят"}
+        else:
+            timeout = settings.READINESS_TIMEOUT_SECONDS
+            checks["database"] = await _timed("database", run_in_threadpool(_probe_database), timeout)
+            checks["disk"] = await _timed("disk", run_in_threadpool(_probe_disk), timeout)
+            if settings.READINESS_CHECK_CONVERTER:
+                checks["converter"] = await _timed("converter", run_in_threadpool(_probe_converter),
+                                                   settings.READINESS_CONVERTER_TIMEOUT_SECONDS)
+
+        result = {
+            "status": "ready" if all(check["ok"] for check in checks.values()) else "degraded",
+            "checks": checks,
+        }
+        _cache.update(checked_at=time.monotonic(), result=result)
+        return result
@@ -1,13 +1,47 @@
+import time
+import asyncio
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import Request, HTTPException, status, Depends
 from app.core.config import settings
 from app.models.user import User
-from app.core.db import SessionLocal
+from app.core.db import get_db
+from sqlalchemy.orm import Session
+from app.core.metrics import registry
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Стоимость bcrypt задается BCRYPT_ROUNDS; хэши с другой стоимостью
+# считаются устаревшими и пересчитываются при успешном входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
+
+password_hash_duration = registry.histogram(
+    "password_hash_duration_seconds",
+    "Время хэширования/проверки пароля, включая ожидание в пуле",
+)
+password_hash_pending = registry.gauge(
+    "password_hash_pending",
+    "Количество операций с паролями в пуле (выполняются и ожидают)",
+)
+password_hash_rejected = registry.counter(
+    "password_hash_rejected_total",
+    "Операции с паролями, отклоненные из-за переполнения пула",
+)
+
+# Отдельный ограниченный пул для bcrypt, чтобы вход не блокировал event loop
+# и не занимал общий threadpool FastAPI
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_pending = 0
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -15,6 +49,33 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_in_hash_pool(operation: str, func, *args):
+    global _hash_pending
+    if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        password_hash_rejected.inc(operation=operation)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Сервер перегружен, повторите попытку позже")
+    _hash_pending += 1
+    password_hash_pending.set(_hash_pending)
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+        password_hash_pending.set(_hash_pending)
+        password_hash_duration.observe(time.perf_counter() - started, operation=operation)
+
+async def get_password_hash_async(password: str) -> str:
+    """Хэширует пароль в отдельном пуле потоков"""
+    return await _run_in_hash_pool("hash", pwd_context.hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Проверяет пароль в отдельном пуле потоков.
+
+    Возвращает (результат проверки, новый хэш или None). Новый хэш
+    возвращается, если сохраненный создан с устаревшими параметрами.
+    """
+    return await _run_in_hash_pool("verify", pwd_context.verify_and_update, plain_password, hashed_password)
+
 # CSRF
 CSRF_COOKIE_NAME = "csrf_token"
 JWT_COOKIE_NAME = "access_token"
@@ -23,8 +84,66 @@ JWT_COOKIE_NAME = "access_token"
 def generate_csrf_token():
     return secrets.token_urlsafe(32)
 
-# Получение JWT из cookie и проверка пользователя
-def get_current_user(request: Request):
+@dataclass(frozen=True)
+class CurrentUser:
+    """Неизменяемый снимок активного пользователя для кэша авторизации"""
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    is_admin: bool
+    date_joined: Optional[datetime] = None
+
+    @classmethod
+    def from_model(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+            date_joined=user.date_joined
+        )
+
+# Кэш пользователей по subject токена. Каждый воркер хранит свой кэш,
+# поэтому изменения из другого процесса видны не позже USER_CACHE_TTL_SECONDS.
+_user_cache: Dict[str, Tuple[float, CurrentUser]] = {}
+_user_cache_lock = threading.Lock()
+
+def _get_cached_user(username: str) -> Optional[CurrentUser]:
+    entry = _user_cache.get(username)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if expires_at < time.monotonic():
+        with _user_cache_lock:
+            _user_cache.pop(username, None)
+        return None
+    return user
+
+def _cache_user(user: CurrentUser):
+    if settings.USER_CACHE_TTL_SECONDS <= 0:
+        return
+    with _user_cache_lock:
+        if len(_user_cache) >= settings.USER_CACHE_MAX_SIZE:
+            # Сначала выбрасываем самые старые записи
+            oldest = sorted(_user_cache.items(), key=lambda item: item[1][0])[:len(_user_cache) // 4 or 1]
+            for username, _ in oldest:
+                _user_cache.pop(username, None)
+        _user_cache[user.username] = (time.monotonic() + settings.USER_CACHE_TTL_SECONDS, user)
+
+def invalidate_user_cache(username: str = None):
+    """Сбрасывает кэш пользователя (или весь кэш, если username не указан)"""
+    with _user_cache_lock:
+        if username is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(username, None)
+
+# Получение JWT из cookie и проверка пользователя.
+# Сессия берется из get_db, поэтому эндпоинт и проверка пользователя
+# используют одно соединение на запрос.
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> CurrentUser:
     # Сначала пробуем получить токен из заголовка Authorization
     auth_header = request.headers.get("Authorization")
     token = None
@@ -46,12 +165,17 @@ def get_current_user(request: Request):
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный токен")
     
-    db = SessionLocal()
-    user = db.query(User).filter(User.username == username).first()
-    db.close()
+    user = _get_cached_user(username)
+    if user is not None:
+        return user
     
-    if user is None or not user.is_active:
+    db_user = db.query(User).filter(User.username == username).first()
+    
+    if db_user is None or not db_user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Пользователь не найден или не активирован")
+    
+    user = CurrentUser.from_model(db_user)
+    _cache_user(user)
     return user
 
 # Проверка CSRF-токена для защищённых методов
@@ -72,7 +196,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt 
 
-def require_admin(user: User = Depends(get_current_user)):
+def require_admin(user: CurrentUser = Depends(get_current_user)):
     if not user.is_admin:
         raise HTTPException(status_code=403, detail="Требуются права администратора")
     return user 
\ No newline at end of file
@@ -0,0 +1,105 @@
+import hashlib
+from typing import Dict, Iterable, Set
+from fastapi import Request, Response
+from sqlalchemy import event, inspect, select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.db import SessionLocal
+from app.models.table_version import TableVersion
+
+# Версии таблиц для ETag списков. Любая запись через ORM (flush, а также
+# массовые insert()/update()/delete() через Session.execute) увеличивает версию
+# затронутой таблицы в той же транзакции, поэтому версия общая для всех
+# воркеров и меняется атомарно с данными.
+
+TRACKED_TABLES = ("users", "folders", "templates", "permissions", "action_logs", "settings")
+
+_versions_table = TableVersion.__table__
+
+
+def _bump(connection, table_names: Set[str]):
+    if table_names:
+        connection.execute(
+            update(_versions_table)
+            .where(_versions_table.c.table_name.in_(sorted(table_names)))
+            .values(version=_versions_table.c.version + 1)
+        )
+
+
+def _changed_tables(session: Session) -> Set[str]:
+    tables = set()
+    for obj in list(session.new) + list(session.deleted):
+        tables.add(inspect(obj).mapper.local_table.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            tables.add(inspect(obj).mapper.local_table.name)
+    return tables & set(TRACKED_TABLES)
+
+
+def _after_flush(session: Session, flush_context):
+    _bump(session.connection(), _changed_tables(session))
+
+
+def _do_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None and table.name in TRACKED_TABLES:
+        _bump(orm_execute_state.session.connection(), {table.name})
+
+
+if not event.contains(Session, "after_flush", _after_flush):
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+
+
+def ensure_version_rows():
+    """Создает недостающие строки счетчиков (на случай БД без миграции 0004)"""
+    db = SessionLocal()
+    try:
+        existing = set(db.execute(select(_versions_table.c.table_name)).scalars())
+        missing = [name for name in TRACKED_TABLES if name not in existing]
+        if missing:
+            db.execute(insert(_versions_table), [{"table_name": name, "version": 0} for name in missing])
+            db.commit()
+    except IntegrityError:
+        # Строки одновременно создал другой воркер
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _versions_statement(tables: Iterable[str]):
+    return select(_versions_table.c.table_name, _versions_table.c.version).where(
+        _versions_table.c.table_name.in_(sorted(tables))
+    )
+
+
+def get_versions(db: Session, tables: Iterable[str]) -> Dict[str, int]:
+    """Текущие версии таблиц одним запросом по первичному ключу"""
+    return dict(db.execute(_versions_statement(tables)).all())
+
+
+async def get_versions_async(db, tables: Iterable[str]) -> Dict[str, int]:
+    """Асинхронный вариант get_versions (db из get_async_db)"""
+    result = await db.execute(_versions_statement(tables))
+    return dict(result.all())
+
+
+def make_etag(versions: Dict[str, int], *parts) -> str:
+    """Слабый ETag из версий таблиц и параметров ответа (пользователь, страница, фильтры)"""
+    raw = "|".join([f"{name}:{versions.get(name, 0)}" for name in sorted(versions)] + [str(part) for part in parts])
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Проверяет заголовок If-None-Match"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {value.strip() for value in header.split(",")}
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
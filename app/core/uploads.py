@@ -0,0 +1,106 @@
+import os
+import hashlib
+from typing import Dict, Tuple
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+
+# Загрузки файлов. Тело multipart разбирается Starlette во временный
+# SpooledTemporaryFile (в памяти до 1 МБ, дальше на диске); эндпоинты читают
+# его по частям, не копируя целиком в память. Превышение лимита отсекается
+# до разбора тела: по Content-Length и по фактически принятым байтам.
+
+# Запас на границы multipart и остальные поля формы сверх размера файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Файл слишком большой (максимум {round(max_bytes / (1024 * 1024), 1):g} МБ)")
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware: ограничивает размер тела запроса для путей загрузки.
+
+    limits - префикс пути -> максимальный размер файла. Запрос с большим
+    Content-Length отклоняется сразу (413), тело без Content-Length
+    считается по мере приема.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _limit_for(self, path: str):
+        for prefix, max_bytes in self.limits:
+            if path.startswith(prefix):
+                return max_bytes
+        return None
+
+    @staticmethod
+    def _reject(max_bytes: int):
+        error = _too_large(max_bytes)
+        return JSONResponse({"detail": error.detail}, status_code=error.status_code)
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        body_limit = max_bytes + MULTIPART_OVERHEAD
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > body_limit:
+                await self._reject(max_bytes)(scope, receive, send)
+                return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > body_limit:
+                    raise _too_large(max_bytes)
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+async def stream_upload(upload: UploadFile, target_path: str, max_bytes: int) -> Tuple[str, int]:
+    """Пишет загрузку в target_path по частям (aiofiles), считая SHA-256 и размер.
+
+    При превышении max_bytes файл удаляется и возвращается 413.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    await upload.seek(0)
+    async with aiofiles.open(target_path, "wb") as target:
+        while True:
+            chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                break
+            digest.update(chunk)
+            await target.write(chunk)
+    if size > max_bytes:
+        await aiofiles.os.remove(target_path)
+        raise _too_large(max_bytes)
+    return digest.hexdigest(), size
+
+
+async def spooled_upload(upload: UploadFile, max_bytes: int):
+    """Возвращает временный файл загрузки для парсеров, проверив его размер.
+
+    Парсер читает этот же файл - без промежуточной копии в памяти.
+    """
+    # Позиционирование во временном файле не читает данные
+    size = upload.file.seek(0, os.SEEK_END)
+    if size > max_bytes:
+        raise _too_large(max_bytes)
+    await upload.seek(0)
+    return upload.file
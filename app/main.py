@@ -1,6 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, folders, templates, users, permissions, logs, acts, settings
+from app.api import auth, folders, templates, users, permissions, logs, acts, settings, profiles, artifacts
+from app.core.profiling import ProfilingMiddleware
+from app.core.metrics import registry as metrics_registry
+from app.core.query_counter import QueryCountMiddleware
+from app.core.uploads import UploadLimitMiddleware
+from app.core.config import settings as app_settings
+from app.core.readiness import check_readiness
+from app.core.table_versions import ensure_version_rows
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.services.log_service import maintain_action_logs
+from app.services.audit_service import audit_writer
+from app.services.artifact_service import artifact_reaper
 
 # Импортируем все модели для правильной инициализации relationships
 from app.models import User, Folder, Template, Permission, ActionLog, PlaceholderDescription, Settings
@@ -26,8 +37,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Content-Range", "X-Artifact-Id"],
 )
 
+# Учет SQL-запросов и времени БД на каждый запрос
+app.add_middleware(QueryCountMiddleware)
+
+# Лимиты размера загрузок: отказ по Content-Length до разбора multipart
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/templates/upload": app_settings.TEMPLATE_UPLOAD_MAX_BYTES,
+    "/acts/": app_settings.WORKBOOK_UPLOAD_MAX_BYTES,
+})
+
+# Профилирование отдельных запросов по флагу администратора (X-Profile: 1 или ?profile=1)
+app.add_middleware(ProfilingMiddleware)
+
 # Подключаем роутеры
 app.include_router(auth.router)
 app.include_router(folders.router)
@@ -37,12 +61,61 @@ app.include_router(permissions.router)
 app.include_router(logs.router)
 app.include_router(acts.router)
 app.include_router(settings.router)
+app.include_router(profiles.router)
+app.include_router(artifacts.router)
+
+@app.on_event("startup")
+def prepare_table_versions():
+    # Счетчики версий таблиц для ETag списков
+    try:
+        ensure_version_rows()
+    except Exception as e:
+        print(f"Не удалось подготовить счетчики версий таблиц: {e}")
+
+@app.on_event("startup")
+def prepare_action_logs():
+    # Секции журнала наперед и удаление записей старше срока хранения
+    try:
+        print(f"Обслуживание журнала действий: {maintain_action_logs()}")
+    except Exception as e:
+        print(f"Не удалось выполнить обслуживание журнала действий: {e}")
+
+@app.on_event("startup")
+async def start_audit_writer():
+    await audit_writer.start()
+
+@app.on_event("shutdown")
+async def stop_audit_writer():
+    # Сбрасываем накопленные события журнала перед остановкой воркера
+    await audit_writer.stop()
+
+@app.on_event("startup")
+async def start_artifact_reaper():
+    # Срок хранения и квота результатов генерации, брошенные рабочие каталоги
+    await artifact_reaper.start()
+
+@app.on_event("shutdown")
+async def stop_artifact_reaper():
+    await artifact_reaper.stop()
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint for deployment scripts"""
     return {"status": "healthy", "service": "contract-management-api"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Глубокая проверка готовности: БД, диск, конвертер PDF, загрузка воркера"""
+    from fastapi.responses import JSONResponse
+    result = await check_readiness()
+    return JSONResponse(content=result, status_code=200 if result["status"] == "ready" else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Метрики процесса в формате Prometheus (снаружи закрыты в nginx)"""
+    from fastapi.responses import PlainTextResponse
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/docs")
 async def custom_docs():
     """Custom documentation endpoint"""
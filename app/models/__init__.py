@@ -3,13 +3,17 @@
 
 # Базовые модели (без relationships к другим моделям)
 from app.models.settings import Settings
-from app.models.action_log import ActionLog
+from app.models.action_log import ActionLog, ActionLogCount
 from app.models.placeholder_description import PlaceholderDescription
+from app.models.table_version import TableVersion
+from app.models.template_blob import TemplateBlob
 
 # Модели с зависимостями (User должен быть первым, так как на него ссылаются другие)
 from app.models.user import User
 from app.models.folder import Folder
 from app.models.template import Template
 from app.models.permission import Permission
+from app.models.artifact import Artifact
+from app.models.act_row_fingerprint import ActRowFingerprint
 
-__all__ = ['User', 'Folder', 'Template', 'Permission', 'ActionLog', 'PlaceholderDescription', 'Settings'] 
\ No newline at end of file
+__all__ = ['User', 'Folder', 'Template', 'Permission', 'ActionLog', 'PlaceholderDescription', 'Settings', 'TableVersion', 'ActionLogCount', 'TemplateBlob', 'Artifact', 'ActRowFingerprint'] 
\ No newline at end of file
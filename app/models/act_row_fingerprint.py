@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, DateTime
+import datetime
+from app.core.db import Base
+
+class ActRowFingerprint(Base):
+    """Отпечаток строки реестра из последнего пакета генерации актов.
+
+    scope - хеш шаблона, маппинга, ключевого столбца и формата; row_key -
+    значение ключевого столбца. fingerprint совпадает с ключом кэша
+    рендеринга; документ строки хранится в ACT_OUTPUTS_DIR/<scope>/<fingerprint>.
+    """
+    __tablename__ = 'act_row_fingerprints'
+    scope = Column(String(64), primary_key=True)
+    row_key = Column(String, primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    batch_id = Column(String(32))
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
@@ -1,16 +1,33 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Date, ForeignKey, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 import datetime
 from app.core.db import Base
 
 class ActionLog(Base):
+    # В PostgreSQL таблица секционирована по месяцам (миграция 0005):
+    # первичный ключ там (id, timestamp), секции создает и удаляет
+    # log_service.maintain_action_logs. id остается уникальным (общая последовательность).
     __tablename__ = 'action_logs'
+    __table_args__ = (
+        Index('idx_action_logs_user_action_timestamp', 'user_id', 'action', 'timestamp'),
+        Index('idx_action_logs_timestamp_id', 'timestamp', 'id'),
+        Index('idx_action_logs_target', 'target_type', 'target_id', 'timestamp'),
+        Index('idx_action_logs_details', 'details', postgresql_using='gin'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     action = Column(String, nullable=False)  # download, upload, delete, manage, login, etc.
     target_type = Column(String, nullable=False)  # folder, template, user
     target_id = Column(Integer, nullable=True)
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
-    details = Column(Text)
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    details = Column(JSON().with_variant(JSONB(), 'postgresql'))
     
-    user = relationship('User') 
\ No newline at end of file
+    user = relationship('User')
+
+class ActionLogCount(Base):
+    """Счетчики действий по месяцам для дашборда (обновляются при записи логов)"""
+    __tablename__ = 'action_log_counts'
+    month = Column(Date, primary_key=True)
+    action = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, ForeignKey, Index
+import datetime
+from app.core.db import Base
+
+class Artifact(Base):
+    """Результат генерации (архив актов или документ), доступный повторно по id.
+
+    Файл лежит в ARTIFACTS_DIR; запись удаляется вместе с файлом по истечении
+    expires_at или при вытеснении по квоте (сначала давно не скачивавшиеся).
+    """
+    __tablename__ = 'artifacts'
+    __table_args__ = (
+        Index('idx_artifacts_user_created', 'user_id', 'created_at'),
+        Index('idx_artifacts_expires_at', 'expires_at'),
+        Index('idx_artifacts_last_accessed_at', 'last_accessed_at'),
+    )
+    # Для архивов актов совпадает с batch_id (X-Batch-Id)
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    kind = Column(String(16), nullable=False)
+    filename = Column(String, nullable=False)
+    media_type = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    last_accessed_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 import datetime
 from app.core.db import Base
 
 class Folder(Base):
     __tablename__ = 'folders'
+    # path - материализованный путь ("/contracts/2024"): поддерево выбирается
+    # по префиксу пути, перенос и переименование - одним UPDATE
+    __table_args__ = (
+        Index('idx_folders_parent_id', 'parent_id'),
+        Index('idx_folders_path_prefix', 'path', postgresql_ops={'path': 'varchar_pattern_ops'}),
+    )
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     parent_id = Column(Integer, ForeignKey('folders.id'), nullable=True)
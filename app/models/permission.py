@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.core.db import Base
 
 class Permission(Base):
     __tablename__ = 'permissions'
+    __table_args__ = (
+        # Составной индекс обслуживает и выборки только по user_id
+        Index('idx_permissions_user_folder', 'user_id', 'folder_id'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     folder_id = Column(Integer, ForeignKey('folders.id'))
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.db import Base
 
 class PlaceholderDescription(Base):
     __tablename__ = "placeholder_descriptions"
+    __table_args__ = (
+        # Уникальная пара также служит индексом для выборок по template_id
+        Index("uq_placeholder_descriptions_template_placeholder", "template_id", "placeholder_name", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey("templates.id", ondelete="CASCADE"), nullable=False)
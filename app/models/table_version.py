@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, BigInteger
+from app.core.db import Base
+
+class TableVersion(Base):
+    """Счетчик изменений таблицы: увеличивается при каждой записи в нее.
+
+    Используется для ETag списков, чтобы ответ 304 не требовал запросов к самой таблице.
+    """
+    __tablename__ = 'table_versions'
+    table_name = Column(String(64), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
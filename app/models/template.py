@@ -1,12 +1,21 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 import datetime
 from app.core.db import Base
 
 class Template(Base):
     __tablename__ = 'templates'
+    __table_args__ = (
+        Index('idx_templates_folder_id', 'folder_id'),
+        Index('idx_templates_uploaded_by', 'uploaded_by'),
+        Index('idx_templates_content_hash', 'content_hash'),
+    )
     id = Column(Integer, primary_key=True)
+    # Отображаемое имя; содержимое лежит в хранилище по content_hash (SHA-256).
+    # content_hash пуст у шаблонов, загруженных до хранилища (файл TEMPLATES_DIR/filename)
     filename = Column(String, nullable=False)
+    content_hash = Column(String(64))
+    size = Column(BigInteger)
     folder_id = Column(Integer, ForeignKey('folders.id'))
     uploaded_by = Column(Integer, ForeignKey('users.id'))
     uploaded_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, BigInteger, Integer, DateTime
+import datetime
+from app.core.db import Base
+
+class TemplateBlob(Base):
+    """Содержимое файла шаблона, адресуемое по SHA-256.
+
+    Одинаковые загрузки хранятся одним файлом; ref_count - число шаблонов,
+    ссылающихся на blob. Файл удаляется, когда ссылок не остается.
+    """
+    __tablename__ = 'template_blobs'
+    hash = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
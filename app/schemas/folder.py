@@ -8,6 +8,11 @@ class FolderBase(BaseModel):
 class FolderCreate(FolderBase):
     pass
 
+class FolderUpdate(BaseModel):
+    """Переименование и/или перенос папки. parent_id=None - перенос в корень"""
+    name: Optional[str] = None
+    parent_id: Optional[int] = None
+
 class FolderOut(FolderBase):
     id: int
     path: str
@@ -1,13 +1,13 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Any, Dict
 from datetime import datetime
 
 class LogBase(BaseModel):
-    user_id: int
+    user_id: Optional[int] = None
     action: str
     target_type: str
     target_id: Optional[int] = None
-    details: Optional[str] = None
+    details: Optional[Dict[str, Any]] = None
 
 class LogCreate(LogBase):
     pass
@@ -17,4 +17,4 @@ class LogOut(LogBase):
     timestamp: datetime
     
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
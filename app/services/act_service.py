@@ -1,16 +1,118 @@
 import os
+import json
+import time
+import uuid
+import shutil
+import re
 import zipfile
 import pandas as pd
-from typing import Dict, List, Any
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Any, Optional
 from sqlalchemy.orm import Session
 from app.services.template_service import TemplateService
+from app.services.jinja_env import expression_variables
+from app.services.artifact_service import new_work_dir, new_work_file
+from app.services.render_cache import render_cache, render_key
+from app.services.fingerprint_service import (
+    fingerprint_scope, load_fingerprints, save_fingerprints, store_output, load_output, prune_outputs
+)
+from app.utils.deterministic_zip import write_file, write_bytes, normalize_zip
+from app.utils.docx_merge import merge_documents
 from app.utils.number_to_text import number_to_text, format_number_with_text, get_currency_declension
+from app.core.memory import MemoryTracker
+from app.core.config import settings
 from datetime import datetime
 
+MANIFEST_FILENAME = "manifest.json"
+_FILENAME_PLACEHOLDER_RE = re.compile(r"\{\{([^{}]+)\}\}")
+
+
+def _safe_filename(name: str) -> str:
+    """Убирает недопустимые символы для имени файла или папки архива"""
+    return re.sub(r'[<>:"/\\|?*]', '_', name).strip()
+
+
+def _unique_name(name: str, taken: set) -> str:
+    """Имя в архиве, не совпадающее с уже занятыми (без учета регистра): a.docx, a_2.docx, ..."""
+    stem, extension = os.path.splitext(name)
+    candidate, number = name, 1
+    while candidate.lower() in taken:
+        number += 1
+        candidate = f"{stem}_{number}{extension}"
+    taken.add(candidate.lower())
+    return candidate
+
+
+@dataclass(frozen=True)
+class ActTemplateSpec:
+    """Шаблон пакета: свой маппинг плейсхолдеров и шаблон имени файла"""
+    template_id: int
+    mapping: Dict[str, str]
+    filename_template: Optional[str] = None
+
+
+class LazyRowValues(Mapping):
+    """Значения плейсхолдеров строки реестра, вычисляемые при первом обращении"""
+
+    def __init__(self, mapping: Dict[str, str], resolve: Callable[[str, str], Any]):
+        self._mapping = mapping
+        self._resolve = resolve
+        self._values: Dict[str, Any] = {}
+
+    def __getitem__(self, placeholder: str) -> Any:
+        if placeholder not in self._values:
+            if placeholder not in self._mapping:
+                raise KeyError(placeholder)
+            self._values[placeholder] = self._resolve(placeholder, self._mapping[placeholder])
+        return self._values[placeholder]
+
+    def __contains__(self, placeholder) -> bool:
+        # Без вычисления значения (Mapping.__contains__ обращается к __getitem__)
+        return placeholder in self._mapping
+
+    def __iter__(self):
+        return iter(self._mapping)
+
+    def __len__(self) -> int:
+        return len(self._mapping)
+
+    def prepare(self, placeholders: Dict[str, str]) -> Dict[str, Any]:
+        """Обычный dict (контекст для docxtpl): имя переменной -> значение плейсхолдера"""
+        return {name: self[placeholder] for name, placeholder in placeholders.items()}
+
+
+def match_placeholders(placeholders: List[str], used_variables: Optional[FrozenSet[str]]):
+    """Сопоставляет плейсхолдеры маппинга с переменными шаблона.
+
+    Плейсхолдер может быть выражением ("amount|money") - сопоставляется имя
+    его переменной. Возвращает (имя переменной -> плейсхолдер, неиспользуемые
+    плейсхолдеры); used_variables None - используются все. Если одной
+    переменной соответствуют несколько плейсхолдеров, берется совпадающий
+    с именем, иначе первый.
+    """
+    matched: Dict[str, str] = {}
+    unused = []
+    for placeholder in placeholders:
+        names = expression_variables(placeholder)
+        name = names[0] if len(names) == 1 else placeholder
+        if used_variables is not None and name not in used_variables:
+            unused.append(placeholder)
+        elif name not in matched or placeholder == name:
+            if name in matched:
+                unused.append(matched[name])
+            matched[name] = placeholder
+        else:
+            unused.append(placeholder)
+    return matched, unused
+
+
 class ActService:
     def __init__(self, db: Session):
         self.db = db
         self.template_service = TemplateService(db)
+        # Манифест последнего пакета (итоги для журнала действий)
+        self.last_manifest: Optional[Dict[str, Any]] = None
 
     def format_value(self, value, original_format=None):
         """Форматирует значение с сохранением оригинального формата"""
@@ -55,6 +157,34 @@ class ActService:
         
         return result
 
+    def _prepare_value(self, placeholder: str, column_or_value: str, row, columns,
+                       number_to_text_fields: list, currency: str):
+        """Значение плейсхолдера для строки: столбец реестра или свободный ввод"""
+        # Проверяем, является ли значение названием столбца или свободным вводом
+        if column_or_value in columns:
+            # Это столбец из Excel файла
+            value = row[column_or_value]
+            
+            # Проверяем, нужно ли преобразовать число в текст
+            if number_to_text_fields and column_or_value in number_to_text_fields:
+                try:
+                    # Пытаемся преобразовать в число
+                    numeric_value = float(value) if value else 0
+                    result = format_number_with_text(numeric_value, currency)
+                    print(f"Преобразовано число для {placeholder}: {value} -> {result}")
+                    return result
+                except (ValueError, TypeError):
+                    # Если не удалось преобразовать в число, форматируем как обычное значение
+                    print(f"Не удалось преобразовать число для {placeholder}: {value}")
+                    return self.format_value(value)
+            # Форматируем значение с сохранением формата дат
+            result = self.format_value(value)
+            print(f"Обычное значение для {placeholder}: {value} -> {result}")
+            return result
+        # Это свободный ввод - используем значение как есть
+        print(f"Свободный ввод для {placeholder}: {column_or_value}")
+        return str(column_or_value)
+
     def analyze_excel_file(self, file) -> Dict[str, Any]:
         """Анализирует Excel файл и возвращает информацию о структуре"""
         try:
@@ -211,112 +341,368 @@ class ActService:
 
     def generate_acts(self, template_id: int, data: pd.DataFrame, mapping: Dict[str, str], 
                      output_format: str = 'docx', user_id: int = None, filename_template: str = None,
-                     number_to_text_fields: list = None, currency: str = "рублей") -> str:
-        """Генерирует акты на основе шаблона и данных"""
+                     number_to_text_fields: list = None, currency: str = "рублей",
+                     memory_tracker: MemoryTracker = None, batch_id: str = None,
+                     key_column: str = None, changed_only: bool = False,
+                     templates: List[ActTemplateSpec] = None, group_by: str = None,
+                     output_mode: str = "archive", bookmarks: bool = False) -> str:
+        """Генерирует акты на основе шаблона и данных.
+
+        templates - несколько шаблонов (акт, счет, письмо) со своими маппингом
+        и шаблоном имени файла; тогда template_id, mapping и filename_template
+        не используются. Значения строки готовятся один раз для всех
+        шаблонов. group_by раскладывает документы в архиве по папкам:
+        "row" - по строкам (по умолчанию для нескольких шаблонов), "template" -
+        по шаблонам; без него архив плоский.
+
+        output_mode="merged" собирает все документы в один DOCX (каждый -
+        раздел с новой страницы со своими полями и колонтитулами) и при
+        output_format="pdf" конвертирует его один раз; bookmarks добавляет
+        закладку на начало документа каждой строки. Возвращается путь к
+        этому файлу вместо архива.
+
+        С key_column для каждой строки сохраняется отпечаток подготовленных
+        значений, а в манифесте строка отмечается как new/modified/unchanged
+        относительно прошлого прогона того же шаблона и маппинга. В режиме
+        changed_only неизменившиеся строки не рендерятся, а берутся из
+        документов, сохраненных прошлым прогоном по отпечатку строки.
+
+        В архив добавляется manifest.json со статусом, именем файла, временем
+        рендеринга/конвертации и ошибкой для каждого документа. Копия
+        манифеста сохраняется на сервере и доступна по batch_id.
+        Возвращает путь к архиву вне рабочего каталога; его регистрирует
+        вызывающий (register_artifact), рабочий каталог удаляется здесь.
+        """
+        if memory_tracker is None:
+            memory_tracker = MemoryTracker(use_tracemalloc=False)
+        if batch_id is None:
+            batch_id = uuid.uuid4().hex
+        if not templates:
+            templates = [ActTemplateSpec(template_id, mapping, filename_template)]
+        if group_by is None and len(templates) > 1:
+            group_by = "row"
+        if group_by not in (None, "row", "template"):
+            raise ValueError(f"Неизвестная группировка документов: {group_by}")
+        if output_mode not in ("archive", "merged"):
+            raise ValueError(f"Неизвестный режим вывода: {output_mode}")
+        merged = output_mode == "merged"
+        # Для объединения строки рендерятся в DOCX, в PDF конвертируется итоговый файл
+        render_format = "docx" if merged else output_format
+        manifest = {
+            "batch_id": batch_id,
+            "template_id": templates[0].template_id,
+            "template_ids": [spec.template_id for spec in templates],
+            "user_id": user_id,
+            "output_format": output_format,
+            "output_mode": output_mode,
+            "started_at": datetime.utcnow().isoformat(),
+            "rows": []
+        }
+        batch_started = time.perf_counter()
+        temp_dir = None
         try:
-            print(f"Начало генерации актов: template_id={template_id}, rows={len(data)}")
-            print(f"Маппинг: {mapping}")
+            print(f"Начало генерации актов: templates={manifest['template_ids']}, rows={len(data)}")
             print(f"Поля для преобразования чисел: {number_to_text_fields}")
+            jobs = [self._prepare_template_job(spec, key_column, render_format, changed_only, manifest)
+                    for spec in templates]
+            # Папки шаблонов и имена по умолчанию не должны совпадать между шаблонами
+            folders = [job["folder"] for job in jobs]
+            for position, job in enumerate(jobs, start=1):
+                if folders.count(job["folder"]) > 1:
+                    job["folder"] = f"{job['folder']}_{position}"
+                job["default_name"] = job["folder"] if len(jobs) > 1 else "act"
             
-            # Создаем временную папку для актов
-            import tempfile
-            temp_dir = tempfile.mkdtemp()
+            # Рабочий каталог пакета в хранилище результатов
+            temp_dir = new_work_dir()
+            render_dir = os.path.join(temp_dir, "render")
+            files_dir = os.path.join(temp_dir, "files")
+            os.makedirs(render_dir)
+            os.makedirs(files_dir)
             print(f"Временная папка создана: {temp_dir}")
             
             # Генерируем акты для каждой строки данных
             generated_files = []
+            # Совпавшие имена не должны перезаписывать друг друга в архиве
+            taken_names = set()
+            merge_parts = []
             
-            for index, row in data.iterrows():
-                try:
+            with memory_tracker.stage("render"):
+                for index, row in data.iterrows():
                     print(f"Обрабатываем строку {index + 1}")
+                    row_key = self.format_value(row[key_column]) if key_column else None
+                    # Значение столбца готовится один раз для всех шаблонов строки
+                    prepared = {}
                     
-                    # Подготавливаем значения для замены
-                    values = {}
-                    for placeholder, column_or_value in mapping.items():
-                        # Проверяем, является ли значение названием столбца или свободным вводом
-                        if column_or_value in data.columns:
-                            # Это столбец из Excel файла
-                            value = row[column_or_value]
-                            
-                            # Проверяем, нужно ли преобразовать число в текст
-                            if number_to_text_fields and column_or_value in number_to_text_fields:
-                                try:
-                                    # Пытаемся преобразовать в число
-                                    numeric_value = float(value) if value else 0
-                                    values[placeholder] = format_number_with_text(numeric_value, currency)
-                                    print(f"Преобразовано число для {placeholder}: {value} -> {values[placeholder]}")
-                                except (ValueError, TypeError):
-                                    # Если не удалось преобразовать в число, форматируем как обычное значение
-                                    values[placeholder] = self.format_value(value)
-                                    print(f"Не удалось преобразовать число для {placeholder}: {value}")
-                            else:
-                                # Форматируем значение с сохранением формата дат
-                                values[placeholder] = self.format_value(value)
-                                print(f"Обычное значение для {placeholder}: {value} -> {values[placeholder]}")
-                        else:
-                            # Это свободный ввод - используем значение как есть
-                            # docxtpl автоматически экранирует значения при рендеринге
-                            values[placeholder] = str(column_or_value)
-                            print(f"Свободный ввод для {placeholder}: {column_or_value}")
-                    
-                    print(f"Подготовленные значения: {values}")
-                    
-                    # Генерируем документ
-                    output_path = self.template_service.generate_document(
-                        template_id=template_id,
-                        values=values,
-                        output_format=output_format
-                    )
+                    def resolve(placeholder, column_or_value, row=row, prepared=prepared):
+                        if column_or_value not in prepared:
+                            prepared[column_or_value] = self._prepare_value(
+                                placeholder, column_or_value, row, data.columns, number_to_text_fields, currency
+                            )
+                        return prepared[column_or_value]
                     
-                    print(f"Документ сгенерирован: {output_path}")
-                    
-                    # Формируем название файла
-                    if filename_template:
+                    for job in jobs:
+                        row_entry = {
+                            "row": index + 1,
+                            "excel_row": index + 2,  # с учетом строки заголовков
+                            "template_id": job["spec"].template_id,
+                            "status": "error",
+                            "filename": None,
+                            "render_ms": None,
+                            "convert_ms": None,
+                            "cached": False,
+                            "reused": False,
+                            "error": None
+                        }
+                        manifest["rows"].append(row_entry)
                         try:
-                            # Заменяем плейсхолдеры в шаблоне названия файла
-                            custom_filename = filename_template
-                            for key, value in values.items():
-                                placeholder = f"{{{{{key}}}}}"
-                                custom_filename = custom_filename.replace(placeholder, str(value))
-                            
-                            # Убираем недопустимые символы для имени файла
-                            import re
-                            custom_filename = re.sub(r'[<>:"/\\|?*]', '_', custom_filename)
-                            custom_filename = custom_filename.strip()
+                            # Значения для шаблона готовятся сразу, остальные - при обращении
+                            row_values = LazyRowValues(job["spec"].mapping, resolve)
+                            values = row_values.prepare(job["render_placeholders"])
+                        
+                            print(f"Подготовленные значения: {values}")
+                        
+                            # Ключ кэша рендеринга служит и отпечатком строки
+                            cache_key = render_key(job["template_hash"] or f"template:{job['spec'].template_id}",
+                                                   values, render_format)
+                            if key_column:
+                                previous = job["previous_fingerprints"].get(row_key)
+                                row_entry["row_key"] = row_key
+                                row_entry["change"] = "new" if previous is None else (
+                                    "unchanged" if previous == cache_key else "modified"
+                                )
+                                if previous is not None and previous != cache_key:
+                                    job["replaced_fingerprints"].add(previous)
                             
-                            # Добавляем расширение
-                            if not custom_filename.endswith(f'.{output_format}'):
-                                custom_filename += f'.{output_format}'
-                            
-                            filename = custom_filename
+                            cached_path = os.path.join(render_dir, f"cached_{index}_{job['spec'].template_id}.{render_format}")
+                            if (job["reuse_outputs"] and row_entry.get("change") == "unchanged"
+                                    and load_output(job["scope"], cache_key, render_format, cached_path)):
+                                # Неизменившаяся строка - документ прошлого прогона
+                                output_path = cached_path
+                                row_entry["reused"] = True
+                            elif job["use_cache"] and render_cache.get(cache_key, render_format, cached_path):
+                                # Одинаковые значения того же шаблона берем из кэша рендеринга
+                                output_path = cached_path
+                                row_entry["cached"] = True
+                            else:
+                                # Генерируем документ
+                                timings = {}
+                                try:
+                                    output_path = self.template_service.generate_document(
+                                        template_id=job["spec"].template_id,
+                                        values=values,
+                                        output_format=render_format,
+                                        timings=timings,
+                                        output_dir=render_dir
+                                    )
+                                finally:
+                                    row_entry["render_ms"] = timings.get("render_ms")
+                                    row_entry["convert_ms"] = timings.get("convert_ms")
+                                if job["use_cache"]:
+                                    # Ошибка кэша не должна превращать готовый документ в ошибку строки
+                                    try:
+                                        render_cache.put(cache_key, render_format, output_path)
+                                    except Exception as e:
+                                        print(f"Не удалось сохранить документ в кэш рендеринга: {e}")
+                            if key_column and not row_entry.get("reused"):
+                                # Документ строки для следующего прогона с changed_only
+                                try:
+                                    store_output(job["scope"], cache_key, render_format, output_path)
+                                except Exception as e:
+                                    print(f"Не удалось сохранить документ строки {row_key}: {e}")
+                        
+                            print(f"Документ сгенерирован: {output_path}")
+                        
+                            filename = self._document_filename(job, row_values, index, render_format)
+                            if merged:
+                                # Порядок частей - порядок строк (и шаблонов внутри строки)
+                                part_path = os.path.join(files_dir, f"{len(merge_parts):06d}.docx")
+                                os.replace(output_path, part_path)
+                                bookmark = f"row_{index + 1}" if len(jobs) == 1 else f"row_{index + 1}_{job['spec'].template_id}"
+                                merge_parts.append((part_path, bookmark))
+                                arcname = filename
+                            elif group_by == "row":
+                                arcname = f"{_safe_filename(row_key) if row_key else f'row_{index + 1}'}/{filename}"
+                            elif group_by == "template":
+                                arcname = f"{job['folder']}/{filename}"
+                            else:
+                                arcname = filename
+                        
+                            if not merged:
+                                unique_arcname = _unique_name(arcname, taken_names)
+                                if unique_arcname != arcname:
+                                    row_entry["requested_filename"] = arcname
+                                    arcname = unique_arcname
+                                temp_file_path = os.path.join(files_dir, *arcname.split("/"))
+                                os.makedirs(os.path.dirname(temp_file_path), exist_ok=True)
+                                os.replace(output_path, temp_file_path)
+                                generated_files.append(arcname)
+                            row_entry["status"] = "ok"
+                            row_entry["filename"] = arcname
+                            if key_column:
+                                job["fingerprints"][row_key] = cache_key
+                        
                         except Exception as e:
-                            print(f"Ошибка формирования названия файла: {e}")
-                            filename = f"act_{index + 1}.{output_format}"
-                    else:
-                        filename = f"act_{index + 1}.{output_format}"
-                    
-                    temp_file_path = os.path.join(temp_dir, filename)
-                    
-                    import shutil
-                    shutil.copy2(output_path, temp_file_path)
-                    generated_files.append(temp_file_path)
-                    
-                except Exception as e:
-                    print(f"Ошибка генерации акта для строки {index + 1}: {e}")
-                    continue
+                            print(f"Ошибка генерации акта для строки {index + 1}: {e}")
+                            row_entry["error"] = str(e)
+                            continue
+                        finally:
+                            memory_tracker.sample()
+            
+            for job in jobs:
+                if key_column:
+                    save_fingerprints(self.db, job["scope"], job["fingerprints"], batch_id)
+                    try:
+                        prune_outputs(self.db, job["scope"], job["replaced_fingerprints"], render_format)
+                    except Exception as e:
+                        print(f"Не удалось удалить устаревшие документы строк: {e}")
+            
+            merged_path = None
+            if merge_parts:
+                merged_path = self._merge_parts(merge_parts, temp_dir, output_format, bookmarks,
+                                                memory_tracker, manifest)
+            
+            self._finalize_manifest(manifest, batch_started)
+            self._save_manifest(manifest)
+            self.last_manifest = manifest
+            
+            if not generated_files and not merge_parts:
+                raise ValueError(f"Не удалось сгенерировать ни одного акта (пакет {batch_id})")
             
-            if not generated_files:
-                raise ValueError("Не удалось сгенерировать ни одного акта")
+            if merged:
+                result_path = new_work_file(f".{output_format}")
+                os.replace(merged_path, result_path)
+                return result_path
             
             # Создаем ZIP архив
-            zip_path = os.path.join(temp_dir, "generated_acts.zip")
+            zip_path = new_work_file(".zip")
             
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in generated_files:
-                    filename = os.path.basename(file_path)
-                    zipf.write(file_path, filename)
+            with memory_tracker.stage("archive"):
+                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    for arcname in generated_files:
+                        write_file(zipf, os.path.join(files_dir, *arcname.split("/")), arcname)
+                    write_bytes(zipf, MANIFEST_FILENAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
             
             return zip_path
             
         except Exception as e:
-            raise ValueError(f"Ошибка генерации актов: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Ошибка генерации актов: {str(e)}")
+        finally:
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _merge_parts(self, merge_parts: List[tuple], work_dir: str, output_format: str, bookmarks: bool,
+                     memory_tracker: MemoryTracker, manifest: Dict[str, Any]) -> str:
+        """Объединяет документы пакета в один DOCX и при необходимости конвертирует его в PDF"""
+        merged_path = os.path.join(work_dir, "merged.docx")
+        merge_started = time.perf_counter()
+        with memory_tracker.stage("merge"):
+            merge_documents(
+                [path for path, _ in merge_parts],
+                merged_path,
+                [bookmark for _, bookmark in merge_parts] if bookmarks else None,
+            )
+            normalize_zip(merged_path)
+        manifest["merge_ms"] = round((time.perf_counter() - merge_started) * 1000, 2)
+        if output_format != "pdf":
+            return merged_path
+        convert_started = time.perf_counter()
+        with memory_tracker.stage("convert"):
+            pdf_path = self.template_service._convert_to_pdf(merged_path, export_bookmarks=bookmarks)
+        manifest["merged_convert_ms"] = round((time.perf_counter() - convert_started) * 1000, 2)
+        return pdf_path
+
+    def _prepare_template_job(self, spec: ActTemplateSpec, key_column: Optional[str], output_format: str,
+                              changed_only: bool, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Состояние шаблона на пакет: хеш, кэш, отпечатки прошлого прогона, используемые плейсхолдеры"""
+        # Кэш рендеринга доступен шаблонам из хранилища по хешу
+        template = self.template_service.get_template_by_id(spec.template_id)
+        template_hash = template.content_hash if template else None
+        job = {
+            "spec": spec,
+            "template_hash": template_hash,
+            "use_cache": bool(template_hash) and settings.RENDER_CACHE_ENABLED,
+            # Документы прошлого прогона сопоставимы только для шаблона из хранилища
+            "reuse_outputs": bool(key_column) and changed_only and bool(template_hash),
+            "folder": _safe_filename(os.path.splitext(template.filename)[0]) if template else f"template_{spec.template_id}",
+            "previous_fingerprints": {},
+            "fingerprints": {},
+            "replaced_fingerprints": set(),
+        }
+        if key_column:
+            job["scope"] = fingerprint_scope(spec.template_id, template_hash, spec.mapping, key_column, output_format)
+            job["previous_fingerprints"] = load_fingerprints(self.db, job["scope"])
+        print(f"Маппинг шаблона {spec.template_id}: {spec.mapping}")
+        
+        # Для рендеринга готовятся только плейсхолдеры, которые читает шаблон
+        used_variables = self.template_service.get_template_variables(template) if template else None
+        job["render_placeholders"], unused = match_placeholders(list(spec.mapping), used_variables)
+        if unused:
+            manifest.setdefault("unused_placeholders", {})[str(spec.template_id)] = unused
+        print(f"Плейсхолдеры для рендеринга: {job['render_placeholders']}")
+        return job
+
+    def _document_filename(self, job: Dict[str, Any], row_values: "LazyRowValues", index: int,
+                           output_format: str) -> str:
+        """Имя файла документа по шаблону имени (плейсхолдеры {{имя}}) или по умолчанию"""
+        filename_template = job["spec"].filename_template
+        default = f"{job['default_name']}_{index + 1}.{output_format}"
+        if not filename_template:
+            return default
+        try:
+            # Заменяем плейсхолдеры в шаблоне названия файла
+            custom_filename = filename_template
+            for key in _FILENAME_PLACEHOLDER_RE.findall(filename_template):
+                if key in row_values:
+                    custom_filename = custom_filename.replace(f"{{{{{key}}}}}", str(row_values[key]))
+            
+            # Убираем недопустимые символы для имени файла
+            custom_filename = _safe_filename(custom_filename)
+            
+            # Добавляем расширение
+            if not custom_filename.endswith(f'.{output_format}'):
+                custom_filename += f'.{output_format}'
+            
+            return custom_filename
+        except Exception as e:
+            print(f"Ошибка формирования названия файла: {e}")
+            return default
+
+    def _finalize_manifest(self, manifest: Dict[str, Any], batch_started: float):
+        """Заполняет итоговые показатели манифеста пакета"""
+        rows = manifest["rows"]
+        manifest["finished_at"] = datetime.utcnow().isoformat()
+        manifest["duration_ms"] = round((time.perf_counter() - batch_started) * 1000, 2)
+        manifest["total_rows"] = len({row["row"] for row in rows})
+        manifest["documents"] = len(rows)
+        manifest["succeeded"] = sum(1 for row in rows if row["status"] == "ok")
+        manifest["failed"] = len(rows) - manifest["succeeded"]
+        manifest["render_ms_total"] = round(sum(row["render_ms"] or 0 for row in rows), 2)
+        manifest["cache_hits"] = sum(1 for row in rows if row.get("cached"))
+        manifest["reused"] = sum(1 for row in rows if row.get("reused"))
+        changes = [row["change"] for row in rows if row.get("change")]
+        if changes:
+            manifest["changes"] = {status: changes.count(status) for status in ("new", "modified", "unchanged")}
+        manifest["convert_ms_total"] = round(sum(row["convert_ms"] or 0 for row in rows), 2)
+
+    def _get_manifest_path(self, batch_id: str) -> str:
+        return os.path.join(settings.MANIFESTS_DIR, f"{batch_id}.json")
+
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        """Сохраняет манифест пакета на сервере"""
+        try:
+            os.makedirs(settings.MANIFESTS_DIR, exist_ok=True)
+            with open(self._get_manifest_path(manifest["batch_id"]), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"Не удалось сохранить манифест пакета {manifest['batch_id']}: {e}")
+
+    def get_generation_status(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает сохраненный манифест пакета генерации"""
+        # Идентификатор пакета - hex-строка, не допускаем путей
+        if not task_id or os.path.basename(task_id) != task_id:
+            return None
+        path = self._get_manifest_path(task_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f) 
\ No newline at end of file
@@ -0,0 +1,219 @@
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import tempfile
+import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.file_delivery import file_sha256
+from app.core.metrics import registry
+from app.models.artifact import Artifact
+from app.services.render_cache import render_cache
+from app.services.fingerprint_service import reap_fingerprints
+
+# Хранилище результатов генерации. Пакет работает во временном каталоге
+# ARTIFACTS_DIR/tmp, готовый архив или документ переносится в
+# ARTIFACTS_DIR/<id[:2]>/<id> и регистрируется в таблице artifacts с
+# владельцем, размером и сроком хранения. Фоновая очистка удаляет просроченные
+# результаты, вытесняет давно не скачивавшиеся сверх ARTIFACTS_MAX_BYTES и
+# убирает брошенные рабочие каталоги.
+
+artifacts_bytes = registry.gauge(
+    "artifacts_bytes",
+    "Суммарный размер сохраненных результатов генерации",
+)
+artifacts_removed_total = registry.counter(
+    "artifacts_removed_total",
+    "Удаленные результаты генерации (reason: expired, quota)",
+)
+
+_WORK_DIR = "tmp"
+# Каталог, куда генерация писала файлы до появления хранилища
+_LEGACY_GENERATED_DIR = os.path.join(settings.TEMPLATES_DIR, "generated")
+
+
+def _work_root() -> str:
+    path = os.path.join(settings.ARTIFACTS_DIR, _WORK_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def new_work_dir() -> str:
+    """Рабочий каталог пакета; удаляется вызывающим, брошенные - очисткой"""
+    return tempfile.mkdtemp(dir=_work_root())
+
+
+def new_work_file(suffix: str) -> str:
+    """Путь для итогового файла пакета вне рабочего каталога (до регистрации)"""
+    return os.path.join(_work_root(), f"{uuid.uuid4().hex}{suffix}")
+
+
+def artifact_path(artifact_id: str) -> str:
+    return os.path.join(settings.ARTIFACTS_DIR, artifact_id[:2], artifact_id)
+
+
+def register_artifact(db: Session, source_path: str, filename: str, media_type: str,
+                      user_id: Optional[int], kind: str, artifact_id: Optional[str] = None) -> Artifact:
+    """Переносит готовый файл в хранилище и создает запись (с commit)"""
+    artifact_id = artifact_id or uuid.uuid4().hex
+    path = artifact_path(artifact_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(source_path, path)
+    now = datetime.datetime.utcnow()
+    artifact = Artifact(
+        id=artifact_id,
+        user_id=user_id,
+        kind=kind,
+        filename=filename,
+        media_type=media_type,
+        size=os.path.getsize(path),
+        content_hash=file_sha256(path),
+        created_at=now,
+        expires_at=now + datetime.timedelta(hours=settings.ARTIFACT_TTL_HOURS),
+        last_accessed_at=now,
+    )
+    try:
+        db.add(artifact)
+        db.commit()
+    except Exception:
+        db.rollback()
+        os.remove(path)
+        raise
+    return artifact
+
+
+def get_artifact(db: Session, artifact_id: str) -> Optional[Artifact]:
+    """Действующий результат по id; отмечает обращение (для вытеснения по квоте)"""
+    artifact = db.get(Artifact, artifact_id)
+    if artifact is None or artifact.expires_at <= datetime.datetime.utcnow():
+        return None
+    if not os.path.exists(artifact_path(artifact.id)):
+        return None
+    artifact.last_accessed_at = datetime.datetime.utcnow()
+    db.commit()
+    return artifact
+
+
+def list_artifacts(db: Session, user_id: int) -> List[Artifact]:
+    return db.query(Artifact).filter(
+        Artifact.user_id == user_id,
+        Artifact.expires_at > datetime.datetime.utcnow()
+    ).order_by(Artifact.created_at.desc()).all()
+
+
+def _remove(db: Session, artifact_id: str) -> bool:
+    # Файл удаляет тот воркер, чей DELETE удалил запись
+    deleted = db.query(Artifact).filter(Artifact.id == artifact_id).delete(synchronize_session=False)
+    db.commit()
+    if deleted:
+        path = artifact_path(artifact_id)
+        if os.path.exists(path):
+            os.remove(path)
+    return bool(deleted)
+
+
+def _sweep_stale_files(directory: str, max_age_seconds: float) -> int:
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for entry in os.scandir(directory):
+        # Очистка идет в каждом воркере: запись мог уже удалить другой
+        try:
+            if entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+    return removed
+
+
+def reap_artifacts(db: Optional[Session] = None) -> Dict[str, Any]:
+    """Удаляет просроченные результаты, вытесняет лишние по квоте, чистит брошенные файлы"""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        now = datetime.datetime.utcnow()
+        expired = 0
+        for (artifact_id,) in db.query(Artifact.id).filter(Artifact.expires_at <= now).all():
+            expired += _remove(db, artifact_id)
+
+        total = db.query(func.coalesce(func.sum(Artifact.size), 0)).scalar()
+        evicted = 0
+        if total > settings.ARTIFACTS_MAX_BYTES:
+            # Сначала давно не скачивавшиеся
+            candidates = db.query(Artifact.id, Artifact.size).order_by(Artifact.last_accessed_at).all()
+            for artifact_id, size in candidates:
+                if total <= settings.ARTIFACTS_MAX_BYTES:
+                    break
+                if _remove(db, artifact_id):
+                    evicted += 1
+                    total -= size
+        artifacts_bytes.set(total)
+        if expired:
+            artifacts_removed_total.inc(expired, reason="expired")
+        if evicted:
+            artifacts_removed_total.inc(evicted, reason="quota")
+
+        work_age = settings.ARTIFACT_WORK_MAX_AGE_HOURS * 3600
+        stale = _sweep_stale_files(_work_root(), work_age)
+        stale += _sweep_stale_files(_LEGACY_GENERATED_DIR, settings.ARTIFACT_TTL_HOURS * 3600)
+        return {"expired": expired, "evicted": evicted, "stale_files": stale, "total_bytes": total}
+    finally:
+        if own_session:
+            db.close()
+
+
+class ArtifactReaper:
+    """Периодическая очистка хранилища и кэша рендеринга в каждом воркере (удаление идемпотентно)"""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or settings.ARTIFACT_REAPER_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            try:
+                result = await run_in_threadpool(reap_artifacts)
+                if result["expired"] or result["evicted"] or result["stale_files"]:
+                    print(f"Очистка результатов генерации: {result}")
+            except Exception as e:
+                print(f"Не удалось очистить результаты генерации: {e}")
+            # Ошибка одной очистки не отменяет другую
+            try:
+                await run_in_threadpool(render_cache.evict)
+            except Exception as e:
+                print(f"Не удалось очистить кэш рендеринга: {e}")
+            try:
+                expired = await run_in_threadpool(reap_fingerprints)
+                if expired:
+                    print(f"Удалено устаревших отпечатков строк: {expired}")
+            except Exception as e:
+                print(f"Не удалось очистить отпечатки строк: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+artifact_reaper = ArtifactReaper()
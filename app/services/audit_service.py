@@ -0,0 +1,183 @@
+import time
+import asyncio
+import datetime
+import threading
+from typing import Any, Dict, List, Optional
+from sqlalchemy.exc import OperationalError
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.metrics import registry
+from app.services.log_service import write_logs
+
+# Буферизованная запись журнала действий. События копятся в памяти воркера
+# и записываются пачкой (один INSERT) по достижении AUDIT_FLUSH_SIZE или раз
+# в AUDIT_FLUSH_INTERVAL_SECONDS, а также при остановке приложения.
+# При аварийном завершении процесса события из буфера теряются.
+# Пачка, которая не записалась AUDIT_FLUSH_RETRIES раз подряд, пишется по
+# одному событию: события, которые не записываются (несериализуемые details,
+# нарушение внешнего ключа), отбрасываются, остальные сохраняются.
+
+audit_events_buffered = registry.gauge(
+    "audit_events_buffered",
+    "Количество событий журнала в буфере воркера",
+)
+audit_events_dropped_total = registry.counter(
+    "audit_events_dropped_total",
+    "События журнала, отброшенные из-за переполнения буфера или ошибки записи",
+)
+audit_flush_duration = registry.histogram(
+    "audit_flush_duration_seconds",
+    "Длительность записи пачки событий журнала",
+)
+
+
+class AuditWriter:
+    def __init__(self, flush_size: int = None, flush_interval: float = None, max_buffer: int = None):
+        self.flush_size = flush_size or settings.AUDIT_FLUSH_SIZE
+        self.flush_interval = flush_interval or settings.AUDIT_FLUSH_INTERVAL_SECONDS
+        self.max_buffer = max_buffer or settings.AUDIT_MAX_BUFFER
+        self.flush_retries = settings.AUDIT_FLUSH_RETRIES
+        self._failures = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, user_id: Optional[int], action: str, target_type: str,
+               target_id: Optional[int] = None, details: Optional[Dict[str, Any]] = None):
+        """Ставит событие в очередь; можно вызывать из event loop и из threadpool"""
+        entry = {
+            "user_id": user_id,
+            "action": action,
+            "target_type": target_type,
+            "target_id": target_id,
+            "details": details,
+            "timestamp": datetime.datetime.utcnow(),
+        }
+        with self._lock:
+            self._buffer.append(entry)
+            dropped = self._trim()
+            size = len(self._buffer)
+        audit_events_buffered.set(size)
+        if dropped:
+            audit_events_dropped_total.inc(dropped)
+        if size >= self.flush_size:
+            self._request_flush()
+
+    def _trim(self) -> int:
+        """Отбрасывает самые старые события сверх AUDIT_MAX_BUFFER (под self._lock)"""
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            return overflow
+        return 0
+
+    def _request_flush(self):
+        if self._loop is not None and self._task is not None and not self._task.done():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        else:
+            # Фоновая задача не запущена (скрипты): пишем сразу
+            self.flush()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            write_logs(db, batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """Возвращает события в начало буфера, чтобы повторить при следующей записи"""
+        with self._lock:
+            self._buffer[:0] = batch
+            dropped = self._trim()
+        if dropped:
+            audit_events_dropped_total.inc(dropped)
+
+    def _write_each(self, batch: List[Dict[str, Any]]) -> int:
+        """Пишет события по одному; незаписываемые отбрасывает"""
+        written = 0
+        for position, entry in enumerate(batch):
+            try:
+                self._write([entry])
+            except OperationalError as e:
+                # БД недоступна - это не ошибка события, остаток повторяется позже
+                self._requeue(batch[position:])
+                print(f"Не удалось записать журнал действий ({len(batch) - position} событий): {e}")
+                return written
+            except Exception as e:
+                audit_events_dropped_total.inc()
+                print(f"Событие журнала отброшено ({entry['action']}): {e}")
+                continue
+            written += 1
+        self._failures = 0
+        return written
+
+    def flush(self) -> int:
+        """Записывает накопленные события одной транзакцией"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                if self._failures >= self.flush_retries:
+                    # Пачка не записывается целиком: ищем события, которые мешают записи
+                    return self._write_each(batch)
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    self._failures += 1
+                    self._requeue(batch)
+                    print(f"Не удалось записать журнал действий ({len(batch)} событий): {e}")
+                    return 0
+                self._failures = 0
+            finally:
+                audit_events_buffered.set(len(self._buffer))
+            audit_flush_duration.observe(time.perf_counter() - started)
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await run_in_threadpool(self.flush)
+
+    async def start(self):
+        """Запускает фоновую запись (при старте приложения)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую запись и сбрасывает остаток буфера"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.flush)
+
+
+audit_writer = AuditWriter()
+
+
+def audit(user_id: Optional[int], action: str, target_type: str,
+          target_id: Optional[int] = None, details: Optional[Dict[str, Any]] = None):
+    """Записывает действие в журнал через буфер воркера"""
+    audit_writer.record(user_id, action, target_type, target_id, details)
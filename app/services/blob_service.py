@@ -0,0 +1,119 @@
+import os
+import hashlib
+import tempfile
+from typing import BinaryIO, Tuple
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+from app.models.template_blob import TemplateBlob
+from app.core.config import settings
+from app.core.uploads import stream_upload
+
+# Хранилище содержимого шаблонов по SHA-256. Файл лежит в
+# TEMPLATE_BLOBS_DIR/ab/cd/<hash>: двухуровневое разбиение не дает одному
+# каталогу разрастись. Одинаковое содержимое хранится один раз, template_blobs
+# считает ссылки шаблонов; хеш служит ключом кэшей рендеринга.
+
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+
+def blob_path(content_hash: str) -> str:
+    return os.path.join(settings.TEMPLATE_BLOBS_DIR, content_hash[:2], content_hash[2:4], content_hash)
+
+
+def _temp_dir() -> str:
+    # Временные файлы в том же разделе, что и хранилище: перенос - атомарный rename
+    path = os.path.join(settings.TEMPLATE_BLOBS_DIR, "tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_temp_blob(source: BinaryIO) -> Tuple[str, int, str]:
+    """Копирует поток во временный файл по частям, считая SHA-256 на лету.
+
+    Возвращает (hash, size, temp_path); temp_path передается в place_blob.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=_temp_dir(), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while True:
+                chunk = source.read(BLOB_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                target.write(chunk)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return digest.hexdigest(), size, temp_path
+
+
+async def write_upload_blob(upload: UploadFile, max_bytes: int) -> Tuple[str, int, str]:
+    """Асинхронный вариант write_temp_blob для загрузки (с лимитом размера)"""
+    fd, temp_path = tempfile.mkstemp(dir=_temp_dir(), suffix=".part")
+    os.close(fd)
+    try:
+        content_hash, size = await stream_upload(upload, temp_path, max_bytes)
+    except Exception:
+        discard_temp(temp_path)
+        raise
+    return content_hash, size, temp_path
+
+
+def place_blob(temp_path: str, content_hash: str) -> str:
+    """Переносит временный файл в хранилище (после commit записи о blob).
+
+    Замена существующего файла тем же содержимым атомарна и безопасна для
+    одновременных чтений, поэтому существование не проверяется.
+    """
+    path = blob_path(content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+    return path
+
+
+def discard_temp(temp_path: str):
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+def acquire_blob(db: Session, content_hash: str, size: int):
+    """Добавляет ссылку на blob (без commit), создавая запись при первой загрузке"""
+    table = TemplateBlob.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table).values(hash=content_hash, size=size, ref_count=1)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["hash"],
+            set_={"ref_count": table.c.ref_count + 1},
+        ))
+        return
+    blob = db.get(TemplateBlob, content_hash)
+    if blob:
+        blob.ref_count += 1
+    else:
+        db.add(TemplateBlob(hash=content_hash, size=size, ref_count=1))
+
+
+def release_blob(db: Session, content_hash: str) -> bool:
+    """Снимает ссылку (без commit); True - ссылок не осталось, запись удалена"""
+    table = TemplateBlob.__table__
+    db.execute(table.update().where(table.c.hash == content_hash).values(ref_count=table.c.ref_count - 1))
+    deleted = db.execute(table.delete().where(table.c.hash == content_hash, table.c.ref_count <= 0))
+    return deleted.rowcount > 0
+
+
+def remove_unreferenced_blob(db: Session, content_hash: str) -> bool:
+    """Удаляет файл blob после commit, если его за это время не загрузили снова"""
+    if db.get(TemplateBlob, content_hash) is not None:
+        return False
+    path = blob_path(content_hash)
+    if os.path.exists(path):
+        os.remove(path)
+    return True
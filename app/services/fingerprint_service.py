@@ -0,0 +1,161 @@
+import os
+import json
+import shutil
+import hashlib
+import datetime
+import tempfile
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.models.act_row_fingerprint import ActRowFingerprint
+
+# Инкрементальная генерация актов: для каждой строки пакета с ключевым столбцом
+# сохраняется отпечаток подготовленных значений, а документ строки - в
+# ACT_OUTPUTS_DIR/<scope>/<fingerprint>.<format>. Следующий прогон того же
+# шаблона и маппинга сравнивает строки с отпечатками, рендерит только новые и
+# измененные, а неизменившиеся берет из сохраненных документов. Документ
+# удаляется, когда на его отпечаток больше не ссылается ни одна строка области.
+
+
+def fingerprint_scope(template_id: int, template_hash: Optional[str], mapping: Dict[str, str],
+                      key_column: str, output_format: str) -> str:
+    raw = json.dumps({
+        "template_id": template_id,
+        "template_hash": template_hash,
+        "mapping": mapping,
+        "key_column": key_column,
+        "output_format": output_format,
+    }, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def load_fingerprints(db: Session, scope: str) -> Dict[str, str]:
+    """Отпечатки последнего прогона: значение ключа -> fingerprint"""
+    rows = db.query(ActRowFingerprint.row_key, ActRowFingerprint.fingerprint).filter(
+        ActRowFingerprint.scope == scope
+    ).all()
+    return dict(rows)
+
+
+def save_fingerprints(db: Session, scope: str, entries: Dict[str, str], batch_id: str):
+    """Сохраняет отпечатки строк пакета (row_key -> fingerprint), с commit"""
+    if not entries:
+        return
+    now = datetime.datetime.utcnow()
+    rows = [
+        {"scope": scope, "row_key": row_key, "fingerprint": fingerprint, "batch_id": batch_id, "updated_at": now}
+        for row_key, fingerprint in entries.items()
+    ]
+    table = ActRowFingerprint.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["scope", "row_key"],
+                set_={column: statement.excluded[column] for column in ("fingerprint", "batch_id", "updated_at")},
+            ),
+            rows,
+        )
+    else:
+        for row in rows:
+            db.merge(ActRowFingerprint(**row))
+    db.commit()
+
+
+def output_path(scope: str, fingerprint: str, output_format: str) -> str:
+    return os.path.join(settings.ACT_OUTPUTS_DIR, scope, f"{fingerprint}.{output_format}")
+
+
+def store_output(scope: str, fingerprint: str, output_format: str, source_path: str):
+    """Сохраняет документ строки (атомарно; одинаковый отпечаток - одинаковое содержимое)"""
+    path = output_path(scope, fingerprint, output_format)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    os.close(fd)
+    try:
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_output(scope: str, fingerprint: str, output_format: str, target_path: str) -> bool:
+    """Копирует сохраненный документ строки в target_path; False - его нет"""
+    path = output_path(scope, fingerprint, output_format)
+    try:
+        try:
+            os.link(path, target_path)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # Другая файловая система или ссылки не поддерживаются
+            shutil.copyfile(path, target_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def prune_outputs(db: Session, scope: str, fingerprints: Iterable[str], output_format: str) -> int:
+    """Удаляет документы отпечатков, на которые в области не ссылается ни одна строка"""
+    candidates = set(fingerprints)
+    if not candidates:
+        return 0
+    referenced = {
+        fingerprint for (fingerprint,) in db.query(ActRowFingerprint.fingerprint).filter(
+            ActRowFingerprint.scope == scope,
+            ActRowFingerprint.fingerprint.in_(candidates),
+        ).all()
+    }
+    removed = 0
+    for fingerprint in candidates - referenced:
+        try:
+            os.remove(output_path(scope, fingerprint, output_format))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def reap_fingerprints(db: Optional[Session] = None) -> int:
+    """Удаляет отпечатки старше ACT_OUTPUTS_RETENTION_DAYS и каталоги опустевших областей"""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=settings.ACT_OUTPUTS_RETENTION_DAYS)
+        expired = db.query(ActRowFingerprint).filter(ActRowFingerprint.updated_at < cutoff).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        if not os.path.isdir(settings.ACT_OUTPUTS_DIR):
+            return expired
+        live = {}
+        for scope, fingerprint in db.query(ActRowFingerprint.scope, ActRowFingerprint.fingerprint).all():
+            live.setdefault(scope, set()).add(fingerprint)
+        for entry in os.scandir(settings.ACT_OUTPUTS_DIR):
+            if not entry.is_dir():
+                continue
+            if entry.name not in live:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            for output in os.scandir(entry.path):
+                fingerprint, extension = os.path.splitext(output.name)
+                if extension == ".part" or fingerprint in live[entry.name]:
+                    continue
+                try:
+                    os.remove(output.path)
+                except FileNotFoundError:
+                    pass
+        return expired
+    finally:
+        if own_session:
+            db.close()
@@ -1,7 +1,12 @@
+from typing import List, Dict, Any, Optional
+from sqlalchemy import select, update, or_, case, func, literal
 from sqlalchemy.orm import Session
 from app.models.folder import Folder
+from app.models.template import Template
 from app.schemas.folder import FolderCreate
 from app.models.permission import Permission
+from app.services.permission_service import AccessMap, invalidate_access_cache
+from app.core.pagination import PageParams, keyset
 
 def list_folders(db: Session):
     return db.query(Folder).all()
@@ -23,6 +28,7 @@ def create_folder(db: Session, folder: FolderCreate, created_by: int, path: str)
     db_perm = Permission(user_id=created_by, folder_id=db_folder.id, level="manage")
     db.add(db_perm)
     db.commit()
+    invalidate_access_cache()
     return db_folder
 
 def delete_folder(db: Session, folder_id: int):
@@ -31,12 +37,116 @@ def delete_folder(db: Session, folder_id: int):
         # Удаляем запись из БД
         db.delete(folder)
         db.commit()
+        invalidate_access_cache()
     return folder
 
 def get_subfolders(db: Session, parent_id: int):
     return db.query(Folder).filter(Folder.parent_id == parent_id).all()
 
-def list_folders_for_user(db: Session, user_id: int):
+def build_folder_path(parent_path: str, name: str) -> str:
+    return f"{parent_path}/{name}".replace("//", "/")
+
+def subtree_condition(path: str):
+    """Условие "папка и все вложенные" по префиксу материализованного пути"""
+    escaped = path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return or_(Folder.path == path, Folder.path.like(f"{escaped}/%", escape="\\"))
+
+def get_subtree(db: Session, folder: Folder) -> List[Folder]:
+    """Папка и все вложенные папки одним запросом, родители раньше потомков"""
+    return db.query(Folder).filter(subtree_condition(folder.path)).order_by(Folder.path).all()
+
+def is_in_subtree(db: Session, folder: Folder, candidate_id: int) -> bool:
+    """Проверяет, что candidate_id - сама папка или одна из вложенных"""
+    return db.query(Folder.id).filter(subtree_condition(folder.path), Folder.id == candidate_id).first() is not None
+
+def move_folder(db: Session, folder: Folder, name: str, parent_id: Optional[int], parent_path: str) -> Folder:
+    """Переименовывает и/или переносит папку вместе с поддеревом.
+
+    Пути всех вложенных папок переписываются одним UPDATE: префикс старого
+    пути заменяется новым. Проверку переноса папки в собственное поддерево
+    выполняет вызывающий код (is_in_subtree).
+    """
+    old_path = folder.path
+    new_path = build_folder_path(parent_path, name)
+    db.execute(
+        update(Folder)
+        .where(subtree_condition(old_path))
+        .values(
+            path=literal(new_path) + func.substr(Folder.path, len(old_path) + 1),
+            name=case((Folder.id == folder.id, name), else_=Folder.name),
+            parent_id=case((Folder.id == folder.id, parent_id), else_=Folder.parent_id),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    invalidate_access_cache()
+    db.refresh(folder)
+    return folder
+
+def list_folders_for_user(db: Session, access: AccessMap):
     """Возвращает папки, на которые у пользователя есть права"""
-    # Пока что возвращаем все папки, но здесь можно добавить логику прав доступа
-    return db.query(Folder).all() 
\ No newline at end of file
+    query = db.query(Folder)
+    condition = access.where(Folder.id)
+    if condition is not None:
+        query = query.filter(condition)
+    return query.all()
+
+async def get_folder_by_id_async(db, folder_id: int):
+    """Асинхронный вариант get_folder_by_id (db из get_async_db)"""
+    result = await db.execute(select(Folder).where(Folder.id == folder_id))
+    return result.scalars().first()
+
+async def list_folders_for_user_async(db, access: AccessMap, page: Optional[PageParams] = None):
+    """Асинхронный вариант list_folders_for_user (db из get_async_db)"""
+    statement = select(Folder)
+    condition = access.where(Folder.id)
+    if condition is not None:
+        statement = statement.where(condition)
+    if page is not None:
+        statement = keyset(statement, page, [Folder.id])
+    result = await db.execute(statement)
+    return result.scalars().all()
+
+def _build_tree(rows) -> List[Dict[str, Any]]:
+    """Собирает вложенное дерево из плоских строк (id, name, parent_id, path, created_by, count)"""
+    nodes = {}
+    for folder_id, name, parent_id, path, created_by, template_count in rows:
+        nodes[folder_id] = {
+            "id": folder_id,
+            "name": name,
+            "parent_id": parent_id,
+            "path": path,
+            "created_by": created_by,
+            "template_count": template_count,
+            "total_template_count": template_count,
+            "children": [],
+        }
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"])
+        (parent["children"] if parent else roots).append(node)
+
+    def add_totals(node):
+        node["total_template_count"] += sum(add_totals(child) for child in node["children"])
+        return node["total_template_count"]
+
+    for root in roots:
+        add_totals(root)
+    return roots
+
+async def get_folder_tree_async(db, access: AccessMap) -> List[Dict[str, Any]]:
+    """Дерево доступных папок с количеством шаблонов (одним запросом, db из get_async_db).
+
+    Доступные папки, родитель которых недоступен, становятся корнями дерева.
+    """
+    statement = (
+        select(Folder.id, Folder.name, Folder.parent_id, Folder.path, Folder.created_by, func.count(Template.id))
+        .outerjoin(Template, Template.folder_id == Folder.id)
+        .group_by(Folder.id)
+        .order_by(Folder.path)
+    )
+    condition = access.where(Folder.id)
+    if condition is not None:
+        statement = statement.where(condition)
+    result = await db.execute(statement)
+    return _build_tree(result.all())
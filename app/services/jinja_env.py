@@ -0,0 +1,181 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import FrozenSet, List, Optional
+from docxtpl import DocxTemplate
+from jinja2 import Environment, FileSystemBytecodeCache, Template, TemplateSyntaxError, meta, nodes
+from app.core.config import settings
+from app.core.metrics import registry
+from app.utils.number_to_text import number_to_text, format_number_with_text
+
+# Общее окружение Jinja для рендеринга DOCX. docxtpl вызывает
+# jinja_env.from_string для XML каждой части документа; без окружения он
+# компилирует исходник заново при каждом рендеринге. Здесь скомпилированные
+# шаблоны хранятся в памяти воркера по хешу исходника (XML шаблона одинаков
+# для всех строк пакета), а байткод - на диске в JINJA_BYTECODE_CACHE_DIR,
+# общем для воркеров и перезапусков. Каталог можно очищать в любой момент.
+
+jinja_compile_total = registry.counter(
+    "jinja_compile_total",
+    "Получение скомпилированных шаблонов Jinja (source: memory, bytecode, compile)",
+)
+
+_DATE_FORMATS = ("%d.%m.%Y %H:%M", "%d.%m.%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+
+def _to_number(value):
+    """Число из значения контекста (строки реестра приходят отформатированными); None - не число"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return None
+    text = value.strip().replace("\xa0", "").replace(" ", "").replace(",", ".")
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() and "." not in text else number
+
+
+def money_filter(value, currency: str = "рублей"):
+    """{{ amount|money }} - число с расшифровкой прописью: 1234,56 (одна тысяча ...)"""
+    number = _to_number(value)
+    return format_number_with_text(number, currency) if number is not None else value
+
+
+def number_to_text_filter(value, currency: str = "рублей"):
+    """{{ amount|number_to_text }} - целая часть числа прописью"""
+    number = _to_number(value)
+    return number_to_text(number, currency) if number is not None else value
+
+
+def date_filter(value, fmt: str = "%d.%m.%Y"):
+    """{{ signed_at|date }} или {{ signed_at|date('%Y-%m-%d') }}"""
+    if hasattr(value, "strftime"):
+        return value.strftime(fmt)
+    if isinstance(value, str):
+        for source_format in _DATE_FORMATS:
+            try:
+                return datetime.strptime(value.strip(), source_format).strftime(fmt)
+            except ValueError:
+                continue
+    return value
+
+
+FILTERS = {
+    "money": money_filter,
+    "format_number_with_text": money_filter,
+    "number_to_text": number_to_text_filter,
+    "date": date_filter,
+}
+
+
+class DocxJinjaEnvironment(Environment):
+    """Environment с кэшем шаблонов, созданных через from_string"""
+
+    def __init__(self, cache_size: int = None, **options):
+        super().__init__(**options)
+        self._compiled: "OrderedDict[str, Template]" = OrderedDict()
+        self._compiled_size = cache_size if cache_size is not None else settings.JINJA_TEMPLATE_CACHE_SIZE
+        self._compiled_lock = threading.Lock()
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals or template_class is not None or not isinstance(source, str):
+            return super().from_string(source, globals, template_class)
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        with self._compiled_lock:
+            template = self._compiled.get(key)
+            if template is not None:
+                self._compiled.move_to_end(key)
+        if template is not None:
+            jinja_compile_total.inc(source="memory")
+            return template
+
+        code = None
+        bucket = None
+        if self.bytecode_cache is not None:
+            bucket = self.bytecode_cache.get_bucket(self, key, None, source)
+            code = bucket.code
+        if code is None:
+            code = self.compile(source)
+            if bucket is not None:
+                bucket.code = code
+                self.bytecode_cache.set_bucket(bucket)
+            jinja_compile_total.inc(source="compile")
+        else:
+            jinja_compile_total.inc(source="bytecode")
+        template = self.template_class.from_code(self, code, self.make_globals(None), None)
+
+        with self._compiled_lock:
+            self._compiled[key] = template
+            while len(self._compiled) > self._compiled_size:
+                self._compiled.popitem(last=False)
+        return template
+
+
+def _bytecode_cache():
+    try:
+        os.makedirs(settings.JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"Кэш байткода Jinja недоступен: {e}")
+        return None
+    return FileSystemBytecodeCache(settings.JINJA_BYTECODE_CACHE_DIR)
+
+
+def create_jinja_env() -> DocxJinjaEnvironment:
+    env = DocxJinjaEnvironment(bytecode_cache=_bytecode_cache())
+    env.filters.update(FILTERS)
+    return env
+
+
+# Окружение воркера; Environment и скомпилированные шаблоны потокобезопасны при рендеринге
+jinja_env = create_jinja_env()
+
+_variables_cache: "OrderedDict[str, Optional[FrozenSet[str]]]" = OrderedDict()
+_variables_lock = threading.Lock()
+
+
+def template_variables(template_path: str, cache_key: str) -> Optional[FrozenSet[str]]:
+    """Переменные контекста, которые читает шаблон (тело, колонтитулы, условия и циклы).
+
+    Разбор AST выполняется один раз на содержимое шаблона (cache_key - хеш
+    содержимого). None - шаблон не разбирается (например, незакрытый
+    плейсхолдер), вызывающий готовит все значения.
+    """
+    with _variables_lock:
+        if cache_key in _variables_cache:
+            _variables_cache.move_to_end(cache_key)
+            return _variables_cache[cache_key]
+    try:
+        variables = frozenset(DocxTemplate(template_path).get_undeclared_template_variables(jinja_env))
+    except Exception as e:
+        print(f"Не удалось определить переменные шаблона {template_path}: {e}")
+        variables = None
+    with _variables_lock:
+        _variables_cache[cache_key] = variables
+        while len(_variables_cache) > settings.JINJA_TEMPLATE_CACHE_SIZE:
+            _variables_cache.popitem(last=False)
+    return variables
+
+
+def expression_variables(expression: str) -> List[str]:
+    """Переменные контекста в выражении плейсхолдера в порядке появления.
+
+    "amount|money" -> ["amount"], "client.name" -> ["client"]. Если выражение
+    не разбирается, имя - текст до первого фильтра.
+    """
+    try:
+        ast = jinja_env.parse("{{ %s }}" % expression)
+    except TemplateSyntaxError:
+        name = expression.split("|", 1)[0].strip()
+        return [name] if name else []
+    undeclared = meta.find_undeclared_variables(ast)
+    names = []
+    for node in ast.find_all(nodes.Name):
+        if node.name in undeclared and node.name not in names:
+            names.append(node.name)
+    return names
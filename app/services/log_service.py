@@ -1,9 +1,220 @@
-from app.models.action_log import ActionLog
+import re
+import json
+import datetime
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import cast, func, insert, literal, select, text, and_
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+from app.models.action_log import ActionLog, ActionLogCount
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.pagination import keyset
 
-def get_logs(db, user_id=None, action=None):
+# Журнал действий. В PostgreSQL action_logs секционирована по месяцам
+# (action_logs_yYYYYmMM + секция по умолчанию), устаревшие месяцы удаляются
+# целыми секциями. В остальных СУБД срок хранения соблюдается через DELETE.
+# Количество действий по месяцам ведется в action_log_counts при записи.
+
+_PARTITION_RE = re.compile(r"^action_logs_y(\d{4})m(\d{2})$")
+# Ключ pg_advisory_xact_lock: обслуживание секций выполняет один воркер за раз
+_MAINTENANCE_LOCK_ID = 802301
+
+
+def _month_start(value) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def _add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: datetime.date) -> str:
+    return f"action_logs_y{month.year:04d}m{month.month:02d}"
+
+
+def _upsert_counts(db: Session, counts: Counter):
+    if not counts:
+        return
+    rows = [{"month": month, "action": action, "count": count} for (month, action), count in counts.items()]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(ActionLogCount.__table__)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["month", "action"],
+                set_={"count": ActionLogCount.__table__.c.count + statement.excluded.count},
+            ),
+            rows,
+        )
+        return
+    for row in rows:
+        existing = db.get(ActionLogCount, (row["month"], row["action"]))
+        if existing:
+            existing.count += row["count"]
+        else:
+            db.add(ActionLogCount(**row))
+
+
+def write_logs(db: Session, entries: Iterable[Dict[str, Any]]) -> int:
+    """Записывает пачку логов и счетчики одним INSERT (без commit).
+
+    Элемент: user_id, action, target_type, target_id, details (dict), timestamp.
+    """
+    rows = []
+    counts = Counter()
+    now = datetime.datetime.utcnow()
+    for entry in entries:
+        row = {
+            "user_id": entry.get("user_id"),
+            "action": entry["action"],
+            "target_type": entry["target_type"],
+            "target_id": entry.get("target_id"),
+            "details": entry.get("details"),
+            "timestamp": entry.get("timestamp") or now,
+        }
+        rows.append(row)
+        counts[(_month_start(row["timestamp"]), row["action"])] += 1
+    if not rows:
+        return 0
+    db.execute(insert(ActionLog), rows)
+    _upsert_counts(db, counts)
+    return len(rows)
+
+
+def create_log(db: Session, user_id: Optional[int], action: str, target_type: str,
+               target_id: Optional[int] = None, details: Optional[Dict[str, Any]] = None):
+    """Записывает одно действие сразу (с commit)"""
+    write_logs(db, [{
+        "user_id": user_id,
+        "action": action,
+        "target_type": target_type,
+        "target_id": target_id,
+        "details": details,
+    }])
+    db.commit()
+
+
+def _details_condition(db: Session, details: Dict[str, Any]):
+    """Фильтр по вхождению пар ключ-значение в details"""
+    if db.get_bind().dialect.name == "postgresql":
+        # Оператор @> обслуживается GIN-индексом idx_action_logs_details
+        return ActionLog.details.op("@>")(cast(literal(json.dumps(details)), JSONB))
+    return and_(*[func.json_extract(ActionLog.details, f'$."{key}"') == value for key, value in details.items()])
+
+
+def get_logs(db, user_id=None, action=None, page=None, target_type=None, target_id=None,
+             date_from=None, date_to=None, details: Optional[Dict[str, Any]] = None):
     query = db.query(ActionLog)
     if user_id is not None:
         query = query.filter(ActionLog.user_id == user_id)
     if action is not None:
         query = query.filter(ActionLog.action == action)
-    return query.order_by(ActionLog.timestamp.desc()).all() 
\ No newline at end of file
+    if target_type is not None:
+        query = query.filter(ActionLog.target_type == target_type)
+    if target_id is not None:
+        query = query.filter(ActionLog.target_id == target_id)
+    # Границы по времени позволяют PostgreSQL не читать лишние секции
+    if date_from is not None:
+        query = query.filter(ActionLog.timestamp >= date_from)
+    if date_to is not None:
+        query = query.filter(ActionLog.timestamp < date_to)
+    if details:
+        query = query.filter(_details_condition(db, details))
+    if page is not None:
+        # Новые записи первыми; id различает записи с одинаковым временем
+        return keyset(query, page, [ActionLog.timestamp, ActionLog.id], descending=True).all()
+    return query.order_by(ActionLog.timestamp.desc()).all()
+
+
+def get_action_counts(db: Session, date_from: Optional[datetime.date] = None) -> Dict[str, int]:
+    """Количество действий по типам (с точностью до месяца: учитывается месяц date_from целиком)"""
+    query = db.query(ActionLogCount.action, func.sum(ActionLogCount.count))
+    if date_from is not None:
+        query = query.filter(ActionLogCount.month >= _month_start(date_from))
+    return {action: int(total) for action, total in query.group_by(ActionLogCount.action).all()}
+
+
+def _is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'action_logs'"
+    )).first() is not None
+
+
+def _list_partitions(db: Session) -> List[datetime.date]:
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'action_logs'"
+    )).scalars()
+    months = []
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if match:
+            months.append(datetime.date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def ensure_partitions(db: Session, months_ahead: int = None) -> List[str]:
+    """Создает секции текущего и months_ahead следующих месяцев"""
+    if months_ahead is None:
+        months_ahead = settings.ACTION_LOG_PARTITIONS_AHEAD
+    existing = set(_list_partitions(db))
+    current = _month_start(datetime.datetime.utcnow())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        if month in existing:
+            continue
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF action_logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        ))
+        created.append(_partition_name(month))
+    return created
+
+
+def apply_retention(db: Session, months: int = None) -> Dict[str, Any]:
+    """Удаляет логи старше срока хранения: целыми секциями, остаток - через DELETE"""
+    if months is None:
+        months = settings.ACTION_LOG_RETENTION_MONTHS
+    if months <= 0:
+        return {"cutoff": None, "dropped_partitions": [], "deleted_rows": 0}
+    cutoff = _add_months(_month_start(datetime.datetime.utcnow()), -months)
+    dropped = []
+    if _is_partitioned(db):
+        for month in _list_partitions(db):
+            if _add_months(month, 1) <= cutoff:
+                db.execute(text(f"DROP TABLE IF EXISTS {_partition_name(month)}"))
+                dropped.append(_partition_name(month))
+    # Остаток: секция по умолчанию или несекционированная таблица
+    deleted = db.query(ActionLog).filter(ActionLog.timestamp < cutoff).delete(synchronize_session=False)
+    db.query(ActionLogCount).filter(ActionLogCount.month < cutoff).delete(synchronize_session=False)
+    return {"cutoff": cutoff.isoformat(), "dropped_partitions": dropped, "deleted_rows": deleted}
+
+
+def maintain_action_logs() -> Dict[str, Any]:
+    """Обслуживание журнала: секции наперед и срок хранения (при старте и по cron)"""
+    db = SessionLocal()
+    try:
+        partitioned = _is_partitioned(db)
+        if partitioned:
+            db.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": _MAINTENANCE_LOCK_ID})
+        created = ensure_partitions(db) if partitioned else []
+        result = apply_retention(db)
+        db.commit()
+        result["created_partitions"] = created
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
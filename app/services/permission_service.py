@@ -1,20 +1,177 @@
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set, Tuple
+from fastapi import Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.models.folder import Folder
 from app.models.permission import Permission
 from app.schemas.permission import PermissionCreate
+from app.core.config import settings
+from app.core.db import get_db
+from app.core.security import CurrentUser, get_current_user
+
+# Уровни доступа по возрастанию: каждый следующий включает предыдущие
+LEVELS = ("view", "upload", "delete", "manage")
+LEVEL_RANK = {level: rank for rank, level in enumerate(LEVELS, start=1)}
+
+
+@dataclass(frozen=True)
+class AccessMap:
+    """Эффективные права пользователя: folder_id -> ранг уровня доступа.
+
+    Права, выданные на папку, наследуются всеми вложенными папками;
+    явно выданный более высокий уровень на вложенной папке имеет приоритет.
+    """
+    ranks: Dict[int, int] = field(default_factory=dict)
+    is_admin: bool = False
+
+    def level(self, folder_id: Optional[int]) -> Optional[str]:
+        if self.is_admin:
+            return "manage"
+        rank = self.ranks.get(folder_id)
+        return LEVELS[rank - 1] if rank else None
+
+    def can(self, folder_id: Optional[int], level: str = "view") -> bool:
+        return self.is_admin or self.ranks.get(folder_id, 0) >= LEVEL_RANK[level]
+
+    def folder_ids(self, level: str = "view") -> Set[int]:
+        """Папки с доступом не ниже level (для администратора не используется)"""
+        required = LEVEL_RANK[level]
+        return {folder_id for folder_id, rank in self.ranks.items() if rank >= required}
+
+    def digest(self) -> str:
+        """Отпечаток прав для ETag: ответ, отфильтрованный по другим правам, не совпадет"""
+        if self.is_admin:
+            return "admin"
+        raw = ",".join(f"{folder_id}:{rank}" for folder_id, rank in sorted(self.ranks.items()))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def where(self, folder_column, level: str = "view"):
+        """SQL-условие на колонку с id папки; None - фильтр не нужен (администратор)"""
+        return None if self.is_admin else folder_column.in_(self.folder_ids(level))
+
+
+ADMIN_ACCESS = AccessMap(is_admin=True)
+
+# Кэш карт доступа в пределах воркера. set_permission сбрасывает запись
+# пользователя, любые изменения папок - весь кэш (через счетчик версий).
+# Изменения из других воркеров видны не позже PERMISSION_CACHE_TTL_SECONDS.
+_access_cache: Dict[int, Tuple[float, int, AccessMap]] = {}
+_access_cache_lock = threading.Lock()
+_folders_version = 0
+
+
+def _get_cached_access(user_id: int) -> Optional[AccessMap]:
+    entry = _access_cache.get(user_id)
+    if entry is None:
+        return None
+    expires_at, version, access = entry
+    if expires_at < time.monotonic() or version != _folders_version:
+        with _access_cache_lock:
+            _access_cache.pop(user_id, None)
+        return None
+    return access
+
+
+def _cache_access(user_id: int, version: int, access: AccessMap):
+    if settings.PERMISSION_CACHE_TTL_SECONDS <= 0:
+        return
+    with _access_cache_lock:
+        if len(_access_cache) >= settings.PERMISSION_CACHE_MAX_SIZE:
+            oldest = sorted(_access_cache.items(), key=lambda item: item[1][0])[:len(_access_cache) // 4 or 1]
+            for cached_user_id, _ in oldest:
+                _access_cache.pop(cached_user_id, None)
+        _access_cache[user_id] = (time.monotonic() + settings.PERMISSION_CACHE_TTL_SECONDS, version, access)
+
+
+def invalidate_access_cache(user_id: int = None):
+    """Сбрасывает карту доступа пользователя или, без user_id, все карты (изменение папок)"""
+    global _folders_version
+    with _access_cache_lock:
+        if user_id is None:
+            _folders_version += 1
+            _access_cache.clear()
+        else:
+            _access_cache.pop(user_id, None)
+
+
+def _compute_access(db: Session, user_id: int) -> AccessMap:
+    """Строит карту доступа двумя запросами: права пользователя и структура папок"""
+    explicit: Dict[int, int] = {}
+    for folder_id, level in db.query(Permission.folder_id, Permission.level).filter(Permission.user_id == user_id):
+        rank = LEVEL_RANK.get(level, 0)
+        if rank > explicit.get(folder_id, 0):
+            explicit[folder_id] = rank
+    if not explicit:
+        return AccessMap()
+
+    ranks: Dict[int, int] = {}
+    # По пути родители идут раньше потомков, поэтому уровень родителя уже вычислен
+    for folder_id, parent_id in db.query(Folder.id, Folder.parent_id).order_by(Folder.path):
+        rank = max(explicit.get(folder_id, 0), ranks.get(parent_id, 0))
+        if rank:
+            ranks[folder_id] = rank
+    return AccessMap(ranks=ranks)
+
+
+def get_access_map(db: Session, user: CurrentUser) -> AccessMap:
+    """Эффективные права пользователя (из кэша или с пересчетом)"""
+    if user.is_admin:
+        return ADMIN_ACCESS
+    access = _get_cached_access(user.id)
+    if access is None:
+        version = _folders_version
+        access = _compute_access(db, user.id)
+        _cache_access(user.id, version, access)
+    return access
+
+
+async def get_current_access(
+    user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> AccessMap:
+    """Зависимость FastAPI: карта доступа текущего пользователя.
+
+    При попадании в кэш обходится без threadpool и запросов к БД.
+    """
+    if user.is_admin:
+        return ADMIN_ACCESS
+    access = _get_cached_access(user.id)
+    if access is None:
+        access = await run_in_threadpool(get_access_map, db, user)
+    return access
+
+
+def require_folder_access(access: AccessMap, folder_id: Optional[int], level: str = "view"):
+    """Бросает 403, если у пользователя нет нужного уровня доступа к папке"""
+    if not access.can(folder_id, level):
+        raise HTTPException(status_code=403, detail="Нет доступа к папке")
+
 
 def set_permission(db: Session, perm: PermissionCreate) -> Permission:
-    db_perm = Permission(
-        user_id=perm.user_id,
-        folder_id=perm.folder_id,
-        level=perm.level
-    )
-    db.add(db_perm)
+    if perm.level not in LEVEL_RANK:
+        raise HTTPException(status_code=400, detail=f"Неизвестный уровень доступа: {perm.level}")
+    # Для пары пользователь/папка хранится одна запись, повторная выдача обновляет уровень
+    db_perm = get_permission(db, perm.user_id, perm.folder_id)
+    if db_perm:
+        db_perm.level = perm.level
+    else:
+        db_perm = Permission(
+            user_id=perm.user_id,
+            folder_id=perm.folder_id,
+            level=perm.level
+        )
+        db.add(db_perm)
     db.commit()
     db.refresh(db_perm)
+    invalidate_access_cache(perm.user_id)
     return db_perm
 
 def get_permission(db: Session, user_id: int, folder_id: int):
     return db.query(Permission).filter(Permission.user_id == user_id, Permission.folder_id == folder_id).first()
 
 def get_permissions_for_user(db: Session, user_id: int):
-    return db.query(Permission).filter(Permission.user_id == user_id).all() 
\ No newline at end of file
+    return db.query(Permission).filter(Permission.user_id == user_id).all()
@@ -1,3 +1,4 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models.placeholder_description import PlaceholderDescription
 from typing import List, Dict, Optional
@@ -51,4 +52,12 @@ class PlaceholderService:
     def get_descriptions_dict(self, template_id: int) -> Dict[str, str]:
         """Возвращает словарь {placeholder_name: description} для шаблона"""
         descriptions = self.get_placeholder_descriptions(template_id)
-        return {desc.placeholder_name: desc.description for desc in descriptions if desc.description} 
\ No newline at end of file
+        return {desc.placeholder_name: desc.description for desc in descriptions if desc.description}
+
+
+async def get_descriptions_dict_async(db, template_id: int) -> Dict[str, str]:
+    """Асинхронный вариант PlaceholderService.get_descriptions_dict (db из get_async_db)"""
+    result = await db.execute(
+        select(PlaceholderDescription).where(PlaceholderDescription.template_id == template_id)
+    )
+    return {desc.placeholder_name: desc.description for desc in result.scalars().all() if desc.description}
@@ -0,0 +1,125 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.metrics import registry
+
+# Кэш отрендеренных документов на диске, общий для воркеров. Ключ - SHA-256
+# от хеша содержимого шаблона, канонического JSON значений и формата, поэтому
+# одинаковые строки (в одном пакете или в ежемесячных прогонах) не
+# рендерятся повторно. Файлы лежат в RENDER_CACHE_DIR/ab/<key>.<format>;
+# при обращении обновляется mtime, при превышении RENDER_CACHE_MAX_BYTES
+# удаляются самые давние.
+
+# Увеличивается при изменениях рендеринга, меняющих результат при тех же входных данных
+RENDER_CACHE_VERSION = 1
+
+render_cache_hits_total = registry.counter(
+    "render_cache_hits_total",
+    "Документы, взятые из кэша рендеринга",
+)
+render_cache_misses_total = registry.counter(
+    "render_cache_misses_total",
+    "Документы, отрендеренные заново (нет в кэше)",
+)
+
+
+def values_hash(values: Dict[str, Any]) -> str:
+    """Канонический хеш значений: порядок ключей и форматирование JSON не влияют"""
+    canonical = json.dumps(values, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def render_key(template_hash: str, values: Dict[str, Any], output_format: str) -> str:
+    raw = f"{RENDER_CACHE_VERSION}|{template_hash}|{values_hash(values)}|{output_format}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, root: str = None, max_bytes: int = None):
+        self.root = root or settings.RENDER_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.RENDER_CACHE_MAX_BYTES
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, output_format: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{output_format}")
+
+    def get(self, key: str, output_format: str, target_path: str) -> bool:
+        """Копирует документ из кэша в target_path; False - промах"""
+        path = self._path(key, output_format)
+        try:
+            try:
+                # Жесткая ссылка вместо копии, если кэш и цель на одном разделе
+                os.link(path, target_path)
+            except OSError:
+                if not os.path.exists(path):
+                    raise FileNotFoundError(path)
+                shutil.copyfile(path, target_path)
+            os.utime(path)
+        except FileNotFoundError:
+            render_cache_misses_total.inc()
+            return False
+        render_cache_hits_total.inc()
+        return True
+
+    def put(self, key: str, output_format: str, source_path: str):
+        """Сохраняет отрендеренный документ (атомарно: копия и rename)"""
+        path = self._path(key, output_format)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            self._written += os.path.getsize(path)
+            # Полный обход каталога - примерно после каждой десятой части лимита
+            need_evict = self._written > self.max_bytes // 10
+            if need_evict:
+                self._written = 0
+        if need_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Удаляет самые давние документы, пока кэш больше RENDER_CACHE_MAX_BYTES"""
+        if not os.path.isdir(self.root):
+            return 0
+        entries = []
+        total = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                # Временные файлы put() других воркеров не трогаем; записи мог
+                # удалить другой воркер между scandir и stat
+                if entry.name.endswith(".part"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+render_cache = RenderCache()
@@ -1,18 +1,66 @@
+import time
+import threading
 from sqlalchemy.orm import Session
 from app.models.settings import Settings
-from typing import Dict, List, Optional
+from app.core.config import settings as app_settings
+from app.core.table_versions import get_versions
+from typing import Dict, Iterable, List, Optional
+
+class SettingsSnapshot:
+    """Снимок активных настроек в памяти воркера.
+
+    Не чаще раза в SETTINGS_VERSION_CHECK_SECONDS снимок сверяет счетчик
+    версии таблицы settings (table_versions, один запрос по ключу) и при
+    изменении перечитывает настройки целиком. Так все воркеры видят
+    изменение не позже чем через этот интервал.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, str] = {}
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self, db: Session):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < app_settings.SETTINGS_VERSION_CHECK_SECONDS:
+            return
+        with self._lock:
+            if self._version is not None and now - self._checked_at < app_settings.SETTINGS_VERSION_CHECK_SECONDS:
+                return
+            version = get_versions(db, ("settings",)).get("settings", 0)
+            if version != self._version:
+                rows = db.query(Settings.key, Settings.value).filter(Settings.is_active == True).all()
+                self._values = {key: value for key, value in rows}
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def get(self, db: Session, key: str) -> Optional[str]:
+        self._refresh(db)
+        return self._values.get(key)
+
+    def get_many(self, db: Session, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        self._refresh(db)
+        return {key: self._values.get(key) for key in keys}
+
+    def invalidate(self):
+        """Принудительно перечитать снимок при следующем обращении"""
+        with self._lock:
+            self._version = None
+
+settings_snapshot = SettingsSnapshot()
 
 class SettingsService:
     def __init__(self, db: Session):
         self.db = db
     
     def get_setting(self, key: str) -> Optional[str]:
-        """Получает значение настройки по ключу"""
-        setting = self.db.query(Settings).filter(
-            Settings.key == key,
-            Settings.is_active == True
-        ).first()
-        return setting.value if setting else None
+        """Получает значение настройки по ключу (из снимка воркера)"""
+        return settings_snapshot.get(self.db, key)
+
+    def get_settings(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Получает значения нескольких настроек (None - настройки нет)"""
+        return settings_snapshot.get_many(self.db, keys)
     
     def set_setting(self, key: str, value: str, description: str = None) -> Settings:
         """Устанавливает или обновляет настройку"""
@@ -31,6 +79,7 @@ class SettingsService:
             self.db.add(setting)
         
         self.db.commit()
+        settings_snapshot.invalidate()
         self.db.refresh(setting)
         return setting
     
@@ -44,5 +93,6 @@ class SettingsService:
         if setting:
             setting.is_active = False
             self.db.commit()
+            settings_snapshot.invalidate()
             return True
         return False 
\ No newline at end of file
@@ -1,12 +1,21 @@
 import os
 import json
-import shutil
+import time
 from typing import List, Dict, Any, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from docxtpl import DocxTemplate
 from app.models.template import Template
 from app.models.folder import Folder
 from app.core.config import settings
+from app.core.pagination import PageParams, keyset
+from app.services.blob_service import (
+    blob_path, write_temp_blob, place_blob, discard_temp,
+    acquire_blob, release_blob, remove_unreferenced_blob,
+)
+from app.services.artifact_service import new_work_dir
+from app.services.jinja_env import jinja_env, template_variables, expression_variables
+from app.utils.deterministic_zip import normalize_zip
 
 class TemplateService:
     def __init__(self, db: Session):
@@ -15,29 +24,48 @@ class TemplateService:
 
     def _get_template_file_path(self, template: Template) -> str:
         """Получает путь к файлу шаблона"""
+        if template.content_hash:
+            return blob_path(template.content_hash)
+        # Шаблон загружен до хранилища по хешу и еще не перенесен
         return os.path.join(self.templates_dir, template.filename)
 
-    def upload_template(self, file, folder_id: int, user_id: int) -> Template:
-        """Загружает шаблон в указанную папку"""
-        # Создаем папку для шаблонов, если её нет
-        os.makedirs(self.templates_dir, exist_ok=True)
-        
-        # Сохраняем файл
-        filename = file.filename
-        file_path = os.path.join(self.templates_dir, filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Создаем запись в БД
-        template = Template(
-            filename=filename,
-            folder_id=folder_id,
-            uploaded_by=user_id
-        )
+    def get_template_variables(self, template: Template) -> Optional[frozenset]:
+        """Переменные, которые использует шаблон; None - определить не удалось"""
+        path = self._get_template_file_path(template)
+        if template.content_hash:
+            cache_key = template.content_hash
+        else:
+            if not os.path.exists(path):
+                return None
+            cache_key = f"{path}:{os.path.getmtime(path)}"
+        return template_variables(path, cache_key)
+
+    def upload_template(self, filename: str, content_hash: str, size: int, temp_path: str,
+                        folder_id: int, user_id: int) -> Template:
+        """Загружает шаблон в указанную папку.
+
+        Содержимое (temp_path из write_upload_blob) сохраняется в хранилище по
+        SHA-256: одинаковые файлы хранятся один раз, имя файла остается только
+        отображаемым.
+        """
+        filename = os.path.basename(filename)
+        try:
+            acquire_blob(self.db, content_hash, size)
+            template = Template(
+                filename=filename,
+                content_hash=content_hash,
+                size=size,
+                folder_id=folder_id,
+                uploaded_by=user_id
+            )
+            self.db.add(template)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            discard_temp(temp_path)
+            raise
         
-        self.db.add(template)
-        self.db.commit()
+        place_blob(temp_path, content_hash)
         self.db.refresh(template)
         
         return template
@@ -56,17 +84,53 @@ class TemplateService:
         if not template:
             return False
         
-        # Удаляем файл
-        file_path = self._get_template_file_path(template)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        content_hash = template.content_hash
+        legacy_path = None if content_hash else self._get_template_file_path(template)
+        unreferenced = release_blob(self.db, content_hash) if content_hash else False
         
         # Удаляем запись из БД
         self.db.delete(template)
         self.db.commit()
         
+        # Файл удаляется, только когда на содержимое не ссылается ни один шаблон
+        if unreferenced:
+            remove_unreferenced_blob(self.db, content_hash)
+        elif legacy_path and os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        
         return True
 
+    def adopt_legacy_templates(self) -> Dict[str, int]:
+        """Переносит файлы шаблонов, загруженных до хранилища по хешу, в хранилище.
+
+        Прежние файлы удаляются после переноса всех ссылающихся на них шаблонов.
+        """
+        adopted, missing = 0, 0
+        legacy_paths = set()
+        for template in self.db.query(Template).filter(Template.content_hash.is_(None)).all():
+            file_path = self._get_template_file_path(template)
+            if not os.path.exists(file_path):
+                print(f"Файл шаблона {template.id} не найден: {file_path}")
+                missing += 1
+                continue
+            with open(file_path, "rb") as source:
+                content_hash, size, temp_path = write_temp_blob(source)
+            try:
+                acquire_blob(self.db, content_hash, size)
+                template.content_hash = content_hash
+                template.size = size
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                discard_temp(temp_path)
+                raise
+            place_blob(temp_path, content_hash)
+            legacy_paths.add(file_path)
+            adopted += 1
+        for file_path in legacy_paths:
+            os.remove(file_path)
+        return {"adopted": adopted, "missing": missing}
+
     def extract_placeholders(self, template_id: int) -> List[str]:
         """Извлекает плейсхолдеры из шаблона используя docxtpl"""
         template = self.get_template_by_id(template_id)
@@ -122,12 +186,20 @@ class TemplateService:
                         matches = re.findall(r'\{\{\s*([^}]+)\s*\}\}', text)
                         placeholders.extend(matches)
             
-            # Очищаем плейсхолдеры от лишних пробелов и сохраняем порядок появления
+            # Выражения ("amount|money", "client.name") сводим к именам переменных
+            # и сохраняем порядок появления
             cleaned_placeholders = []
             for placeholder in placeholders:
-                cleaned = placeholder.strip()
-                if cleaned and cleaned not in cleaned_placeholders:
-                    cleaned_placeholders.append(cleaned)
+                for name in expression_variables(placeholder.strip()):
+                    if name not in cleaned_placeholders:
+                        cleaned_placeholders.append(name)
+            
+            # Разбор шаблона целиком: убирает переменные циклов и добавляет
+            # переменные из {% if %} и {% for %}, которых нет в {{ }}
+            used_variables = self.get_template_variables(template)
+            if used_variables is not None:
+                cleaned_placeholders = [name for name in cleaned_placeholders if name in used_variables]
+                cleaned_placeholders.extend(sorted(used_variables - set(cleaned_placeholders)))
             
             # Возвращаем в порядке появления в документе (без сортировки)
             print(f"Найдены плейсхолдеры: {cleaned_placeholders}")
@@ -137,8 +209,16 @@ class TemplateService:
             print(f"Ошибка извлечения плейсхолдеров: {e}")
             return []
 
-    def generate_document(self, template_id: int, values: Dict[str, Any], output_format: str = 'docx') -> str:
-        """Генерирует документ с заменой плейсхолдеров используя docxtpl"""
+    def generate_document(self, template_id: int, values: Dict[str, Any], output_format: str = 'docx',
+                          timings: Dict[str, float] = None, output_dir: str = None) -> str:
+        """Генерирует документ с заменой плейсхолдеров используя docxtpl.
+
+        Документ сохраняется в output_dir (по умолчанию - новый рабочий
+        каталог хранилища результатов, его удаляет вызывающий). Если передан
+        словарь timings, в него записываются длительности рендеринга
+        (render_ms) и конвертации в PDF (convert_ms).
+        """
+        render_started = time.perf_counter()
         template = self.get_template_by_id(template_id)
         if not template:
             raise ValueError("Шаблон не найден")
@@ -208,16 +288,14 @@ class TemplateService:
             except Exception as e:
                 print(f"Не удалось проверить/исправить шаблон: {e}, используем оригинальный файл")
             
-            # Загружаем шаблон с помощью docxtpl
-            # docxtpl не поддерживает передачу jinja_env в конструктор,
-            # поэтому используем стандартный DocxTemplate
+            # Загружаем шаблон с помощью docxtpl; окружение Jinja передается в render
             doc = DocxTemplate(template_path)
             
             print(f"Генерируем документ с контекстом: {values}")
             
             # Рендерим шаблон с обработкой ошибок Jinja2
             try:
-                doc.render(values)
+                doc.render(values, jinja_env)
             except Exception as render_error:
                 error_msg = str(render_error)
                 print(f"Ошибка рендеринга шаблона: {error_msg}")
@@ -252,17 +330,19 @@ class TemplateService:
                 else:
                     raise ValueError(f"Ошибка рендеринга шаблона: {error_msg}")
             
-            # Создаем папку для сгенерированных файлов
-            output_dir = os.path.join(self.templates_dir, 'generated')
-            os.makedirs(output_dir, exist_ok=True)
+            # Каталог для сгенерированного файла
+            if output_dir is None:
+                output_dir = new_work_dir()
             
             # Генерируем имя файла
             base_name = os.path.splitext(template.filename)[0]
             output_filename = f"generated_{base_name}.docx"
             output_path = os.path.join(output_dir, output_filename)
             
-            # Сохраняем документ
+            # Сохраняем документ; фиксированные даты записей ZIP делают результат
+            # побайтно одинаковым при одинаковых входных данных
             doc.save(output_path)
+            normalize_zip(output_path)
             
             print(f"Документ успешно сгенерирован: {output_path}")
             
@@ -274,9 +354,15 @@ class TemplateService:
                 except Exception as e:
                     print(f"Не удалось удалить временный файл: {e}")
             
+            if timings is not None:
+                timings["render_ms"] = round((time.perf_counter() - render_started) * 1000, 2)
+            
             # Конвертируем в PDF, если нужно
             if output_format == 'pdf':
+                convert_started = time.perf_counter()
                 pdf_path = self._convert_to_pdf(output_path)
+                if timings is not None:
+                    timings["convert_ms"] = round((time.perf_counter() - convert_started) * 1000, 2)
                 return pdf_path
             
             return output_path
@@ -325,24 +411,29 @@ class TemplateService:
                 if placeholder in paragraph.text:
                     paragraph.text = paragraph.text.replace(placeholder, str(value))
 
-    def _convert_to_pdf(self, docx_path: str) -> str:
-        """Конвертирует DOCX в PDF используя LibreOffice"""
+    def _convert_to_pdf(self, docx_path: str, export_bookmarks: bool = False) -> str:
+        """Конвертирует DOCX в PDF используя LibreOffice (PDF пишется рядом с DOCX).
+
+        export_bookmarks - закладки документа становятся именованными
+        назначениями PDF (LibreOffice 7.4+).
+        """
         try:
             import subprocess
-            import tempfile
             
-            # Создаем временную папку для конвертации
-            temp_dir = tempfile.mkdtemp()
+            output_dir = os.path.dirname(os.path.abspath(docx_path))
             
             # Путь к LibreOffice
-            libreoffice_path = "/usr/bin/libreoffice"
+            libreoffice_path = settings.LIBREOFFICE_PATH
             
             # Команда для конвертации
+            convert_to = "pdf"
+            if export_bookmarks:
+                convert_to = 'pdf:writer_pdf_Export:{"ExportBookmarksToPDFDestination":{"type":"boolean","value":"true"}}'
             cmd = [
                 libreoffice_path,
                 "--headless",
-                "--convert-to", "pdf",
-                "--outdir", temp_dir,
+                "--convert-to", convert_to,
+                "--outdir", output_dir,
                 docx_path
             ]
             
@@ -355,19 +446,12 @@ class TemplateService:
             
             # Находим сгенерированный PDF файл
             pdf_filename = os.path.splitext(os.path.basename(docx_path))[0] + ".pdf"
-            pdf_path = os.path.join(temp_dir, pdf_filename)
+            pdf_path = os.path.join(output_dir, pdf_filename)
             
             if not os.path.exists(pdf_path):
                 raise ValueError("PDF файл не был создан")
             
-            # Копируем PDF в папку с шаблонами
-            final_pdf_path = os.path.join(self.templates_dir, 'generated', pdf_filename)
-            shutil.copy2(pdf_path, final_pdf_path)
-            
-            # Очищаем временную папку
-            shutil.rmtree(temp_dir)
-            
-            return final_pdf_path
+            return pdf_path
             
         except Exception as e:
             print(f"Ошибка конвертации в PDF: {e}")
@@ -380,3 +464,34 @@ class TemplateService:
     def get_templates_by_user(self, user_id: int) -> List[Template]:
         """Получает шаблоны пользователя"""
         return self.db.query(Template).filter(Template.uploaded_by == user_id).all()
+
+
+# Колонки для списков: строки вместо ORM-объектов дешевле в выборке
+TEMPLATE_LIST_COLUMNS = (Template.id, Template.filename, Template.folder_id, Template.uploaded_by, Template.uploaded_at)
+
+async def get_all_templates_async(db, folder_condition=None, page: Optional[PageParams] = None):
+    """Асинхронный вариант TemplateService.get_all_templates (db из get_async_db).
+
+    folder_condition - условие доступа из AccessMap.where(Template.folder_id).
+    Возвращает строки с колонками TEMPLATE_LIST_COLUMNS.
+    """
+    statement = select(*TEMPLATE_LIST_COLUMNS)
+    if folder_condition is not None:
+        statement = statement.where(folder_condition)
+    if page is not None:
+        statement = keyset(statement, page, [Template.id])
+    result = await db.execute(statement)
+    return result.all()
+
+async def get_templates_by_folder_async(db, folder_id: int, page: Optional[PageParams] = None):
+    """Асинхронный вариант TemplateService.get_templates_by_folder (строки TEMPLATE_LIST_COLUMNS)"""
+    statement = select(*TEMPLATE_LIST_COLUMNS).where(Template.folder_id == folder_id)
+    if page is not None:
+        statement = keyset(statement, page, [Template.id])
+    result = await db.execute(statement)
+    return result.all()
+
+async def get_template_by_id_async(db, template_id: int) -> Optional[Template]:
+    """Асинхронный вариант TemplateService.get_template_by_id"""
+    result = await db.execute(select(Template).where(Template.id == template_id))
+    return result.scalars().first()
@@ -1,13 +1,14 @@
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash, invalidate_user_cache
 
-def create_user(db: Session, user: UserCreate) -> User:
+def create_user(db: Session, user: UserCreate, password_hash: str = None) -> User:
+    """Создает пользователя; password_hash можно вычислить заранее (см. get_password_hash_async)"""
     db_user = User(
         username=user.username,
         email=user.email,
-        password_hash=get_password_hash(user.password),
+        password_hash=password_hash or get_password_hash(user.password),
         is_active=False,
         is_admin=False
     )
@@ -41,6 +42,7 @@ def activate_user(db: Session, user_id: int, is_active: bool):
     if user:
         user.is_active = is_active
         db.commit()
+        invalidate_user_cache(user.username)
     return user
 
 def make_admin(db: Session, user_id: int, is_admin: bool):
@@ -49,4 +51,5 @@ def make_admin(db: Session, user_id: int, is_admin: bool):
     if user:
         user.is_admin = is_admin
         db.commit()
-    return user 
\ No newline at end of file
+        invalidate_user_cache(user.username)
+    return user 
@@ -0,0 +1,42 @@
+import os
+import shutil
+import zipfile
+import tempfile
+
+# Детерминированные ZIP-архивы: фиксированные дата и права у каждой записи,
+# поэтому одинаковое содержимое дает побайтно одинаковый архив (DOCX - тоже ZIP).
+
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_FILE_MODE = 0o644 << 16
+
+
+def _zip_info(arcname: str, compress_type: int) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(arcname, date_time=FIXED_DATE_TIME)
+    info.compress_type = compress_type
+    info.external_attr = _FILE_MODE
+    return info
+
+
+def write_file(zipf: zipfile.ZipFile, source_path: str, arcname: str, compress_type: int = zipfile.ZIP_DEFLATED):
+    """Добавляет файл в архив с фиксированными датой и правами (потоком, без чтения целиком)"""
+    with open(source_path, "rb") as source, zipf.open(_zip_info(arcname, compress_type), "w") as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+
+def write_bytes(zipf: zipfile.ZipFile, arcname: str, data: bytes, compress_type: int = zipfile.ZIP_DEFLATED):
+    zipf.writestr(_zip_info(arcname, compress_type), data)
+
+
+def normalize_zip(path: str):
+    """Переписывает архив на месте с фиксированными датами записей (порядок сохраняется)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".zip")
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(path) as source, zipfile.ZipFile(temp_path, "w") as target:
+            for item in source.infolist():
+                write_bytes(target, item.filename, source.read(item), item.compress_type)
+        os.replace(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
@@ -0,0 +1,94 @@
+import copy
+from typing import List, Optional
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docxcompose.composer import Composer
+
+# Объединение отрендеренных документов в один DOCX. Каждый документ
+# становится отдельным разделом (разрыв раздела с новой страницы), поэтому
+# сохраняются его поля, ориентация и колонтитулы. docxcompose переносит
+# содержимое, стили, нумерацию и изображения; колонтитулы, на которые
+# ссылаются разделы, переносятся здесь.
+
+_REFERENCE_PARTS = {
+    qn("w:headerReference"): (RT.HEADER, "/word/header%d.xml"),
+    qn("w:footerReference"): (RT.FOOTER, "/word/footer%d.xml"),
+}
+
+
+def _body_sectpr(document):
+    return document.element.body.find(qn("w:sectPr"))
+
+
+def _import_header_footer_parts(master, document, sectpr):
+    """Перепривязывает ссылки раздела на колонтитулы документа к master"""
+    imported = {}
+    for reference in sectpr:
+        if reference.tag not in _REFERENCE_PARTS:
+            continue
+        reltype, partname_template = _REFERENCE_PARTS[reference.tag]
+        rid = reference.get(qn("r:id"))
+        part = document.part.related_parts[rid]
+        if id(part) not in imported:
+            # Имя части уникально в пакете master (header1.xml есть в каждом документе)
+            part.partname = master.part.package.next_partname(partname_template)
+            imported[id(part)] = master.part.relate_to(part, reltype)
+        reference.set(qn("r:id"), imported[id(part)])
+
+
+def _end_section(master, sectpr):
+    """Закрывает раздел на последнем абзаце master настройками sectpr"""
+    body = master.element.body
+    last = body[-2] if len(body) > 1 else None
+    if last is None or last.tag != qn("w:p") or last.find(f"{qn('w:pPr')}/{qn('w:sectPr')}") is not None:
+        last = master.add_paragraph()._p
+    last.get_or_add_pPr().append(sectpr)
+
+
+def _add_bookmark(document, bookmark_id: int, name: str):
+    """Закладка на первом абзаце документа (ведет к началу документа)"""
+    body = document.element.body
+    paragraph = body.find(qn("w:p"))
+    if paragraph is None:
+        paragraph = document.add_paragraph()._p
+        body.remove(paragraph)
+        body.insert(0, paragraph)
+    start = OxmlElement("w:bookmarkStart")
+    start.set(qn("w:id"), str(bookmark_id))
+    start.set(qn("w:name"), name)
+    end = OxmlElement("w:bookmarkEnd")
+    end.set(qn("w:id"), str(bookmark_id))
+    position = 1 if paragraph.pPr is not None else 0
+    paragraph.insert(position, start)
+    paragraph.insert(position + 1, end)
+
+
+def merge_documents(paths: List[str], target_path: str, bookmarks: Optional[List[str]] = None):
+    """Объединяет DOCX в один файл: каждый документ - раздел с новой страницы.
+
+    bookmarks - имена закладок (по одной на документ: буквы, цифры, "_",
+    не длиннее 40 символов).
+    """
+    if not paths:
+        raise ValueError("Нет документов для объединения")
+    master = Document(paths[0])
+    if bookmarks:
+        _add_bookmark(master, 0, bookmarks[0])
+    composer = Composer(master)
+    for position, path in enumerate(paths[1:], start=1):
+        document = Document(path)
+        if bookmarks:
+            _add_bookmark(document, position, bookmarks[position])
+        # docxcompose пропускает настройки последнего раздела документа и снимает
+        # ссылки на колонтитулы, поэтому раздел закрывается здесь
+        sectpr = copy.deepcopy(_body_sectpr(document))
+        _import_header_footer_parts(master, document, sectpr)
+        _end_section(master, copy.deepcopy(_body_sectpr(master)) if position == 1 else previous_sectpr)
+        composer.append(document)
+        previous_sectpr = sectpr
+    if len(paths) > 1:
+        # Настройки последнего раздела итогового файла - от последнего документа
+        master.element.body.replace(_body_sectpr(master), previous_sectpr)
+    composer.save(target_path)
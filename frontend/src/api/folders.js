@@ -1,5 +1,6 @@
 import axios from 'axios';
 import { getCSRFToken } from './auth';
+import { fetchAllPages } from './pagination';
 
 // Определяем API_URL в зависимости от окружения
 const API_URL = process.env.REACT_APP_API_URL || 
@@ -7,10 +8,9 @@ const API_URL = process.env.REACT_APP_API_URL ||
 
 export async function getFolders() {
   try {
-    const res = await axios.get(`${API_URL}/folders/`, {
+    return await fetchAllPages(`${API_URL}/folders/`, {
       withCredentials: true
     });
-    return res.data;
   } catch (error) {
     console.error('Error fetching folders:', error);
     throw error;
@@ -0,0 +1,15 @@
+import axios from 'axios';
+
+// Загружает все страницы списка: сервер отдает курсор следующей страницы
+// в заголовке X-Next-Cursor (keyset-пагинация)
+export async function fetchAllPages(url, config = {}, extract = (data) => data) {
+  let items = [];
+  let cursor = null;
+  do {
+    const params = { ...(config.params || {}), ...(cursor ? { cursor } : {}) };
+    const res = await axios.get(url, { ...config, params });
+    items = items.concat(extract(res.data) || []);
+    cursor = res.headers['x-next-cursor'] || null;
+  } while (cursor);
+  return items;
+}
@@ -20,6 +20,17 @@ export async function getSetting(key) {
   }
 }
 
+// Несколько настроек одним запросом: { data: {key: value}, missing: [key] }
+export async function getSettingsBatch(keys) {
+  try {
+    const res = await api.get('/settings/batch', { params: { keys: keys.join(',') } });
+    return res;
+  } catch (error) {
+    console.error('Error fetching settings batch:', error);
+    throw error;
+  }
+}
+
 export async function createSetting(setting) {
   try {
     const res = await api.post('/settings/', setting);
@@ -1,5 +1,6 @@
 import axios from 'axios';
 import { getCSRFToken } from './auth';
+import { fetchAllPages } from './pagination';
 
 // Определяем API_URL в зависимости от окружения
 const API_URL = process.env.REACT_APP_API_URL || 
@@ -7,10 +8,9 @@ const API_URL = process.env.REACT_APP_API_URL ||
 
 export async function getTemplatesByFolder(folderId) {
   try {
-    const res = await axios.get(`${API_URL}/templates/folder/${folderId}`, {
+    return await fetchAllPages(`${API_URL}/templates/folder/${folderId}`, {
       withCredentials: true
-    });
-    return res.data.data || [];
+    }, (data) => data.data);
   } catch (error) {
     console.error('Error fetching templates:', error);
     throw error;
@@ -19,10 +19,9 @@ export async function getTemplatesByFolder(folderId) {
 
 export async function getTemplates() {
   try {
-    const res = await axios.get(`${API_URL}/templates/`, {
+    return await fetchAllPages(`${API_URL}/templates/`, {
       withCredentials: true
-    });
-    return res.data.data || [];
+    }, (data) => data.data);
   } catch (error) {
     console.error('Error fetching all templates:', error);
     throw error;
@@ -1,5 +1,6 @@
 import axios from 'axios';
 import { getCSRFToken } from './auth';
+import { fetchAllPages } from './pagination';
 
 // Определяем API_URL в зависимости от окружения
 const API_URL = process.env.REACT_APP_API_URL || 
@@ -7,10 +8,9 @@ const API_URL = process.env.REACT_APP_API_URL ||
 
 export async function getUsers() {
   try {
-    const res = await axios.get(`${API_URL}/users/`, {
+    return await fetchAllPages(`${API_URL}/users/`, {
       withCredentials: true
     });
-    return res.data;
   } catch (error) {
     console.error('Error fetching users:', error);
     throw error;
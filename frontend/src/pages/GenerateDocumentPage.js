@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { getFolders } from '../api/folders';
 import { getTemplatesByFolder, getTemplateFields, generateDocument } from '../api/templates';
-import { getSetting } from '../api/settings';
+import { getSettingsBatch } from '../api/settings';
 import { useAuth } from '../context/AuthContext';
 import TemplateSelectorModal from '../components/TemplateSelectorModal';
 import Loader from '../components/Loader';
@@ -24,27 +24,15 @@ export default function GenerateDocumentPage() {
   // Загружаем информационные поля при загрузке компонента
   useEffect(() => {
     const loadHelpInfo = async () => {
-      // Безопасная загрузка настроек с обработкой ошибок
-      const loadSettingSafely = async (key) => {
-        try {
-          const response = await getSetting(key);
-          if (response.data && response.data.value) {
-            return response.data.value;
-          }
-        } catch (error) {
-          console.log(`Setting '${key}' not found or error loading:`, error);
-        }
-        return null;
-      };
-
-      // Загружаем настройки параллельно
-      const [generalInfo, contractInfo] = await Promise.all([
-        loadSettingSafely('document_help_info'),
-        loadSettingSafely('contract_help_info')
-      ]);
-
-      if (generalInfo) setHelpInfo(generalInfo);
-      if (contractInfo) setContractHelpInfo(contractInfo);
+      // Загружаем обе настройки одним запросом; отсутствующие пропускаем
+      try {
+        const response = await getSettingsBatch(['document_help_info', 'contract_help_info']);
+        const values = (response.data && response.data.data) || {};
+        if (values.document_help_info) setHelpInfo(values.document_help_info);
+        if (values.contract_help_info) setContractHelpInfo(values.contract_help_info);
+      } catch (error) {
+        console.log('Help info settings not loaded:', error);
+      }
     };
     
     loadHelpInfo();
@@ -26,11 +26,45 @@ CREATE TABLE IF NOT EXISTS folders (
 CREATE TABLE IF NOT EXISTS templates (
     id SERIAL PRIMARY KEY,
     filename VARCHAR NOT NULL,
+    content_hash VARCHAR(64),
+    size BIGINT,
     folder_id INTEGER REFERENCES folders(id),
     uploaded_by INTEGER REFERENCES users(id),
     uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Содержимое шаблонов по SHA-256 (одинаковые загрузки хранятся один раз)
+CREATE TABLE IF NOT EXISTS template_blobs (
+    hash VARCHAR(64) PRIMARY KEY,
+    size BIGINT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Результаты генерации, доступные повторно по id (срок хранения и квота)
+CREATE TABLE IF NOT EXISTS artifacts (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    kind VARCHAR(16) NOT NULL,
+    filename VARCHAR NOT NULL,
+    media_type VARCHAR NOT NULL,
+    size BIGINT NOT NULL,
+    content_hash VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    last_accessed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Отпечатки строк реестра последнего пакета (инкрементальная генерация актов)
+CREATE TABLE IF NOT EXISTS act_row_fingerprints (
+    scope VARCHAR(64) NOT NULL,
+    row_key VARCHAR NOT NULL,
+    fingerprint VARCHAR(64) NOT NULL,
+    batch_id VARCHAR(32),
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (scope, row_key)
+);
+
 -- Создание таблицы разрешений
 CREATE TABLE IF NOT EXISTS permissions (
     id SERIAL PRIMARY KEY,
@@ -72,15 +106,31 @@ CREATE TABLE IF NOT EXISTS placeholder_descriptions (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Счетчики версий таблиц (ETag списков)
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO table_versions (table_name, version) VALUES
+    ('users', 0), ('folders', 0), ('templates', 0), ('permissions', 0), ('action_logs', 0), ('settings', 0)
+ON CONFLICT (table_name) DO NOTHING;
+
 -- Создание индексов для улучшения производительности
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_folders_path ON folders(path);
+CREATE INDEX IF NOT EXISTS idx_folders_path_prefix ON folders(path varchar_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_folders_parent_id ON folders(parent_id);
 CREATE INDEX IF NOT EXISTS idx_templates_folder_id ON templates(folder_id);
+CREATE INDEX IF NOT EXISTS idx_templates_uploaded_by ON templates(uploaded_by);
+CREATE INDEX IF NOT EXISTS idx_templates_content_hash ON templates(content_hash);
+CREATE INDEX IF NOT EXISTS idx_artifacts_user_created ON artifacts(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_artifacts_expires_at ON artifacts(expires_at);
+CREATE INDEX IF NOT EXISTS idx_artifacts_last_accessed_at ON artifacts(last_accessed_at);
 CREATE INDEX IF NOT EXISTS idx_permissions_user_folder ON permissions(user_id, folder_id);
-CREATE INDEX IF NOT EXISTS idx_action_logs_user_id ON action_logs(user_id);
+CREATE INDEX IF NOT EXISTS idx_action_logs_user_action_timestamp ON action_logs(user_id, action, timestamp);
 CREATE INDEX IF NOT EXISTS idx_action_logs_timestamp ON action_logs(timestamp);
-CREATE INDEX IF NOT EXISTS idx_placeholder_descriptions_template_id ON placeholder_descriptions(template_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_placeholder_descriptions_template_placeholder ON placeholder_descriptions(template_id, placeholder_name);
 
 -- Вставка начальных данных
 
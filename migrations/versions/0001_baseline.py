@@ -0,0 +1,104 @@
+"""Исходная схема (соответствует init.sql)
+
+Таблицы создаются только если их еще нет: базы, развернутые через
+init.sql или scripts/database/init_db.py, проходят эту ревизию без изменений.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _missing(table_name: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(table_name)
+
+
+def upgrade() -> None:
+    if _missing("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("username", sa.String, unique=True, nullable=False),
+            sa.Column("email", sa.String, unique=True, nullable=False),
+            sa.Column("password_hash", sa.String, nullable=False),
+            sa.Column("is_active", sa.Boolean, server_default=sa.false()),
+            sa.Column("is_admin", sa.Boolean, server_default=sa.false()),
+            sa.Column("date_joined", sa.DateTime, server_default=sa.func.now()),
+        )
+    if _missing("folders"):
+        op.create_table(
+            "folders",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("name", sa.String, nullable=False),
+            sa.Column("parent_id", sa.Integer, sa.ForeignKey("folders.id")),
+            sa.Column("path", sa.String, unique=True, nullable=False),
+            sa.Column("created_by", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+        )
+    if _missing("templates"):
+        op.create_table(
+            "templates",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("filename", sa.String, nullable=False),
+            sa.Column("folder_id", sa.Integer, sa.ForeignKey("folders.id")),
+            sa.Column("uploaded_by", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("uploaded_at", sa.DateTime, server_default=sa.func.now()),
+        )
+        op.create_index("idx_templates_folder_id", "templates", ["folder_id"])
+    if _missing("permissions"):
+        op.create_table(
+            "permissions",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("folder_id", sa.Integer, sa.ForeignKey("folders.id")),
+            sa.Column("level", sa.String, nullable=False),
+        )
+        op.create_index("idx_permissions_user_folder", "permissions", ["user_id", "folder_id"])
+    if _missing("action_logs"):
+        op.create_table(
+            "action_logs",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("action", sa.String, nullable=False),
+            sa.Column("target_type", sa.String, nullable=False),
+            sa.Column("target_id", sa.Integer),
+            sa.Column("timestamp", sa.DateTime, server_default=sa.func.now()),
+            sa.Column("details", sa.Text),
+        )
+        op.create_index("idx_action_logs_user_id", "action_logs", ["user_id"])
+        op.create_index("idx_action_logs_timestamp", "action_logs", ["timestamp"])
+    if _missing("settings"):
+        op.create_table(
+            "settings",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("key", sa.String(255), unique=True, nullable=False),
+            sa.Column("value", sa.Text),
+            sa.Column("description", sa.String(500)),
+            sa.Column("is_active", sa.Boolean, server_default=sa.true()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+    if _missing("placeholder_descriptions"):
+        op.create_table(
+            "placeholder_descriptions",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("template_id", sa.Integer, sa.ForeignKey("templates.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("placeholder_name", sa.String(255), nullable=False),
+            sa.Column("description", sa.Text),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index("idx_placeholder_descriptions_template_id", "placeholder_descriptions", ["template_id"])
+
+
+def downgrade() -> None:
+    for table_name in ("placeholder_descriptions", "settings", "action_logs",
+                       "permissions", "templates", "folders", "users"):
+        op.drop_table(table_name)
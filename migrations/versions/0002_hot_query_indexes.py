@@ -0,0 +1,62 @@
+"""Индексы для горячих запросов
+
+- templates(folder_id), templates(uploaded_by): список шаблонов папки и "мои шаблоны";
+- permissions(user_id, folder_id): права пользователя при каждой проверке
+  доступа; составной индекс обслуживает и выборки только по user_id;
+- action_logs(user_id, action, timestamp): фильтры и сортировка журнала действий;
+- уникальная пара placeholder_descriptions(template_id, placeholder_name):
+  на нее опирается upsert описаний (ON CONFLICT в init.sql), дубликаты
+  перед созданием ограничения удаляются (остается последняя запись).
+
+Индексы создаются с IF NOT EXISTS, так как часть из них могла быть
+создана init.sql или Base.metadata.create_all.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("idx_templates_folder_id", "templates", "folder_id"),
+    ("idx_templates_uploaded_by", "templates", "uploaded_by"),
+    ("idx_permissions_user_folder", "permissions", "user_id, folder_id"),
+    ("idx_action_logs_user_action_timestamp", "action_logs", "user_id, action, timestamp"),
+    ("idx_action_logs_timestamp", "action_logs", "timestamp"),
+)
+
+PLACEHOLDER_UNIQUE = "uq_placeholder_descriptions_template_placeholder"
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+    op.execute(
+        "DELETE FROM placeholder_descriptions WHERE id NOT IN ("
+        "SELECT MAX(id) FROM placeholder_descriptions GROUP BY template_id, placeholder_name)"
+    )
+    # Уникальный индекс покрывает выборки по template_id, отдельный индекс больше не нужен
+    op.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {PLACEHOLDER_UNIQUE} "
+        "ON placeholder_descriptions (template_id, placeholder_name)"
+    )
+    op.execute("DROP INDEX IF EXISTS idx_placeholder_descriptions_template_id")
+    # Заменен составным индексом (user_id, action, timestamp)
+    op.execute("DROP INDEX IF EXISTS idx_action_logs_user_id")
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS idx_action_logs_user_id ON action_logs (user_id)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_placeholder_descriptions_template_id "
+        "ON placeholder_descriptions (template_id)"
+    )
+    op.execute(f"DROP INDEX IF EXISTS {PLACEHOLDER_UNIQUE}")
+    op.execute("DROP INDEX IF EXISTS idx_action_logs_user_action_timestamp")
+    op.execute("DROP INDEX IF EXISTS idx_templates_uploaded_by")
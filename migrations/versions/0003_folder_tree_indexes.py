@@ -0,0 +1,28 @@
+"""Индексы для дерева папок
+
+- folders(parent_id): выборка дочерних папок;
+- folders(path varchar_pattern_ops): выборка поддерева по префиксу
+  материализованного пути (LIKE '/a/b/%') при любой collation базы.
+  В SQLite отдельный индекс не нужен.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS idx_folders_parent_id ON folders (parent_id)")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE INDEX IF NOT EXISTS idx_folders_path_prefix ON folders (path varchar_pattern_ops)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_folders_path_prefix")
+    op.execute("DROP INDEX IF EXISTS idx_folders_parent_id")
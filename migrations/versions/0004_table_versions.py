@@ -0,0 +1,35 @@
+"""Счетчики версий таблиц для ETag списков
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+TRACKED_TABLES = ("users", "folders", "templates", "permissions", "action_logs")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Таблица может уже существовать, если база создана через init.sql
+    if not sa.inspect(bind).has_table("table_versions"):
+        op.create_table(
+            "table_versions",
+            sa.Column("table_name", sa.String(64), primary_key=True),
+            sa.Column("version", sa.BigInteger, nullable=False, server_default="0"),
+        )
+    table_versions = sa.table("table_versions", sa.column("table_name"), sa.column("version"))
+    existing = set(bind.execute(sa.select(table_versions.c.table_name)).scalars())
+    missing = [{"table_name": name, "version": 0} for name in TRACKED_TABLES if name not in existing]
+    if missing:
+        op.bulk_insert(table_versions, missing)
+
+
+def downgrade() -> None:
+    op.drop_table("table_versions")
@@ -0,0 +1,168 @@
+"""Журнал действий: месячные секции, details в JSON, счетчики действий
+
+PostgreSQL: action_logs пересоздается как таблица, секционированная по
+RANGE(timestamp) помесячно, с секцией по умолчанию; существующие записи
+переносятся. details становится JSONB с GIN-индексом; прежний текст
+сохраняется как {"message": "..."}.
+Остальные СУБД: details переводится в JSON-объект тем же способом,
+добавляются индексы.
+
+Во всех СУБД создается action_log_counts (месяц, действие, количество)
+и заполняется по существующим записям.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+import datetime
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def _add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _create_counts_table():
+    op.create_table(
+        "action_log_counts",
+        sa.Column("month", sa.Date, primary_key=True),
+        sa.Column("action", sa.String, primary_key=True),
+        sa.Column("count", sa.BigInteger, nullable=False, server_default="0"),
+    )
+
+
+def _details_is_json(bind) -> bool:
+    columns = {column["name"]: column["type"] for column in sa.inspect(bind).get_columns("action_logs")}
+    return isinstance(columns.get("details"), sa.JSON)
+
+
+def _is_partitioned(bind) -> bool:
+    return bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'action_logs'"
+    )).first() is not None
+
+
+def _upgrade_postgresql():
+    bind = op.get_bind()
+    if _is_partitioned(bind):
+        return
+    # Таблица, созданная Base.metadata.create_all, уже содержит JSONB
+    details_source = "details" if _details_is_json(bind) else (
+        "CASE WHEN details IS NULL THEN NULL ELSE jsonb_build_object('message', details) END"
+    )
+    op.execute("ALTER TABLE action_logs RENAME TO action_logs_legacy")
+    for index_name in ("idx_action_logs_user_id", "idx_action_logs_timestamp",
+                       "idx_action_logs_user_action_timestamp", "idx_action_logs_timestamp_id",
+                       "idx_action_logs_target", "idx_action_logs_details"):
+        op.execute(f"DROP INDEX IF EXISTS {index_name}")
+    op.execute("ALTER SEQUENCE action_logs_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE action_logs (
+            id INTEGER NOT NULL DEFAULT nextval('action_logs_id_seq'),
+            user_id INTEGER REFERENCES users(id),
+            action VARCHAR NOT NULL,
+            target_type VARCHAR NOT NULL,
+            target_id INTEGER,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            details JSONB,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("CREATE TABLE action_logs_default PARTITION OF action_logs DEFAULT")
+
+    # Секции от самой старой записи до двух месяцев вперед
+    oldest = bind.execute(sa.text("SELECT MIN(timestamp) FROM action_logs_legacy")).scalar()
+    today = datetime.date.today()
+    month = datetime.date((oldest or today).year, (oldest or today).month, 1)
+    last = _add_months(datetime.date(today.year, today.month, 1), 2)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE action_logs_y{month.year:04d}m{month.month:02d} PARTITION OF action_logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+
+    op.execute(f"""
+        INSERT INTO action_logs (id, user_id, action, target_type, target_id, timestamp, details)
+        SELECT id, user_id, action, target_type, target_id, COALESCE(timestamp, CURRENT_TIMESTAMP),
+               {details_source}
+        FROM action_logs_legacy
+    """)
+    op.execute("DROP TABLE action_logs_legacy")
+    op.execute("ALTER SEQUENCE action_logs_id_seq OWNED BY action_logs.id")
+
+    op.execute("CREATE INDEX idx_action_logs_timestamp_id ON action_logs (timestamp, id)")
+    op.execute("CREATE INDEX idx_action_logs_user_action_timestamp ON action_logs (user_id, action, timestamp)")
+    op.execute("CREATE INDEX idx_action_logs_target ON action_logs (target_type, target_id, timestamp)")
+    op.execute("CREATE INDEX idx_action_logs_details ON action_logs USING gin (details)")
+
+
+def _upgrade_generic():
+    op.execute(
+        "UPDATE action_logs SET details = json_object('message', details) "
+        "WHERE details IS NOT NULL AND json_valid(details) = 0"
+        if op.get_bind().dialect.name == "sqlite" else
+        "UPDATE action_logs SET details = NULL WHERE details = ''"
+    )
+    op.execute("DROP INDEX IF EXISTS idx_action_logs_timestamp")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_action_logs_timestamp_id ON action_logs (timestamp, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_action_logs_target ON action_logs (target_type, target_id, timestamp)")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        _upgrade_postgresql()
+    else:
+        _upgrade_generic()
+    if sa.inspect(bind).has_table("action_log_counts"):
+        return
+    _create_counts_table()
+    op.execute("""
+        INSERT INTO action_log_counts (month, action, count)
+        SELECT month, action, COUNT(*) FROM (
+            SELECT date(timestamp, 'start of month') AS month, action FROM action_logs
+        ) AS logs GROUP BY month, action
+    """ if op.get_bind().dialect.name == "sqlite" else """
+        INSERT INTO action_log_counts (month, action, count)
+        SELECT CAST(date_trunc('month', timestamp) AS DATE), action, COUNT(*)
+        FROM action_logs GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("action_log_counts")
+    if op.get_bind().dialect.name != "postgresql":
+        op.execute("DROP INDEX IF EXISTS idx_action_logs_target")
+        op.execute("DROP INDEX IF EXISTS idx_action_logs_timestamp_id")
+        op.execute("CREATE INDEX IF NOT EXISTS idx_action_logs_timestamp ON action_logs (timestamp)")
+        return
+    op.execute("ALTER TABLE action_logs RENAME TO action_logs_partitioned")
+    op.execute("ALTER SEQUENCE action_logs_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE action_logs (
+            id INTEGER PRIMARY KEY DEFAULT nextval('action_logs_id_seq'),
+            user_id INTEGER REFERENCES users(id),
+            action VARCHAR NOT NULL,
+            target_type VARCHAR NOT NULL,
+            target_id INTEGER,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            details TEXT
+        )
+    """)
+    op.execute("""
+        INSERT INTO action_logs (id, user_id, action, target_type, target_id, timestamp, details)
+        SELECT id, user_id, action, target_type, target_id, timestamp, details::text FROM action_logs_partitioned
+    """)
+    op.execute("DROP TABLE action_logs_partitioned CASCADE")
+    op.execute("ALTER SEQUENCE action_logs_id_seq OWNED BY action_logs.id")
+    op.execute("CREATE INDEX idx_action_logs_user_action_timestamp ON action_logs (user_id, action, timestamp)")
+    op.execute("CREATE INDEX idx_action_logs_timestamp ON action_logs (timestamp)")
@@ -0,0 +1,24 @@
+"""Счетчик версии таблицы settings (снимок настроек в воркерах)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    exists = bind.execute(sa.text("SELECT 1 FROM table_versions WHERE table_name = 'settings'")).first()
+    if not exists:
+        op.execute("INSERT INTO table_versions (table_name, version) VALUES ('settings', 0)")
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM table_versions WHERE table_name = 'settings'")
@@ -0,0 +1,44 @@
+"""Хранилище шаблонов по SHA-256: template_blobs, templates.content_hash/size
+
+Файлы существующих шаблонов переносятся в хранилище скриптом
+scripts/database/migrate_template_blobs.py; до переноса они читаются
+по прежнему пути TEMPLATES_DIR/filename.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # Таблица и колонки могут уже существовать, если база создана через init.sql
+    if not inspector.has_table("template_blobs"):
+        op.create_table(
+            "template_blobs",
+            sa.Column("hash", sa.String(64), primary_key=True),
+            sa.Column("size", sa.BigInteger, nullable=False),
+            sa.Column("ref_count", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+        )
+    columns = {column["name"] for column in inspector.get_columns("templates")}
+    if "content_hash" not in columns:
+        op.add_column("templates", sa.Column("content_hash", sa.String(64)))
+    if "size" not in columns:
+        op.add_column("templates", sa.Column("size", sa.BigInteger))
+    op.execute("CREATE INDEX IF NOT EXISTS idx_templates_content_hash ON templates (content_hash)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_templates_content_hash")
+    with op.batch_alter_table("templates") as batch:
+        batch.drop_column("size")
+        batch.drop_column("content_hash")
+    op.drop_table("template_blobs")
@@ -0,0 +1,38 @@
+"""Хранилище результатов генерации: artifacts
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Таблица может уже существовать, если база создана через init.sql
+    if not sa.inspect(op.get_bind()).has_table("artifacts"):
+        op.create_table(
+            "artifacts",
+            sa.Column("id", sa.String(32), primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("kind", sa.String(16), nullable=False),
+            sa.Column("filename", sa.String, nullable=False),
+            sa.Column("media_type", sa.String, nullable=False),
+            sa.Column("size", sa.BigInteger, nullable=False),
+            sa.Column("content_hash", sa.String(64), nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False, server_default=sa.func.now()),
+            sa.Column("expires_at", sa.DateTime, nullable=False),
+            sa.Column("last_accessed_at", sa.DateTime, nullable=False, server_default=sa.func.now()),
+        )
+    op.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_user_created ON artifacts (user_id, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_expires_at ON artifacts (expires_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_last_accessed_at ON artifacts (last_accessed_at)")
+
+
+def downgrade() -> None:
+    op.drop_table("artifacts")
@@ -0,0 +1,30 @@
+"""Отпечатки строк реестра для инкрементальной генерации актов
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Таблица может уже существовать, если база создана через init.sql
+    if not sa.inspect(op.get_bind()).has_table("act_row_fingerprints"):
+        op.create_table(
+            "act_row_fingerprints",
+            sa.Column("scope", sa.String(64), primary_key=True),
+            sa.Column("row_key", sa.String, primary_key=True),
+            sa.Column("fingerprint", sa.String(64), nullable=False),
+            sa.Column("batch_id", sa.String(32)),
+            sa.Column("updated_at", sa.DateTime, nullable=False, server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("act_row_fingerprints")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Проверка планов горячих запросов на наполненной тестовыми данными БД.
+
+Скрипт заполняет таблицы синтетическими данными внутри транзакции,
+выполняет ANALYZE и EXPLAIN для запросов, которые приложение выполняет
+чаще всего, и проверяет, что планировщик использует индексы.
+Транзакция откатывается, данные в базе не остаются.
+
+    DATABASE_URL=postgresql://... python scripts/database/check_query_plans.py --rows 20000
+
+Код возврата 1, если хотя бы один запрос выполняется полным сканированием.
+"""
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import create_engine, text
+from app.core.config import settings
+
+# Запрос, параметры и имя индекса, который должен появиться в плане
+HOT_QUERIES = [
+    ("Шаблоны папки",
+     "SELECT * FROM templates WHERE folder_id = :folder_id",
+     {"folder_id": 7}, "idx_templates_folder_id"),
+    ("Шаблоны пользователя",
+     "SELECT * FROM templates WHERE uploaded_by = :user_id",
+     {"user_id": 7}, "idx_templates_uploaded_by"),
+    ("Права пользователя",
+     "SELECT * FROM permissions WHERE user_id = :user_id",
+     {"user_id": 7}, "idx_permissions_user_folder"),
+    ("Описания плейсхолдеров шаблона",
+     "SELECT * FROM placeholder_descriptions WHERE template_id = :template_id",
+     {"template_id": 7}, "uq_placeholder_descriptions_template_placeholder"),
+    ("Журнал действий пользователя",
+     "SELECT * FROM action_logs WHERE user_id = :user_id AND action = :action "
+     "ORDER BY timestamp DESC LIMIT 50",
+     {"user_id": 7, "action": "download"}, "idx_action_logs_user_action_timestamp"),
+]
+
+SEED_OFFSET = 1_000_000
+
+
+def _seed(conn, rows: int):
+    """Синтетические данные с id выше SEED_OFFSET, чтобы не пересекаться с реальными"""
+    users = max(rows // 100, 10)
+    folders = max(rows // 50, 10)
+    conn.execute(text(
+        "INSERT INTO users (id, username, email, password_hash, is_active, is_admin) "
+        "VALUES (:id, :username, :email, 'x', true, false)"
+    ), [{"id": SEED_OFFSET + i, "username": f"plan_user_{i}", "email": f"plan_{i}@example.com"}
+        for i in range(users)])
+    conn.execute(text(
+        "INSERT INTO folders (id, name, path, created_by) VALUES (:id, :name, :path, :created_by)"
+    ), [{"id": SEED_OFFSET + i, "name": f"plan_{i}", "path": f"/plan/{i}", "created_by": SEED_OFFSET + i % users}
+        for i in range(folders)])
+    conn.execute(text(
+        "INSERT INTO templates (id, filename, folder_id, uploaded_by) VALUES (:id, :filename, :folder_id, :uploaded_by)"
+    ), [{"id": SEED_OFFSET + i, "filename": f"plan_{i}.docx",
+         "folder_id": SEED_OFFSET + i % folders, "uploaded_by": SEED_OFFSET + i % users}
+        for i in range(rows)])
+    conn.execute(text(
+        "INSERT INTO permissions (user_id, folder_id, level) VALUES (:user_id, :folder_id, 'view')"
+    ), [{"user_id": SEED_OFFSET + i % users, "folder_id": SEED_OFFSET + i % folders} for i in range(rows)])
+    conn.execute(text(
+        "INSERT INTO placeholder_descriptions (template_id, placeholder_name, description) "
+        "VALUES (:template_id, :name, 'plan')"
+    ), [{"template_id": SEED_OFFSET + i % rows, "name": f"field_{i // rows}"} for i in range(rows * 3)])
+    conn.execute(text(
+        "INSERT INTO action_logs (user_id, action, target_type, target_id) "
+        "VALUES (:user_id, :action, 'template', :target_id)"
+    ), [{"user_id": SEED_OFFSET + i % users, "action": ("download", "upload", "delete", "login")[i % 4],
+         "target_id": i} for i in range(rows * 5)])
+    conn.execute(text("ANALYZE"))
+
+
+def _explain(conn, sql: str, params: dict) -> str:
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+        return "\n".join(str(row[-1]) for row in rows)
+    rows = conn.execute(text(f"EXPLAIN {sql}"), params).fetchall()
+    return "\n".join(row[0] for row in rows)
+
+
+def check_query_plans(rows: int) -> bool:
+    engine = create_engine(settings.DATABASE_URL)
+    all_ok = True
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            _seed(conn, rows)
+            for title, sql, params, index_name in HOT_QUERIES:
+                real_params = {k: SEED_OFFSET + v if isinstance(v, int) else v for k, v in params.items()}
+                plan = _explain(conn, sql, real_params)
+                ok = index_name in plan
+                all_ok = all_ok and ok
+                print(f"{'✅' if ok else '❌'} {title}: ожидается {index_name}")
+                if not ok:
+                    print("   " + plan.replace("\n", "\n   "))
+        finally:
+            trans.rollback()
+    return all_ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка использования индексов горячими запросами")
+    parser.add_argument("--rows", type=int, default=20000, help="Количество синтетических шаблонов")
+    args = parser.parse_args()
+    sys.exit(0 if check_query_plans(args.rows) else 1)
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""Обслуживание журнала действий: секции на ACTION_LOG_PARTITIONS_AHEAD месяцев
+вперед и удаление записей старше ACTION_LOG_RETENTION_MONTHS.
+
+Выполняется также при старте приложения; для долгоживущих контейнеров
+запускать ежедневно по cron:
+
+    0 3 * * * docker-compose -f docker-compose.prod.yaml exec -T backend python scripts/database/maintain_action_logs.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.services.log_service import maintain_action_logs
+
+if __name__ == "__main__":
+    try:
+        result = maintain_action_logs()
+    except Exception as e:
+        print(f"❌ Ошибка обслуживания журнала: {e}")
+        sys.exit(1)
+    print(f"✅ Журнал действий обслужен: {result}")
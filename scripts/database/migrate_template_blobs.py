@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""Перенос файлов шаблонов, загруженных до хранилища по SHA-256, в
+TEMPLATE_BLOBS_DIR. Повторный запуск безопасен: обрабатываются только
+шаблоны без content_hash.
+
+    docker-compose -f docker-compose.prod.yaml exec -T backend python scripts/database/migrate_template_blobs.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.db import SessionLocal
+from app.services.template_service import TemplateService
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        result = TemplateService(db).adopt_legacy_templates()
+    except Exception as e:
+        print(f"❌ Ошибка переноса шаблонов: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+    print(f"✅ Шаблоны перенесены в хранилище: {result}")
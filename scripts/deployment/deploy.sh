@@ -101,9 +101,9 @@ wait_for_services() {
         sleep 2
     done
     
-    # Wait for backend
+    # Wait for backend (readiness: DB, disk, LibreOffice)
     echo "Waiting for backend..."
-    until curl -f http://localhost:8000/health > /dev/null 2>&1; do
+    until curl -f http://localhost:8000/ready > /dev/null 2>&1; do
         sleep 2
     done
     
@@ -113,6 +113,8 @@ wait_for_services() {
 # Function to initialize database
 initialize_database() {
     echo -e "${GREEN}🗄️  Initializing database...${NC}"
+    docker-compose -f docker-compose.prod.yaml exec -T backend alembic upgrade head
+    docker-compose -f docker-compose.prod.yaml exec -T backend python scripts/database/migrate_template_blobs.py
     docker-compose -f docker-compose.prod.yaml exec -T backend python init_db.py
     docker-compose -f docker-compose.prod.yaml exec -T backend python activate_admin.py
     echo -e "${GREEN}✅ Database initialized${NC}"
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Настройки читаются при импорте app.core.config: тесты работают с SQLite и
+# временным каталогом, а не с БД и файлами окружения
+_work_dir = tempfile.mkdtemp(prefix="contract-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_work_dir}/test.db")
+os.environ.setdefault("TEMPLATES_DIR", os.path.join(_work_dir, "templates"))
+os.environ.setdefault("DB_ASYNC_ENABLED", "false")
@@ -0,0 +1,67 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.db import Base, SessionLocal, engine
+from app.core.query_counter import query_budget
+from app.core.security import create_access_token
+from app.models.folder import Folder
+from app.models.permission import Permission
+from app.models.template import Template
+from app.models.user import User
+
+
+@pytest.fixture(scope="module")
+def client():
+    import app.main as main
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            User(id=1, username="admin", email="admin@example.com", password_hash="-", is_active=True, is_admin=True),
+            User(id=2, username="viewer", email="viewer@example.com", password_hash="-", is_active=True, is_admin=False),
+        ])
+        db.add_all([Folder(id=folder_id, name=f"f{folder_id}", path=f"/f{folder_id}", created_by=1) for folder_id in (1, 2)])
+        db.add(Permission(user_id=2, folder_id=1, level="view"))
+        db.add_all([
+            Template(filename=f"act_{number}.docx", folder_id=1 + number % 2, uploaded_by=1)
+            for number in range(50)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    with TestClient(main.app) as test_client:
+        # count_queries видит запросы всех потоков: фоновая очистка не должна попасть в бюджет
+        test_client.portal.call(main.artifact_reaper.stop)
+        yield test_client
+
+
+def _headers(username: str):
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+@pytest.mark.parametrize("username", ["admin", "viewer"])
+def test_templates_list_query_budget(client, username):
+    headers = _headers(username)
+    # Первый запрос заполняет кэши пользователя и прав
+    client.get("/templates/", headers=headers)
+    # Версии таблиц, затем сам список - не зависит от числа шаблонов
+    with query_budget(2):
+        response = client.get("/templates/", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == (50 if username == "admin" else 25)
+
+
+def test_templates_not_modified_reads_only_versions(client):
+    headers = _headers("viewer")
+    etag = client.get("/templates/", headers=headers).headers["etag"]
+    with query_budget(1):
+        response = client.get("/templates/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_query_budget_reports_overrun(client):
+    with pytest.raises(AssertionError, match="Превышен бюджет SQL-запросов"):
+        with query_budget(0):
+            client.get("/folders/", headers=_headers("admin"))
+
@@ -0,0 +1,54 @@
+import docx
+import pytest
+
+from app.services.act_service import match_placeholders
+from app.services.jinja_env import expression_variables, template_variables
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    document = docx.Document()
+    document.add_paragraph("Итого {{ amount|money }}, дата {{ signed_at|date('%Y-%m-%d') }}")
+    document.add_paragraph("{% if paid %}Оплачено {{ client.name }}{% endif %}")
+    document.add_paragraph("{% for item in items %}{{ item.title }}{% endfor %}")
+    path = tmp_path / "act.docx"
+    document.save(path)
+    return str(path)
+
+
+def test_expression_variables():
+    assert expression_variables("amount|money") == ["amount"]
+    assert expression_variables("signed_at|date('%Y-%m-%d')") == ["signed_at"]
+    assert expression_variables("client.name") == ["client"]
+
+
+def test_template_variables_include_conditions_and_loops(template_path):
+    variables = template_variables(template_path, "test:conditions-and-loops")
+    assert variables == {"amount", "signed_at", "paid", "client", "items"}
+
+
+def test_match_filtered_and_block_placeholders(template_path):
+    variables = template_variables(template_path, "test:match")
+    matched, unused = match_placeholders(
+        ["amount|money", "signed_at", "paid", "client", "items", "extra"], variables
+    )
+    assert matched == {
+        "amount": "amount|money",
+        "signed_at": "signed_at",
+        "paid": "paid",
+        "client": "client",
+        "items": "items",
+    }
+    assert unused == ["extra"]
+
+
+def test_match_prefers_exact_name():
+    matched, unused = match_placeholders(["amount|money", "amount"], frozenset({"amount"}))
+    assert matched == {"amount": "amount"}
+    assert unused == ["amount|money"]
+
+
+def test_match_without_parsed_template():
+    matched, unused = match_placeholders(["amount|money", "client"], None)
+    assert matched == {"amount": "amount|money", "client": "client"}
+    assert unused == []